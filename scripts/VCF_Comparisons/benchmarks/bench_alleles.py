@@ -0,0 +1,200 @@
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+import helpers.comp_readers as comp_readers
+from helpers.comp_readers import COMP_VCFReader, alleleData
+from helpers.utils import getFileName
+from benchmarks.synthetic import writeSyntheticData, DIALECTS
+
+# Allocation benchmark for the genotype records built for every compared vcf line.
+# The slots alleleData is compared against the previous layout (a regular dataclass, where each instance carries a __dict__)
+# by swapping the class used by buildGtData, over the same synthetic workload:
+#   stream: parse and build every record the way the comparison loop does, objects are dropped once the next record is read
+#   retain: build every record and keep the genotypes, giving the memory held per allele
+
+
+@dataclass
+class DictAlleleData:
+    """
+    The alleleData layout before slots, kept for comparison.
+    """
+    allele_str: str | None = None
+    is_ref: bool | None = None
+    length: int = 0
+    ru_idxs: tuple | None = None
+    ru_mots: tuple | None = None
+    start_trim: int = 0
+    end_trim: int = 0
+
+
+def objectSize(allele_cls):
+    """
+    Returns the bytes used by a single empty instance, including its attribute dictionary if it has one.
+
+    :param allele_cls: Description
+    """
+    allele = allele_cls()
+    size = sys.getsizeof(allele)
+
+    if hasattr(allele, "__dict__"):
+        size += sys.getsizeof(allele.__dict__)
+
+    return size
+
+
+def _buildAll(vcf_list: list, retain = False):
+    """
+    Parses every record of each vcf and builds its genotype. Returns the number of alleles built,
+    and the kept genotypes if retain is true.
+
+    :param vcf_list: list of [vcf path, SETTINGS] pairs
+    :type vcf_list: list
+    :param retain: Bool for whether or not to keep every genotype
+    """
+    alleles = 0
+    kept = []
+
+    for vcf_path, settings in vcf_list:
+        with COMP_VCFReader(file_path=vcf_path, settings=settings) as rdr:
+            rdr.skipMetaData(end_delimiter="#CHROM")
+            rdr.VCFParse()
+
+            while not rdr.end_state:
+                gt_data = rdr.gt_data
+                alleles += len(gt_data)
+
+                if retain:
+                    kept.append(gt_data)
+
+                rdr.VCFParse()
+
+    return alleles, kept
+
+
+def benchAlleles(vcf_list: list, allele_cls = alleleData, retain = False):
+    """
+    Builds every genotype of the vcfs using allele_cls for the allele records. Returns a dictionary of the
+    alleles built, the run time, the traced memory (peak, and held at the end if retain is true), and the number of
+    garbage collections run in each generation.
+
+    :param vcf_list: list of [vcf path, SETTINGS] pairs
+    :type vcf_list: list
+    :param allele_cls: allele record class used by buildGtData
+    :param retain: Bool for whether or not to keep every genotype until the end of the run
+    """
+    # buildGtData looks the class up in its module, so it can be swapped for the run
+    prev_cls = comp_readers.alleleData
+    comp_readers.alleleData = allele_cls
+
+    try:
+        gc.collect()
+        gc_start = [stats["collections"] for stats in gc.get_stats()]
+
+        # timing is taken without tracing, since tracemalloc slows down every allocation
+        str_time = time.perf_counter()
+        alleles, kept = _buildAll(vcf_list, retain)
+        run_time = time.perf_counter() - str_time
+
+        gc_counts = [stats["collections"] - start for stats, start in zip(gc.get_stats(), gc_start)]
+        del kept
+        gc.collect()
+
+        tracemalloc.start()
+        _, kept = _buildAll(vcf_list, retain)
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+
+    finally:
+        comp_readers.alleleData = prev_cls
+
+    return {"alleles": alleles,
+            "time": run_time,
+            "peak_bytes": peak,
+            "held_bytes": held if retain else 0,
+            "gc_collections": gc_counts}
+
+
+def runBenchmarks(n_loci: int, data_dir: str, callers = None, **data_opts):
+    """
+    Generates (or reuses) the synthetic workload for n_loci catalog loci, and runs the stream and retain
+    benchmarks with the slots and dict allele layouts. Returns a JSON serializable dictionary of the results.
+
+    :param n_loci: number of catalog loci
+    :type n_loci: int
+    :param data_dir: directory for the synthetic files
+    :type data_dir: str
+    :param callers: dictionary of caller name -> SETTINGS, defaults to one caller per dialect
+    :param data_opts: extra writeSyntheticData options (eg. skip_rate, motif_lens)
+    """
+    bed_path, vcf_list = writeSyntheticData(data_dir, n_loci, callers=callers, **data_opts)
+
+    results = {"n_loci": n_loci,
+               "vcfs": [getFileName(vcf[0]) for vcf in vcf_list],
+               "object_bytes": {"slots": objectSize(alleleData), "dict": objectSize(DictAlleleData)},
+               "stages": {}}
+
+    for stage, retain in (("stream", False), ("retain", True)):
+        results["stages"][stage] = {"slots": benchAlleles(vcf_list, alleleData, retain),
+                                    "dict": benchAlleles(vcf_list, DictAlleleData, retain)}
+
+    return results
+
+
+def main():
+    # set directory variables for file i/o
+    BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+    DATA_DIR = os.path.join(BENCH_DIR, "data")
+
+    # Program Options
+    sizes = [100000, 1000000] # catalog sizes to benchmark, a whole genome catalog is around 1000000 - 7000000 loci
+    callers = DIALECTS # caller name -> SETTINGS, one caller per vcf dialect
+    data_opts = {
+        "seed": 1,
+        "skip_rate": 0.1, # fraction of loci missing from each vcf
+        "off_catalog_rate": 0.05, # fraction of loci with an extra record that syncToBed skips
+    }
+    results_file = os.path.join(BENCH_DIR, "alloc-results.json") # results are appended, so runs can be compared over time
+
+
+    runs = []
+    for n_loci in sizes:
+        print(f"Benchmarking {n_loci} loci")
+        results = runBenchmarks(n_loci, DATA_DIR, callers, **data_opts)
+
+        print(f"  object size: {results['object_bytes']['slots']} bytes (slots), {results['object_bytes']['dict']} bytes (dict)")
+        for stage, res in results["stages"].items():
+            for layout, layout_res in res.items():
+                print(f"  {stage} {layout}: {layout_res['time']:.2f}s, {layout_res['alleles']} alleles, "
+                      f"peak {layout_res['peak_bytes'] / 1e6:.1f}MB, held {layout_res['held_bytes'] / 1e6:.1f}MB, "
+                      f"gc collections {layout_res['gc_collections']}")
+
+        runs.append(results)
+
+    history = []
+    if os.path.exists(results_file):
+        with open(results_file, "r") as file:
+            history = json.load(file)
+
+    history.append({"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "data_opts": data_opts,
+                    "runs": runs})
+
+    with open(results_file, "w") as file:
+        json.dump(history, file, indent=2)
+
+
+
+if __name__ == "__main__":
+    main()
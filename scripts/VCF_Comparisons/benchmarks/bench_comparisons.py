@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import platform
+from contextlib import ExitStack, redirect_stdout
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+from helpers.readers import Reader, BEDReader
+from helpers.comp_readers import COMP_VCFReader
+from helpers.comparison import compareLoci
+from helpers.writers import TSVCompWriter
+from helpers.utils import *
+from helpers.constants import *
+from benchmarks.synthetic import writeSyntheticData, DIALECTS
+
+# Benchmarks for the streaming comparison engine over synthetic workloads.
+# Each stage is timed separately, from raw line reads up to the full comparison loop:
+#   read: Reader.read over every raw line of each vcf
+#   parse: COMP_VCFReader.VCFParse and buildGtData over every record of each vcf
+#   sync: syncToBed of all vcfs to every BED line, without running comparisons
+#   compare: the full compareLoci loop (sync, compareGt for every caller pair, and writing the rows to os.devnull)
+
+
+def benchRead(vcf_list: list):
+    """
+    Times Reader.read over every line of each vcf. Returns a dictionary of caller -> (lines, seconds).
+
+    :param vcf_list: list of [vcf path, SETTINGS] pairs
+    :type vcf_list: list
+    """
+    results = {}
+    for vcf_path, settings in vcf_list:
+        lines = 0
+        str_time = time.perf_counter()
+
+        with Reader(vcf_path) as rdr:
+            while rdr.read():
+                lines += 1
+
+        results[getFileName(vcf_path)] = (lines, time.perf_counter() - str_time)
+
+    return results
+
+
+def benchParse(vcf_list: list, build_gt = True):
+    """
+    Times COMP_VCFReader.VCFParse (and buildGtData if build_gt is true) over every record of each vcf.
+    Returns a dictionary of caller -> (records, seconds).
+
+    :param vcf_list: list of [vcf path, SETTINGS] pairs
+    :type vcf_list: list
+    :param build_gt: Bool for whether or not to build the genotype data of each record
+    """
+    results = {}
+    for vcf_path, settings in vcf_list:
+        records = 0
+        str_time = time.perf_counter()
+
+        with COMP_VCFReader(file_path=vcf_path, settings=settings) as rdr:
+            rdr.skipMetaData(end_delimiter="#CHROM")
+            rdr.VCFParse()
+
+            while not rdr.end_state:
+                if build_gt:
+                    rdr.buildGtData()
+                records += 1
+                rdr.VCFParse()
+
+        results[getFileName(vcf_path)] = (records, time.perf_counter() - str_time)
+
+    return results
+
+
+def _openReaders(bed_path: str, vcf_list: list, stack: ExitStack):
+    """
+    Opens the BED reader and the vcf readers the same way run_comparisons does.
+
+    :param bed_path: Description
+    :type bed_path: str
+    :param vcf_list: Description
+    :type vcf_list: list
+    :param stack: Description
+    :type stack: ExitStack
+    """
+    bed = stack.enter_context(BEDReader(bed_path))
+    bed.read()
+    bed.skipMetaData()
+
+    vcf_rdrs = []
+    for vcf_path, settings in vcf_list:
+        rdr = setupVCFReader(vcf=vcf_path, settings=settings, stk=stack)
+        rdr.VCFParse()
+        vcf_rdrs.append(rdr)
+
+    return bed, vcf_rdrs
+
+
+def benchSync(bed_path: str, vcf_list: list):
+    """
+    Times syncing every vcf to each BED line, and moving past the synced records, without running comparisons.
+    Returns (BED lines, seconds).
+
+    :param bed_path: Description
+    :type bed_path: str
+    :param vcf_list: Description
+    :type vcf_list: list
+    """
+    loci = 0
+    str_time = time.perf_counter()
+
+    with ExitStack() as stack:
+        bed, vcf_rdrs = _openReaders(bed_path, vcf_list, stack)
+
+        while bed.cur_line:
+            for rdr in vcf_rdrs:
+                rdr.syncToBed(bed)
+
+            for rdr in vcf_rdrs:
+                rdr.VCFParse()
+
+            bed.read()
+            loci += 1
+
+    return loci, time.perf_counter() - str_time
+
+
+def benchCompare(bed_path: str, vcf_list: list, **compare_opts):
+    """
+    Times the full compareLoci loop with the output rows written to os.devnull. Returns (BED lines, seconds).
+
+    :param bed_path: Description
+    :type bed_path: str
+    :param vcf_list: Description
+    :type vcf_list: list
+    :param compare_opts: extra compareLoci options (eg. lv_max_dist)
+    """
+    str_time = time.perf_counter()
+
+    with ExitStack() as stack:
+        bed, vcf_rdrs = _openReaders(bed_path, vcf_list, stack)
+        outs = [stack.enter_context(open(os.devnull, "w")) for _ in range(3)]
+
+        # the loop prints each chromosome it starts, which is not part of the timing
+        with open(os.devnull, "w") as null, redirect_stdout(null):
+            loci = compareLoci(bed, vcf_rdrs, None, None, None, writer=TSVCompWriter(*outs), **compare_opts)
+
+    return loci, time.perf_counter() - str_time
+
+
+def runBenchmarks(n_loci: int, data_dir: str, stages = ("read", "parse", "sync", "compare"), callers = None, **data_opts):
+    """
+    Generates (or reuses) the synthetic workload for n_loci catalog loci, and runs each benchmark stage on it.
+    Returns a JSON serializable dictionary of the results, with the rate of each stage in lines (or loci) per second.
+
+    :param n_loci: number of catalog loci
+    :type n_loci: int
+    :param data_dir: directory for the synthetic files
+    :type data_dir: str
+    :param stages: benchmark stages to run
+    :param callers: dictionary of caller name -> SETTINGS, defaults to one caller per dialect
+    :param data_opts: extra writeSyntheticData options (eg. skip_rate, motif_lens)
+    """
+    str_time = time.perf_counter()
+    bed_path, vcf_list = writeSyntheticData(data_dir, n_loci, callers=callers, **data_opts)
+    results = {"n_loci": n_loci, "generate_time": time.perf_counter() - str_time, "stages": {}}
+
+    def rate(count, seconds):
+        return {"count": count, "time": seconds, "per_sec": count / seconds if seconds > 0 else 0.0}
+
+    if "read" in stages:
+        results["stages"]["read"] = {caller: rate(*res) for caller, res in benchRead(vcf_list).items()}
+    if "parse" in stages:
+        results["stages"]["parse"] = {caller: rate(*res) for caller, res in benchParse(vcf_list).items()}
+    if "sync" in stages:
+        results["stages"]["sync"] = rate(*benchSync(bed_path, vcf_list))
+    if "compare" in stages:
+        results["stages"]["compare"] = rate(*benchCompare(bed_path, vcf_list))
+
+    return results
+
+
+def main():
+    # set directory variables for file i/o
+    BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+    DATA_DIR = os.path.join(BENCH_DIR, "data")
+
+    # Program Options
+    sizes = [10000, 100000] # catalog sizes to benchmark, up to 10000000 (files are generated once and reused)
+    stages = ("read", "parse", "sync", "compare")
+    callers = DIALECTS # caller name -> SETTINGS, one caller per vcf dialect
+    data_opts = {
+        "seed": 1,
+        "motif_lens": (2, 3, 4, 5, 6, 29, 77), # allele lengths are the motif length times the copy number
+        "copy_range": (3, 12),
+        "skip_rate": 0.1, # fraction of loci missing from each vcf
+        "off_catalog_rate": 0.05, # fraction of loci with an extra record that syncToBed skips
+    }
+    results_file = os.path.join(BENCH_DIR, "bench-results.json") # results are appended, so runs can be compared over time
+
+
+    runs = []
+    for n_loci in sizes:
+        print(f"Benchmarking {n_loci} loci")
+        results = runBenchmarks(n_loci, DATA_DIR, stages, callers, **data_opts)
+
+        for stage, res in results["stages"].items():
+            if "per_sec" in res:
+                print(f"  {stage}: {res['time']:.2f}s ({res['per_sec']:.0f} loci/s)")
+            else:
+                for caller, caller_res in res.items():
+                    print(f"  {stage} {caller}: {caller_res['time']:.2f}s ({caller_res['per_sec']:.0f} lines/s)")
+
+        runs.append(results)
+
+    history = []
+    if os.path.exists(results_file):
+        with open(results_file, "r") as file:
+            history = json.load(file)
+
+    history.append({"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "data_opts": data_opts,
+                    "runs": runs})
+
+    with open(results_file, "w") as file:
+        json.dump(history, file, indent=2)
+
+
+
+if __name__ == "__main__":
+    main()
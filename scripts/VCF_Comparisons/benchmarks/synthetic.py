@@ -0,0 +1,196 @@
+import os
+import sys
+import random
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+from helpers.constants import *
+
+# Synthetic BED catalogs and caller VCFs for benchmarking.
+# Loci are generated and written in a single pass, so the catalog and every caller VCF are streamed to disk
+# and the locus count is only limited by disk space. The same seed always produces the same files.
+
+
+BASES = "ACGT"
+
+# caller name -> settings for each vcf dialect the readers handle
+DIALECTS = {
+    "default": SETTINGS.DEFAULT,
+    "offset": SETTINGS.OFFSET_START,
+    "vamos": SETTINGS.VAMOS,
+    "straglr": SETTINGS.STRAGLR,
+}
+
+VCF_HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##INFO=<ID=END,Number=1,Type=Integer,Description=\"End position\">\n"
+    "##FORMAT=<ID=GT,Number=1,Type=String,Description=\"Genotype\">\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n"
+)
+
+
+def _mutate(rng: random.Random, seq: str, max_muts: int):
+    """
+    Returns the sequence with up to max_muts random base substitutions.
+
+    :param rng: Description
+    :type rng: random.Random
+    :param seq: Description
+    :type seq: str
+    :param max_muts: Description
+    :type max_muts: int
+    """
+    if max_muts <= 0:
+        return seq
+
+    bases = list(seq)
+    for _ in range(rng.randint(0, max_muts)):
+        bases[rng.randrange(len(bases))] = rng.choice(BASES)
+
+    return "".join(bases)
+
+
+def _defaultLine(rng, chrom, pos, end_pos, motif, copies, max_copy_diff, max_muts):
+    ref = motif * copies
+    alt1 = _mutate(rng, motif * max(copies + rng.randint(-max_copy_diff, max_copy_diff), 1), max_muts)
+    alt2 = _mutate(rng, motif * max(copies + rng.randint(-max_copy_diff, max_copy_diff), 1), max_muts)
+
+    return f"{chrom}\t{pos}\t.\t{ref}\t{alt1},{alt2}\t.\tPASS\tEND={end_pos}\tGT\t1|2\n"
+
+
+def _offsetLine(rng, chrom, pos, end_pos, motif, copies, max_copy_diff, max_muts):
+    # the record starts one base after the catalog position, the same as callers that include the padding base
+    ref = motif * copies
+    alt = _mutate(rng, motif * max(copies + rng.randint(-max_copy_diff, max_copy_diff), 1), max_muts)
+
+    return f"{chrom}\t{pos + 1}\t.\t{ref}\t{alt}\t.\tPASS\tEND={end_pos}\tGT\t0/1\n"
+
+
+def _vamosLine(rng, chrom, pos, end_pos, motif, copies, max_copy_diff, max_muts):
+    # two repeat units, the catalog motif and a variant of it, with the alleles given as unit indices
+    ru = f"{motif},{_mutate(rng, motif, 1)}"
+    annos = []
+    for _ in range(2):
+        n_units = max(copies + rng.randint(-max_copy_diff, max_copy_diff), 1)
+        annos.append("-".join(rng.choice("001") for _ in range(n_units)))
+
+    info = (f"END={end_pos};RU={ru};SVTYPE=VNTR;ALTANNO_H1={annos[0]};LEN_H1={annos[0].count('-') + 1};"
+            f"ALTANNO_H2={annos[1]};LEN_H2={annos[1].count('-') + 1}")
+
+    return f"{chrom}\t{pos}\t.\tN\t<VNTR>\t.\tPASS\t{info}\tGT\t1/2\n"
+
+
+def _straglrLine(rng, chrom, pos, end_pos, motif, copies, max_copy_diff, max_muts, het_rate = 0.5):
+    # straglr only reports read based allele sizes (RB), one per alt. SVLEN is the reference length of the locus (END - POS),
+    # repeated for each alt, which is what COMP_VCFReader checks it against
+    sizes = [len(motif) * max(copies + rng.randint(-max_copy_diff, max_copy_diff), 1)]
+    if rng.random() < het_rate:
+        sizes.append(len(motif) * max(copies + rng.randint(-max_copy_diff, max_copy_diff), 1))
+
+    alt = ",".join("<CNV>" for _ in sizes)
+    svlen = ",".join(str(end_pos - pos) for _ in sizes)
+    rb = ",".join(str(size) for size in sizes)
+    gt = "1/2" if len(sizes) > 1 else "1"
+
+    return f"{chrom}\t{pos}\t.\tN\t{alt}\t.\tPASS\tEND={end_pos};RU={motif};SVLEN={svlen};RB={rb}\tGT\t{gt}\n"
+
+
+LINE_WRITERS = {
+    SETTINGS.DEFAULT: _defaultLine,
+    SETTINGS.OFFSET_START: _offsetLine,
+    SETTINGS.VAMOS: _vamosLine,
+    SETTINGS.STRAGLR: _straglrLine,
+}
+
+
+def iterLoci(n_loci: int, seed = 1, chroms = ("chr1", "chr2", "chr10"), motif_lens = (2, 3, 4, 5, 6, 29, 77),
+             copy_range = (3, 12), gap_range = (200, 2000)):
+    """
+    Yields (chrom, start, end, motif, copies) for n_loci catalog loci, split evenly across chroms in the given order.
+
+    :param n_loci: Description
+    :type n_loci: int
+    :param seed: Description
+    :param chroms: chromosome names, in catalog order
+    :param motif_lens: motif lengths to choose from
+    :param copy_range: (min, max) reference copy number
+    :param gap_range: (min, max) distance between loci
+    """
+    rng = random.Random(seed)
+    per_chrom, extra = divmod(n_loci, len(chroms))
+
+    for i, chrom in enumerate(chroms):
+        pos = 10000
+        for _ in range(per_chrom + (1 if i < extra else 0)):
+            pos += rng.randint(*gap_range)
+            motif = "".join(rng.choice(BASES) for _ in range(rng.choice(motif_lens)))
+            copies = rng.randint(*copy_range)
+            end_pos = pos + len(motif) * copies
+
+            yield chrom, pos, end_pos, motif, copies
+            pos = end_pos
+
+
+def writeSyntheticData(out_dir: str, n_loci: int, callers = None, seed = 1, chroms = ("chr1", "chr2", "chr10"),
+                       motif_lens = (2, 3, 4, 5, 6, 29, 77), copy_range = (3, 12), max_copy_diff = 2, max_muts = 3,
+                       skip_rate = 0.1, off_catalog_rate = 0.05, overwrite = False):
+    """
+    Writes a synthetic BED catalog and one VCF per caller to out_dir, and returns the BED path and the
+    vcf list in the run_comparisons format ([vcf path, SETTINGS] pairs). Existing files are reused unless overwrite is true,
+    so the same workload is only generated once.
+
+    :param out_dir: Description
+    :type out_dir: str
+    :param n_loci: number of catalog loci
+    :type n_loci: int
+    :param callers: dictionary of caller name -> SETTINGS, defaults to one caller per dialect
+    :param seed: Description
+    :param chroms: chromosome names, in catalog order
+    :param motif_lens: motif lengths to choose from, allele lengths are the motif length times the copy number
+    :param copy_range: (min, max) reference copy number
+    :param max_copy_diff: max copy number difference of an allele from the reference
+    :param max_muts: max number of base substitutions per allele sequence
+    :param skip_rate: fraction of catalog loci missing from each vcf
+    :param off_catalog_rate: fraction of catalog loci with an extra record before them that is not in the catalog (skipped by syncToBed)
+    :param overwrite: Bool for whether or not to regenerate existing files
+    """
+    callers = DIALECTS if callers is None else callers
+
+    os.makedirs(out_dir, exist_ok=True)
+    bed_path = os.path.join(out_dir, f"catalog-{n_loci}.bed")
+    vcf_list = [[os.path.join(out_dir, f"{name}-{n_loci}.vcf"), settings] for name, settings in callers.items()]
+
+    if not overwrite and all(os.path.exists(path) for path in [bed_path] + [vcf[0] for vcf in vcf_list]):
+        return bed_path, vcf_list
+
+    # every caller gets its own random stream, so adding a caller does not change the other files
+    rngs = [random.Random(f"{seed}-{name}") for name in callers]
+    writers = [LINE_WRITERS[settings] for settings in callers.values()]
+
+    with open(bed_path, "w") as bed_file:
+        vcf_files = [open(vcf[0], "w") for vcf in vcf_list]
+
+        try:
+            for file in vcf_files:
+                file.write(VCF_HEADER)
+
+            for chrom, pos, end_pos, motif, copies in iterLoci(n_loci, seed, chroms, motif_lens, copy_range):
+                label = "STR" if len(motif) < 7 else "VNTR"
+                bed_file.write(f"{chrom}\t{pos}\t{end_pos}\t{motif}\t0.0\t{label}\t{len(motif)}\t0\t0\n")
+
+                for rng, write_line, file in zip(rngs, writers, vcf_files):
+                    if rng.random() < off_catalog_rate:
+                        file.write(f"{chrom}\t{pos - 100}\t.\tAC\tA\t.\tPASS\tEND={pos - 99}\tGT\t0/1\n")
+
+                    if rng.random() < skip_rate:
+                        continue
+
+                    file.write(write_line(rng, chrom, pos, end_pos, motif, copies, max_copy_diff, max_muts))
+
+        finally:
+            for file in vcf_files:
+                file.close()
+
+    return bed_path, vcf_list
@@ -0,0 +1,274 @@
+import numpy as np
+from dataclasses import dataclass
+from rapidfuzz.process import cpdist
+from rapidfuzz.distance import Levenshtein as rf_levenshtein
+from helpers.comp_readers import alleleData
+from helpers.utils import trimAllele
+from helpers.constants import *
+
+
+# allele index pairs (gt1 allele, gt2 allele) for the last axis of the comparison matrices.
+# the first two are the VERTICAL order comparisons, the last two are the CROSS order comparisons,
+# matching the order the comparisons are returned in by compareGt
+COMBO_IDXS_1 = np.array([0, 1, 1, 0])
+COMBO_IDXS_2 = np.array([0, 1, 0, 1])
+
+
+@dataclass
+class AlleleBlock:
+    """
+    Array form of the genotype data for a block of loci, with shape (loci, readers, 2 alleles).
+    """
+    seqs: np.ndarray    # allele strings, only set where seq_ok is true
+    seq_ok: np.ndarray  # true where the allele string can be used for levenshtein comparisons
+    lens: np.ndarray    # allele lengths, only set where len_ok is true
+    len_ok: np.ndarray  # true where the allele length can be used for length comparisons
+    active: np.ndarray  # (loci, readers) true where the reader has genotype data for the locus
+
+
+def isValidSeq(allele_str: str | None):
+    """
+    Returns true if the allele string is not empty and only contains the characters A, T, C, or G.
+    Same check as compareAllele, using str.strip to avoid building a set for every allele.
+
+    :param allele_str: Description
+    :type allele_str: str | None
+    """
+    return bool(allele_str) and not allele_str.strip("ACGT")
+
+
+def getPairIdxs(n_readers: int):
+    """
+    Returns the reader index arrays (i, j) for every reader pair, in the same order as the output columns.
+
+    :param n_readers: Description
+    :type n_readers: int
+    """
+    return np.triu_indices(n_readers, k=1)
+
+
+def buildAlleleBlock(block: list[list[list[alleleData] | None]], trim = False):
+    """
+    Converts a block of genotype data into an AlleleBlock.
+    block holds one list per locus, containing the gt_data of each reader, or None if the reader
+    is paused or ended at that locus. Only the first two alleles of each genotype are used, the same as compareGt.
+
+    :param block: Description
+    :type block: list[list[list[alleleData] | None]]
+    :param trim: Bool for whether or not to trim alleles while comparing
+    """
+    n_loci = len(block)
+    n_rdrs = len(block[0]) if block else 0
+
+    seqs = np.full((n_loci, n_rdrs, 2), None, dtype=object)
+    seq_ok = np.zeros((n_loci, n_rdrs, 2), dtype=bool)
+    lens = np.zeros((n_loci, n_rdrs, 2), dtype=np.int64)
+    len_ok = np.zeros((n_loci, n_rdrs, 2), dtype=bool)
+    active = np.zeros((n_loci, n_rdrs), dtype=bool)
+
+    for l, gts in enumerate(block):
+        for r, gt in enumerate(gts):
+            if gt is None:
+                continue
+
+            active[l, r] = True
+
+            for a, allele in enumerate(gt[:2]):
+                if allele is None:
+                    continue
+
+                if isValidSeq(allele.allele_str):
+                    seqs[l, r, a] = trimAllele(allele, trim)
+                    seq_ok[l, r, a] = True
+
+                if allele.length is not None and allele.length > 0:
+                    lens[l, r, a] = allele.length
+                    len_ok[l, r, a] = True
+
+    return AlleleBlock(seqs, seq_ok, lens, len_ok, active)
+
+
+def compareBlock(alleles: AlleleBlock, comp_method = COMP_METHOD.LEVENSHTEIN, workers = 1, max_dist = None, band = None):
+    """
+    Runs comparisons for every reader pair and both comparison orders over a block of loci at once.
+    Returns the distance matrix and the NA mask, each with shape (loci, pairs, 4). The last axis holds
+    [VERTICAL allele 1, VERTICAL allele 2, CROSS allele 1, CROSS allele 2] comparisons, pairs are in the same order as the output columns.
+
+    :param alleles: Description
+    :type alleles: AlleleBlock
+    :param comp_method: Comparison Method(either length or levenshtein)
+    :param workers: number of threads used for the levenshtein distances, -1 uses all cpus
+    :param max_dist: max levenshtein distance to compute, larger distances are returned as max_dist + 1
+    :param band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    """
+    idx_1, idx_2 = getPairIdxs(alleles.active.shape[1])
+
+    # pair is only compared if both readers have data at the locus
+    pair_active = (alleles.active[:, idx_1] & alleles.active[:, idx_2])[:, :, None]
+
+    if comp_method == COMP_METHOD.LEVENSHTEIN:
+        ok = pair_active & alleles.seq_ok[:, idx_1][:, :, COMBO_IDXS_1] & alleles.seq_ok[:, idx_2][:, :, COMBO_IDXS_2]
+        dist = np.zeros(ok.shape, dtype=np.int64)
+
+        if ok.any():
+            seqs_1 = alleles.seqs[:, idx_1][:, :, COMBO_IDXS_1][ok]
+            seqs_2 = alleles.seqs[:, idx_2][:, :, COMBO_IDXS_2][ok]
+            dist[ok] = boundedDistances(seqs_1.tolist(), seqs_2.tolist(), max_dist, band, workers)
+
+    elif comp_method == COMP_METHOD.LENGTH:
+        ok = pair_active & alleles.len_ok[:, idx_1][:, :, COMBO_IDXS_1] & alleles.len_ok[:, idx_2][:, :, COMBO_IDXS_2]
+        dist = np.where(ok, alleles.lens[:, idx_1][:, :, COMBO_IDXS_1] - alleles.lens[:, idx_2][:, :, COMBO_IDXS_2], 0)
+
+    else:
+        raise ValueError(f"Unsupported comparison method for block comparisons: {comp_method}")
+
+    return dist, ~ok
+
+
+def compareGtBlock(alleles: AlleleBlock, workers = 1, max_dist = None, band = None):
+    """
+    Array version of compareGt for every reader pair over a block of loci. Runs the LEVENSHTEIN comparisons for both orders,
+    selects the order of each locus and pair from the levenshtein sums, and takes the LEVENSHTEIN and LENGTH results in that order.
+    Returns the levenshtein distances and NA mask, and the length differences and NA mask, each with shape (loci, pairs, 2).
+
+    :param alleles: Description
+    :type alleles: AlleleBlock
+    :param workers: number of threads used for the levenshtein distances, -1 uses all cpus
+    :param max_dist: max levenshtein distance to compute, larger distances are returned as max_dist + 1
+    :param band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    """
+    lv_dist, lv_na = compareBlock(alleles, COMP_METHOD.LEVENSHTEIN, workers, max_dist=max_dist, band=band)
+    ln_dist, ln_na = compareBlock(alleles, COMP_METHOD.LENGTH)
+
+    # LENGTH uses the order picked by LEVENSHTEIN, the same as the comp_ord passed to compareGt
+    cross = selectOrder(lv_dist, lv_na)
+    if max_dist is not None or band is not None:
+        cross = selectCappedOrder(alleles, lv_dist, lv_na, cross, workers, max_dist, band)
+
+    lv_dist, lv_na = takeOrder(lv_dist, lv_na, cross)
+    ln_dist, ln_na = takeOrder(ln_dist, ln_na, cross)
+
+    return lv_dist, lv_na, ln_dist, ln_na
+
+
+def boundedDistances(seqs_1: list[str], seqs_2: list[str], max_dist = None, band = None, workers = 1):
+    """
+    Returns the levenshtein distance of each pair of strings, using the same cutoffs as compareAllele.
+    Each distinct pair of strings is only compared once, and pairs are grouped by their cutoff,
+    since cpdist only takes a single cutoff per call.
+
+    :param seqs_1: Description
+    :type seqs_1: list[str]
+    :param seqs_2: Description
+    :type seqs_2: list[str]
+    :param max_dist: max levenshtein distance to compute, larger distances are returned as max_dist + 1
+    :param band: number of edits allowed past the length difference of the strings
+    :param workers: number of threads used for the levenshtein distances, -1 uses all cpus
+    """
+    # intern the string pairs, levenshtein distance is symmetric so pairs are stored in sorted order
+    pair_idxs = {}
+    inverse = np.empty(len(seqs_1), dtype=np.int64)
+    for i, pair in enumerate(zip(seqs_1, seqs_2)):
+        if pair[1] < pair[0]:
+            pair = (pair[1], pair[0])
+        inverse[i] = pair_idxs.setdefault(pair, len(pair_idxs))
+
+    uniq_1 = [pair[0] for pair in pair_idxs]
+    uniq_2 = [pair[1] for pair in pair_idxs]
+
+    if band is None:
+        dist = cpdist(uniq_1, uniq_2, scorer=rf_levenshtein.distance, score_cutoff=max_dist, workers=workers)
+        return np.asarray(dist, dtype=np.int64)[inverse]
+
+    lens_1 = np.fromiter(map(len, uniq_1), dtype=np.int64, count=len(uniq_1))
+    lens_2 = np.fromiter(map(len, uniq_2), dtype=np.int64, count=len(uniq_2))
+
+    cutoffs = np.abs(lens_1 - lens_2) + band
+    if max_dist is not None:
+        cutoffs = np.minimum(cutoffs, max_dist)
+
+    dist = np.zeros(len(uniq_1), dtype=np.int64)
+    for cutoff in np.unique(cutoffs).tolist():
+        idxs = np.flatnonzero(cutoffs == cutoff).tolist()
+        dist[idxs] = cpdist([uniq_1[i] for i in idxs], [uniq_2[i] for i in idxs],
+                            scorer=rf_levenshtein.distance, score_cutoff=cutoff, workers=workers)
+
+    return dist[inverse]
+
+
+def selectOrder(dist: np.ndarray, na: np.ndarray):
+    """
+    Picks the comparison order with the lesser sum of absolute distances for every locus and pair, the same as compareGt
+    (NA distances count as 0, and VERTICAL is used for ties). Returns a bool array with shape (loci, pairs), true where the CROSS order is used.
+
+    :param dist: distance matrix from compareBlock
+    :type dist: np.ndarray
+    :param na: NA mask from compareBlock
+    :type na: np.ndarray
+    """
+    clean = np.where(na, 0, np.abs(dist))
+
+    return (clean[:, :, 2] + clean[:, :, 3]) < (clean[:, :, 0] + clean[:, :, 1])
+
+
+def selectCappedOrder(alleles: AlleleBlock, dist: np.ndarray, na: np.ndarray, cross: np.ndarray, workers = 1, max_dist = None, band = None):
+    """
+    Checks the orders from selectOrder for capped levenshtein distances, the same as compareGt. Capped distances are only lower bounds,
+    so where the lesser sum has a capped distance the order is picked again from the full distances of that locus and pair.
+    Returns the corrected bool array with shape (loci, pairs), true where the CROSS order is used.
+
+    :param alleles: Description
+    :type alleles: AlleleBlock
+    :param dist: capped levenshtein distance matrix from compareBlock
+    :type dist: np.ndarray
+    :param na: NA mask from compareBlock
+    :type na: np.ndarray
+    :param cross: selected orders from selectOrder
+    :type cross: np.ndarray
+    :param workers: number of threads used for the levenshtein distances, -1 uses all cpus
+    :param max_dist: max levenshtein distance used for dist
+    :param band: number of edits allowed past the allele length difference used for dist
+    """
+    idx_1, idx_2 = getPairIdxs(alleles.active.shape[1])
+    seqs_1 = alleles.seqs[:, idx_1][:, :, COMBO_IDXS_1]
+    seqs_2 = alleles.seqs[:, idx_2][:, :, COMBO_IDXS_2]
+    ok = ~na
+
+    # a distance is capped if it is over the cutoff of its pair of strings, the same cutoffs as boundedDistances
+    capped = np.zeros(dist.shape, dtype=bool)
+    if ok.any():
+        lens_1 = np.fromiter(map(len, seqs_1[ok].tolist()), dtype=np.int64)
+        lens_2 = np.fromiter(map(len, seqs_2[ok].tolist()), dtype=np.int64)
+
+        cutoffs = np.full(len(lens_1), np.iinfo(np.int64).max if max_dist is None else max_dist, dtype=np.int64)
+        if band is not None:
+            cutoffs = np.minimum(cutoffs, np.abs(lens_1 - lens_2) + band)
+        capped[ok] = dist[ok] > cutoffs
+
+    redo = np.where(cross, capped[:, :, 2] | capped[:, :, 3], capped[:, :, 0] | capped[:, :, 1])
+    if not redo.any():
+        return cross
+
+    # only the distances of the loci and pairs with an unknown order are computed again, without cutoffs
+    full = dist.copy()
+    mask = redo[:, :, None] & ok
+    full[mask] = boundedDistances(seqs_1[mask].tolist(), seqs_2[mask].tolist(), workers=workers)
+
+    return np.where(redo, selectOrder(full, na), cross)
+
+
+def takeOrder(dist: np.ndarray, na: np.ndarray, cross: np.ndarray):
+    """
+    Returns the allele 1 and allele 2 distances, and their NA mask, for the selected comparison order.
+    Both have shape (loci, pairs, 2).
+
+    :param dist: distance matrix from compareBlock
+    :type dist: np.ndarray
+    :param na: NA mask from compareBlock
+    :type na: np.ndarray
+    :param cross: selected orders from selectOrder
+    :type cross: np.ndarray
+    """
+    idxs = np.where(cross[:, :, None], [2, 3], [0, 1])
+
+    return np.take_along_axis(dist, idxs, axis=2), np.take_along_axis(na, idxs, axis=2)
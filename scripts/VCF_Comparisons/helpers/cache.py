@@ -0,0 +1,169 @@
+import os
+import json
+import mmap
+import shutil
+import hashlib
+import numpy as np
+from helpers.columnar import LocusTable, loadVCFTable, loadBEDTable
+from helpers.constants import *
+
+
+CACHE_VERSION = 3 # increase when the parsing or the table layout changes, so old cache entries are not used
+
+# LocusTable columns saved as .npy files
+ARRAY_COLUMNS = ("chrom_ids", "pos", "end_pos", "is_ref", "lens", "len_ok", "seq_ok", "seq_starts", "seq_ends")
+BED_ARRAY_COLUMNS = ("chrom_ids", "pos", "end_pos", "motif_lens", "motif_offsets", "label_ids")
+
+
+def cacheKey(vcf_path: str, settings: SETTINGS, hash_file = False, tag = None):
+    """
+    Returns the cache key for a parsed vcf. The key is built from the absolute file path, size, modification time,
+    and the settings member. If hash_file is true the file contents are hashed as well, so files that are
+    copied or touched without changing still hit the cache.
+
+    :param vcf_path: VCF file path
+    :type vcf_path: str
+    :param settings: settings object the vcf is parsed with
+    :type settings: SETTINGS
+    :param hash_file: Bool for whether or not to hash the file contents
+    :param tag: used in place of the settings name for files that are not vcfs (eg. the BED catalog)
+    """
+    stat = os.stat(vcf_path)
+    key = hashlib.sha1()
+    tag = settings.name if tag is None else tag
+
+    if hash_file:
+        key.update(f"{CACHE_VERSION}\t{tag}".encode())
+        with open(vcf_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                key.update(block)
+    else:
+        key.update(f"{CACHE_VERSION}\t{tag}\t{os.path.abspath(vcf_path)}\t{stat.st_size}\t{stat.st_mtime_ns}".encode())
+
+    return key.hexdigest()
+
+
+def writeTable(tab: LocusTable, entry_dir: str, columns = ARRAY_COLUMNS, buf_name = "seq_buf"):
+    """
+    Saves a LocusTable to a cache entry directory. The entry is written to a temporary directory first
+    and then moved into place, so a cache entry is never left half written.
+
+    :param tab: Description
+    :type tab: LocusTable
+    :param entry_dir: Description
+    :type entry_dir: str
+    :param columns: array columns to save, ARRAY_COLUMNS for VCF tables or BED_ARRAY_COLUMNS for BED tables
+    :param buf_name: name of the bytes buffer column (seq_buf or motif_buf)
+    """
+    tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    for col in columns:
+        np.save(os.path.join(tmp_dir, f"{col}.npy"), getattr(tab, col))
+
+    with open(os.path.join(tmp_dir, f"{buf_name}.bin"), "wb") as file:
+        file.write(getattr(tab, buf_name))
+
+    # meta data is written last, since its existence marks the entry as complete
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as file:
+        json.dump({"version": CACHE_VERSION,
+                   "path": tab.path,
+                   "settings": tab.settings.name if tab.settings else None,
+                   "columns": list(columns),
+                   "buf_name": buf_name,
+                   "chroms": tab.chroms,
+                   "labels": tab.labels,
+                   "svlen_diffs": tab.svlen_diffs}, file)
+
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # another process finished the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def readTable(entry_dir: str):
+    """
+    Loads a LocusTable from a cache entry directory. Arrays and the bytes buffer are memory mapped,
+    so only the parts that are used are read from disk, and processes loading the same entry share the pages.
+
+    :param entry_dir: Description
+    :type entry_dir: str
+    """
+    with open(os.path.join(entry_dir, "meta.json"), "r") as file:
+        meta = json.load(file)
+
+    columns = meta.get("columns", ARRAY_COLUMNS)
+    buf_name = meta.get("buf_name", "seq_buf")
+
+    cols = {col: np.load(os.path.join(entry_dir, f"{col}.npy"), mmap_mode="r") for col in columns}
+
+    cols[buf_name] = b""
+    with open(os.path.join(entry_dir, f"{buf_name}.bin"), "rb") as file:
+        if os.fstat(file.fileno()).st_size > 0:
+            cols[buf_name] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return LocusTable(chroms=meta["chroms"],
+                      labels=meta.get("labels", []),
+                      svlen_diffs=meta.get("svlen_diffs", 0),
+                      path=meta["path"],
+                      settings=SETTINGS[meta["settings"]] if meta["settings"] else None,
+                      **cols)
+
+
+def loadCachedVCFTable(vcf_path: str, settings: SETTINGS, cache_dir: str, hash_file = False, block_size = None, threads = 1):
+    """
+    Returns the LocusTable for a vcf from the cache if it has already been parsed with the same settings.
+    Otherwise the vcf is parsed and the table is added to the cache.
+
+    :param vcf_path: VCF file path
+    :type vcf_path: str
+    :param settings: settings object the vcf is parsed with
+    :type settings: SETTINGS
+    :param cache_dir: directory holding the cache entries
+    :type cache_dir: str
+    :param hash_file: Bool for whether or not to hash the file contents for the cache key
+    :param block_size: number of bytes to read at once when parsing, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    """
+    entry_dir = os.path.join(cache_dir, cacheKey(vcf_path, settings, hash_file))
+
+    if os.path.exists(os.path.join(entry_dir, "meta.json")):
+        return readTable(entry_dir)
+
+    tab = loadVCFTable(vcf_path, settings, block_size=block_size, threads=threads)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    writeTable(tab, entry_dir)
+
+    return tab
+
+
+def loadCachedBEDTable(bed_path: str, cache_dir: str, motif_len_col = 6, motif_col = 3, hash_file = False, block_size = None, label_col = 5):
+    """
+    Returns the compiled BED catalog from the cache, compiling it on the first run. The catalog is stored as
+    memory mapped arrays (chromosome ids, start, end, motif length, and offsets into a motif string pool),
+    so loading it is instant and processes using the same catalog share it without copies.
+
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param cache_dir: directory holding the cache entries
+    :type cache_dir: str
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param motif_col: column number of the motif sequences stored in the BED file
+    :param hash_file: Bool for whether or not to hash the file contents for the cache key
+    :param block_size: number of bytes to read at once when parsing, lines are read one at a time if None
+    :param label_col: column number of the catalog label (eg. STR or VNTR) stored in the BED file
+    """
+    entry_dir = os.path.join(cache_dir, cacheKey(bed_path, None, hash_file, tag=f"BED-{motif_len_col}-{motif_col}-{label_col}"))
+
+    if os.path.exists(os.path.join(entry_dir, "meta.json")):
+        return readTable(entry_dir)
+
+    tab = loadBEDTable(bed_path, motif_len_col, block_size=block_size, motif_col=motif_col, label_col=label_col)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    writeTable(tab, entry_dir, BED_ARRAY_COLUMNS, "motif_buf")
+
+    # the compiled entry is returned, so the arrays are memory mapped the same as on later runs
+    return readTable(entry_dir)
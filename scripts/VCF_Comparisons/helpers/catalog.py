@@ -0,0 +1,118 @@
+from helpers.readers import BEDReader
+from helpers.columnar import LocusTable
+from helpers.cache import loadCachedBEDTable
+
+
+
+class CatalogReader:
+    """
+    BEDReader replacement that streams a compiled BED catalog (see loadCachedBEDTable) instead of parsing
+    the BED text. Positions and motif lengths are read from the memory mapped arrays, so lines are not split
+    or converted. cur_line holds (chrom, pos, end_pos) for the current line, and is empty once the catalog ends.
+    File positions (eg. for shards) are line numbers.
+    """
+    def __init__(self, tab: LocusTable):
+        self.tab = tab
+        self.path = tab.path
+        self.row = -1
+        self.line_loc = 0
+        self.cur_loc = 0
+        self.chrom = None
+        self.pos = None
+        self.end_pos = None
+        self.cur_line = None
+        self.prev_line = None
+
+        # chromosome names by id, the arrays are only indexed per line
+        self._chroms = tab.chroms
+        self._num_rows = len(tab)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+    def read(self):
+        """
+        Moves to the next catalog line and returns it.
+        """
+        self.row += 1
+        self.line_loc = self.row
+        self.cur_loc = self.row + 1
+        self.prev_line = self.cur_line
+
+        if self.row < self._num_rows:
+            self.chrom = self._chroms[self.tab.chrom_ids[self.row]]
+            self.pos = int(self.tab.pos[self.row])
+            self.end_pos = int(self.tab.end_pos[self.row])
+            self.cur_line = (self.chrom, self.pos, self.end_pos)
+        else:
+            self.cur_line = ()
+
+        return self.cur_line
+
+
+    def skipMetaData(self, delimiter='#', end_delimiter = None):
+        # the compiled catalog has no metadata lines
+        pass
+
+
+    def motifLen(self, motif_len_col = 6):
+        """
+        Returns the motif length of the current line.
+
+        :param motif_len_col: unused, the column is chosen when the catalog is compiled
+        """
+        return int(self.tab.motif_lens[self.row])
+
+
+    def motifStr(self, motif_col = 3):
+        """
+        Returns the motif column of the current line.
+
+        :param motif_col: unused, the column is chosen when the catalog is compiled
+        """
+        return self.tab.getMotif(self.row)
+
+
+    def label(self, label_col = 5):
+        """
+        Returns the catalog label of the current line.
+
+        :param label_col: unused, the column is chosen when the catalog is compiled
+        """
+        return self.tab.getLabel(self.row)
+
+
+    def _setFilePosition(self, file_pos: int):
+        """
+        Moves the reader so the next read returns the given line number.
+
+        :param file_pos: Description
+        :type file_pos: int
+        """
+        self.row = file_pos - 1
+        self.cur_loc = file_pos
+
+
+def openBED(bed_path: str, catalog_dir = None, motif_len_col = 6, motif_col = 3, label_col = 5, **rdr_args):
+    """
+    Returns a reader for the BED catalog. If catalog_dir is given, the catalog is compiled into catalog_dir on the
+    first run and streamed with a CatalogReader, otherwise the BED text is parsed with a BEDReader.
+
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param catalog_dir: directory for the compiled catalog
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param motif_col: column number of the motif sequences stored in the BED file
+    :param label_col: column number of the catalog label stored in the BED file
+    :param rdr_args: extra BEDReader arguments (eg. block_size)
+    """
+    if catalog_dir is None:
+        return BEDReader(bed_path, **rdr_args)
+
+    return CatalogReader(loadCachedBEDTable(bed_path, catalog_dir, motif_len_col, motif_col, label_col=label_col))
@@ -0,0 +1,66 @@
+from helpers.readers import Reader, FileIOError
+
+
+
+class ChromOrder:
+    """
+    Precomputed chromosome ranks for ordering comparisons, so chromosomes are compared as integers
+    instead of as strings. Chromosomes missing from the order have a rank of -1, and are treated as
+    coming before every chromosome in the order (records on them are skipped).
+    """
+    def __init__(self, chroms: list):
+        self.chroms = []
+        self.ranks = {}
+
+        for chrom in chroms:
+            if chrom not in self.ranks:
+                self.ranks[chrom] = len(self.chroms)
+                self.chroms.append(chrom)
+
+
+    def rank(self, chrom: str):
+        """
+        Returns the rank of the chromosome, or -1 if it is not in the order.
+
+        :param chrom: Description
+        :type chrom: str
+        """
+        return self.ranks.get(chrom, -1)
+
+
+    @classmethod
+    def fromBED(cls, bed_path: str):
+        """
+        Builds the order from the chromosomes of a BED file, in the order they first appear.
+
+        :param bed_path: BED file path
+        :type bed_path: str
+        """
+        chroms = []
+        with Reader(bed_path) as rdr:
+            line = rdr.read()
+            while line:
+                if not line.startswith(("#", "track", "browser")) and line.strip():
+                    chrom = line.split("\t", 1)[0]
+                    if not chroms or chroms[-1] != chrom:
+                        chroms.append(chrom)
+                line = rdr.read()
+
+        return cls(chroms)
+
+
+    @classmethod
+    def fromFai(cls, fai_path: str):
+        """
+        Builds the order from the sequence names of a FASTA index (.fai), in file order.
+
+        :param fai_path: FASTA index file path
+        :type fai_path: str
+        """
+        try:
+            with open(fai_path, "r") as file:
+                return cls([line.split("\t", 1)[0] for line in file if line.strip()])
+
+        except OSError as e:
+            raise FileIOError(f"File Opening Error: {e}")
+
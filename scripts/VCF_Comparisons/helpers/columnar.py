@@ -0,0 +1,542 @@
+import numpy as np
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from helpers.readers import BEDReader, BEDFormatError
+from helpers.comp_readers import COMP_VCFReader
+from helpers.batch_compare import AlleleBlock, isValidSeq
+from helpers.constants import *
+
+
+
+@dataclass
+class LocusTable:
+    """
+    Columnar form of a BED catalog or a VCF. Positions are stored as NumPy arrays indexed by line number,
+    and chromosomes are stored as ids into the chroms list. VCF tables also hold the genotype columns,
+    with shape (lines, 2 alleles), and the allele sequences are stored in a single bytes buffer
+    sliced by seq_starts and seq_ends.
+    """
+    chroms: list[str]
+    chrom_ids: np.ndarray
+    pos: np.ndarray
+    end_pos: np.ndarray
+    motif_lens: np.ndarray | None = None # BED tables only
+    motif_offsets: np.ndarray | None = None # BED tables only, motifs of line i are motif_buf[motif_offsets[i]:motif_offsets[i + 1]]
+    motif_buf: bytes = b""
+    label_ids: np.ndarray | None = None # BED tables only, catalog label of each line (eg. STR or VNTR) as ids into labels
+    labels: list[str] = field(default_factory=list)
+
+    # VCF tables only
+    is_ref: np.ndarray | None = None # 1 if the allele is the ref, 0 if it is an alt, -1 if the allele is missing
+    lens: np.ndarray | None = None
+    len_ok: np.ndarray | None = None # true where the allele length can be used for length comparisons
+    seq_ok: np.ndarray | None = None # true where the allele string can be used for levenshtein comparisons
+    seq_starts: np.ndarray | None = None
+    seq_ends: np.ndarray | None = None
+    seq_buf: bytes = b""
+    svlen_diffs: int = 0 # straglr records whose first SVLEN differs from the END - POS length
+
+    path: str | None = None
+    settings: SETTINGS | None = None
+    _chrom_idxs: dict = field(default_factory=dict, repr=False)
+
+
+    def __len__(self):
+        return len(self.pos)
+
+
+    def chromId(self, chrom: str):
+        """
+        Returns the id of the given chromosome, or -1 if it is not in the table.
+
+        :param chrom: Description
+        :type chrom: str
+        """
+        if not self._chrom_idxs:
+            self._chrom_idxs = {name: i for i, name in enumerate(self.chroms)}
+
+        return self._chrom_idxs.get(chrom, -1)
+
+
+    def getSeq(self, row: int, allele: int):
+        """
+        Returns the allele string for the given line and allele, or None if the allele has no sequence.
+
+        :param row: Description
+        :type row: int
+        :param allele: Description
+        :type allele: int
+        """
+        if self.seq_starts[row, allele] < 0:
+            return None
+
+        return self.seq_buf[self.seq_starts[row, allele]:self.seq_ends[row, allele]].decode("ascii")
+
+
+    def getMotif(self, row: int):
+        """
+        Returns the motif column of the given BED line, or an empty string if the table has no motifs.
+
+        :param row: Description
+        :type row: int
+        """
+        if self.motif_offsets is None:
+            return ""
+
+        return bytes(self.motif_buf[self.motif_offsets[row]:self.motif_offsets[row + 1]]).decode("ascii")
+
+
+    def getLabel(self, row: int):
+        """
+        Returns the catalog label of the given BED line, or an empty string if the table has no labels.
+
+        :param row: Description
+        :type row: int
+        """
+        if self.label_ids is None:
+            return ""
+
+        return self.labels[self.label_ids[row]]
+
+
+
+class _ChromIds:
+    """
+    Assigns chromosome ids in order of first appearance.
+    """
+    def __init__(self):
+        self.chroms = []
+        self.ids = {}
+
+    def get(self, chrom: str):
+        if chrom not in self.ids:
+            self.ids[chrom] = len(self.chroms)
+            self.chroms.append(chrom)
+
+        return self.ids[chrom]
+
+
+def loadBEDTable(bed_path: str, motif_len_col = 6, block_size = None, motif_col = 3, label_col = 5):
+    """
+    Reads a BED catalog into a LocusTable. The motif column is kept as a single bytes pool sliced by motif_offsets,
+    and the label column is kept as ids into the list of distinct labels.
+
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param block_size: number of bytes to read at once, lines are read one at a time if None
+    :param motif_col: column number of the motif sequences stored in the BED file
+    :param label_col: column number of the catalog label (eg. STR or VNTR) stored in the BED file
+    """
+    chrom_ids = _ChromIds()
+    label_ids = _ChromIds() # labels are interned the same way as chromosomes
+    ids, pos, end_pos, motif_lens, labels = [], [], [], [], []
+    motifs = []
+    motif_offsets = [0]
+
+    with BEDReader(bed_path, block_size=block_size) as bed:
+        bed.read()
+        bed.skipMetaData()
+
+        while bed.cur_line:
+            ids.append(chrom_ids.get(bed.chrom))
+            pos.append(bed.pos)
+            end_pos.append(bed.end_pos)
+            try:
+                motif_lens.append(int(bed.cur_line[motif_len_col]))
+            except (ValueError, IndexError):
+                raise BEDFormatError(f"ERROR: From file: {bed_path}\nMotif length column {motif_len_col} is not an integer in line: {bed.cur_line}")
+
+            motif = bed.cur_line[motif_col].encode("ascii") if motif_col < len(bed.cur_line) else b""
+            motifs.append(motif)
+            motif_offsets.append(motif_offsets[-1] + len(motif))
+            labels.append(label_ids.get(bed.cur_line[label_col] if label_col < len(bed.cur_line) else ""))
+            bed.read()
+
+    return LocusTable(chroms=chrom_ids.chroms,
+                      chrom_ids=np.array(ids, dtype=np.int32),
+                      pos=np.array(pos, dtype=np.int64),
+                      end_pos=np.array(end_pos, dtype=np.int64),
+                      motif_lens=np.array(motif_lens, dtype=np.int32),
+                      motif_offsets=np.array(motif_offsets, dtype=np.int64),
+                      motif_buf=b"".join(motifs),
+                      label_ids=np.array(labels, dtype=np.int32),
+                      labels=label_ids.chroms,
+                      path=bed_path)
+
+
+def loadVCFTable(vcf_path: str, settings: SETTINGS, block_size = None, threads = 1):
+    """
+    Reads a VCF into a LocusTable, using the COMP_VCFReader parsing for the given settings.
+    Positions have the settings offsets applied. Only the first two alleles of each genotype are kept, the same as compareGt.
+
+    :param vcf_path: VCF file path
+    :type vcf_path: str
+    :param settings: settings object for vcf reader setup
+    :type settings: SETTINGS
+    :param block_size: number of bytes to read at once, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    """
+    chrom_ids = _ChromIds()
+    ids, pos, end_pos = [], [], []
+    is_ref, lens, len_ok, seq_ok, seq_starts, seq_ends = [], [], [], [], [], []
+    seqs = []
+    buf_len = 0
+
+    with COMP_VCFReader(file_path=vcf_path, settings=settings, block_size=block_size, threads=threads) as rdr:
+        rdr.skipMetaData(end_delimiter="#CHROM")
+        rdr.VCFParse()
+
+        while not rdr.end_state:
+            gt_data = rdr.buildGtData()
+
+            ids.append(chrom_ids.get(rdr.chrom))
+            pos.append(rdr.pos)
+            end_pos.append(rdr.end_pos)
+
+            for a in range(2):
+                allele = gt_data[a] if a < len(gt_data) else None
+
+                if allele is None or allele.is_ref is None:
+                    is_ref.append(-1)
+                else:
+                    is_ref.append(1 if allele.is_ref else 0)
+
+                length = allele.length if allele is not None and allele.length is not None else 0
+                lens.append(length)
+                len_ok.append(length > 0)
+
+                if allele is not None and allele.allele_str is not None:
+                    seq = allele.allele_str.encode("ascii")
+                    seqs.append(seq)
+                    seq_starts.append(buf_len)
+                    buf_len += len(seq)
+                    seq_ends.append(buf_len)
+                    seq_ok.append(isValidSeq(allele.allele_str))
+                else:
+                    seq_starts.append(-1)
+                    seq_ends.append(-1)
+                    seq_ok.append(False)
+
+            rdr.VCFParse()
+
+        # counted by the reader while parsing every record
+        svlen_diffs = rdr.svlen_diffs
+
+    return LocusTable(chroms=chrom_ids.chroms,
+                      chrom_ids=np.array(ids, dtype=np.int32),
+                      pos=np.array(pos, dtype=np.int64),
+                      end_pos=np.array(end_pos, dtype=np.int64),
+                      is_ref=np.array(is_ref, dtype=np.int8).reshape(-1, 2),
+                      lens=np.array(lens, dtype=np.int64).reshape(-1, 2),
+                      len_ok=np.array(len_ok, dtype=bool).reshape(-1, 2),
+                      seq_ok=np.array(seq_ok, dtype=bool).reshape(-1, 2),
+                      seq_starts=np.array(seq_starts, dtype=np.int64).reshape(-1, 2),
+                      seq_ends=np.array(seq_ends, dtype=np.int64).reshape(-1, 2),
+                      seq_buf=b"".join(seqs),
+                      svlen_diffs=svlen_diffs,
+                      path=vcf_path,
+                      settings=settings)
+
+
+# LocusTable columns placed in shared memory by shareTable
+BED_COLUMNS = ("chrom_ids", "pos", "end_pos", "motif_lens")
+
+
+def shareTable(tab: LocusTable):
+    """
+    Copies the array columns of a BED LocusTable into shared memory blocks, so worker processes can use the
+    table without re-reading the BED file. Returns the list of SharedMemory objects, which must be
+    closed and unlinked by the caller once the workers are done, and a picklable spec for attachTable.
+
+    :param tab: Description
+    :type tab: LocusTable
+    """
+    shms = []
+    cols = {}
+
+    for col in BED_COLUMNS:
+        arr = getattr(tab, col)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+
+        shms.append(shm)
+        cols[col] = (shm.name, arr.shape, arr.dtype.str)
+
+    spec = {"chroms": tab.chroms, "path": tab.path, "cols": cols}
+
+    return shms, spec
+
+
+def attachTable(spec: dict):
+    """
+    Builds a read only LocusTable over shared memory blocks created by shareTable.
+    Returns the table and the list of attached SharedMemory objects, which must stay open while the table is used.
+
+    :param spec: spec returned by shareTable
+    :type spec: dict
+    """
+    shms = []
+    cols = {}
+
+    for col, (name, shape, dtype) in spec["cols"].items():
+        shm = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        arr.flags.writeable = False
+
+        shms.append(shm)
+        cols[col] = arr
+
+    return LocusTable(chroms=spec["chroms"], path=spec["path"], **cols), shms
+
+
+def _walkMatches(bed_starts: np.ndarray, bed_ends: np.ndarray, vcf_starts: np.ndarray, vcf_ends: np.ndarray):
+    """
+    Matches the BED lines of a chromosome to its VCF lines the way the streaming readers do, one line at a time:
+    VCF lines that end before the BED start are passed over, the current VCF line is matched if it does not start after the BED end,
+    and a matched VCF line is used up. Returns the matched VCF position (into vcf_starts) for each BED line, or -1 if there is no match.
+
+    :param bed_starts: BED start positions, in catalog order
+    :type bed_starts: np.ndarray
+    :param bed_ends: Description
+    :type bed_ends: np.ndarray
+    :param vcf_starts: VCF start positions, sorted
+    :type vcf_starts: np.ndarray
+    :param vcf_ends: Description
+    :type vcf_ends: np.ndarray
+    """
+    match = np.full(len(bed_starts), -1, dtype=np.int64)
+    vcf_starts, vcf_ends = vcf_starts.tolist(), vcf_ends.tolist()
+    n_vcf = len(vcf_starts)
+    cur = 0
+
+    for b, (bed_start, bed_end) in enumerate(zip(bed_starts.tolist(), bed_ends.tolist())):
+        while cur < n_vcf and vcf_ends[cur] < bed_start:
+            cur += 1
+
+        if cur < n_vcf and vcf_starts[cur] <= bed_end:
+            match[b] = cur
+            cur += 1
+
+    return match
+
+
+def matchToBed(bed_tab: LocusTable, vcf_tab: LocusTable):
+    """
+    Matches each BED line to a VCF line with an array join, using the same rules as syncToBed:
+    the first VCF line (by position) that does not end before the BED start is matched,
+    if it does not start after the BED end. Each VCF line is matched to at most one BED line, the first one it is matched to,
+    the same as the streaming readers that move past a line once it is compared (eg. for overlapping catalog loci).
+    Returns the matched VCF line index for each BED line, or -1 if there is no match.
+
+    :param bed_tab: Description
+    :type bed_tab: LocusTable
+    :param vcf_tab: Description
+    :type vcf_tab: LocusTable
+    """
+    match = np.full(len(bed_tab), -1, dtype=np.int64)
+
+    for bed_cid, chrom in enumerate(bed_tab.chroms):
+        vcf_cid = vcf_tab.chromId(chrom)
+        if vcf_cid < 0:
+            continue
+
+        bed_rows = np.flatnonzero(bed_tab.chrom_ids == bed_cid)
+        vcf_rows = np.flatnonzero(vcf_tab.chrom_ids == vcf_cid)
+        vcf_rows = vcf_rows[np.argsort(vcf_tab.pos[vcf_rows], kind="stable")]
+        vcf_ends = vcf_tab.end_pos[vcf_rows]
+
+        # running max of the end positions, so the first line that reaches the bed start can be found with a binary search
+        max_ends = np.maximum.accumulate(vcf_ends)
+        idxs = np.searchsorted(max_ends, bed_tab.pos[bed_rows], side="left")
+
+        in_range = idxs < len(vcf_rows)
+        cand_idxs = np.minimum(idxs, len(vcf_rows) - 1)
+        matched = in_range & (vcf_tab.pos[vcf_rows[cand_idxs]] <= bed_tab.end_pos[bed_rows])
+
+        # the binary search gives the streaming result when the end positions are sorted and no VCF line is matched twice,
+        # otherwise (eg. nested records, or overlapping catalog loci) the chromosome is matched one line at a time
+        if np.any(np.diff(vcf_ends) < 0) or np.any(np.diff(cand_idxs[matched]) <= 0):
+            cand_idxs = _walkMatches(bed_tab.pos[bed_rows], bed_tab.end_pos[bed_rows], vcf_tab.pos[vcf_rows], vcf_ends)
+            matched = cand_idxs >= 0
+
+        match[bed_rows[matched]] = vcf_rows[cand_idxs[matched]]
+
+    return match
+
+
+class IntervalIndex:
+    """
+    Per chromosome interval index over the lines of a LocusTable. Lines are sorted by start position, and each
+    chromosome keeps the running max of the end positions and its longest interval, so the range of lines that can
+    overlap a query is found with binary searches. Only the lines in that range are checked, which is
+    O(log n + k) for k overlaps unless a few very long intervals span most of the chromosome.
+    """
+    def __init__(self, tab: LocusTable):
+        self.tab = tab
+        self.chroms = {}
+
+        for cid, chrom in enumerate(tab.chroms):
+            rows = np.flatnonzero(tab.chrom_ids == cid)
+            rows = rows[np.argsort(tab.pos[rows], kind="stable")]
+
+            starts = tab.pos[rows]
+            ends = tab.end_pos[rows]
+
+            self.chroms[chrom] = (rows, starts, ends, np.maximum.accumulate(ends), int((ends - starts).max()))
+
+
+    def overlaps(self, chrom: str, starts: np.ndarray, ends: np.ndarray):
+        """
+        Finds every line that overlaps each query interval on the given chromosome (ends are inclusive, the same as syncToBed).
+        Returns (query indices, line indices) pairs, sorted by query and then by line start position.
+
+        :param chrom: Description
+        :type chrom: str
+        :param starts: query start positions
+        :type starts: np.ndarray
+        :param ends: query end positions
+        :type ends: np.ndarray
+        """
+        if chrom not in self.chroms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        rows, line_starts, line_ends, max_ends, max_len = self.chroms[chrom]
+
+        # lines before lo all end before the query start, either by the running max end or by the longest interval
+        lo = np.maximum(np.searchsorted(max_ends, starts, side="left"),
+                        np.searchsorted(line_starts, starts - max_len, side="left"))
+        # lines from hi on all start after the query end
+        hi = np.searchsorted(line_starts, ends, side="right")
+
+        counts = np.maximum(hi - lo, 0)
+        queries = np.repeat(np.arange(len(starts)), counts)
+        cands = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+
+        keep = line_ends[cands] >= starts[queries]
+
+        return queries[keep], rows[cands[keep]]
+
+
+def reciprocalOverlap(starts1: np.ndarray, ends1: np.ndarray, starts2: np.ndarray, ends2: np.ndarray):
+    """
+    Returns the reciprocal overlap of each pair of intervals, the overlap length divided by the longer interval length.
+
+    :param starts1: Description
+    :type starts1: np.ndarray
+    :param ends1: Description
+    :type ends1: np.ndarray
+    :param starts2: Description
+    :type starts2: np.ndarray
+    :param ends2: Description
+    :type ends2: np.ndarray
+    """
+    overlap = np.maximum(np.minimum(ends1, ends2) - np.maximum(starts1, starts2), 0)
+    longest = np.maximum(np.maximum(ends1 - starts1, ends2 - starts2), 1)
+
+    return overlap / longest
+
+
+def matchOverlaps(bed_tab: LocusTable, vcf_tab: LocusTable, min_overlap = None, match_method = MATCH_METHOD.FIRST, index = None):
+    """
+    Matches each BED line to one of the VCF lines that overlap it, using an IntervalIndex over the VCF table.
+    Every overlapping line is considered, so nested catalog loci and callers with several records per locus are matched
+    independently of the file order. If min_overlap is given, only lines with at least that reciprocal overlap are kept.
+    With MATCH_METHOD.FIRST and no min_overlap the matches are the same as matchToBed.
+    Returns the matched VCF line index for each BED line (-1 if there is no match), and the number of overlapping VCF lines for each BED line.
+
+    :param bed_tab: Description
+    :type bed_tab: LocusTable
+    :param vcf_tab: Description
+    :type vcf_tab: LocusTable
+    :param min_overlap: minimum reciprocal overlap fraction (eg. 0.5), any overlap is accepted if None
+    :param match_method: rule for picking between overlapping lines
+    :type match_method: MATCH_METHOD
+    :param index: IntervalIndex of the VCF table, built if None
+    """
+    index = IntervalIndex(vcf_tab) if index is None else index
+
+    match = np.full(len(bed_tab), -1, dtype=np.int64)
+    n_overlaps = np.zeros(len(bed_tab), dtype=np.int64)
+
+    for bed_cid, chrom in enumerate(bed_tab.chroms):
+        bed_rows = np.flatnonzero(bed_tab.chrom_ids == bed_cid)
+        bed_starts = bed_tab.pos[bed_rows]
+        bed_ends = bed_tab.end_pos[bed_rows]
+
+        queries, vcf_rows = index.overlaps(chrom, bed_starts, bed_ends)
+
+        if min_overlap is not None or match_method == MATCH_METHOD.BEST_OVERLAP:
+            overlap = reciprocalOverlap(bed_starts[queries], bed_ends[queries], vcf_tab.pos[vcf_rows], vcf_tab.end_pos[vcf_rows])
+
+            if min_overlap is not None:
+                keep = overlap >= min_overlap
+                queries, vcf_rows, overlap = queries[keep], vcf_rows[keep], overlap[keep]
+
+            if match_method == MATCH_METHOD.BEST_OVERLAP:
+                # largest overlap first, ties keep the position order
+                order = np.lexsort((np.arange(len(queries)), -overlap, queries))
+                queries, vcf_rows = queries[order], vcf_rows[order]
+
+        n_overlaps[bed_rows] = np.bincount(queries, minlength=len(bed_rows))
+
+        # pairs are grouped by query, so the first pair of each query is its match
+        matched, first = np.unique(queries, return_index=True)
+        match[bed_rows[matched]] = vcf_rows[first]
+
+    return match, n_overlaps
+
+
+def bedDiffs(bed_tab: LocusTable, vcf_tab: LocusTable, match: np.ndarray):
+    """
+    Returns the BDDIST start and end differences for every BED line, and the mask of lines with no match.
+
+    :param bed_tab: Description
+    :type bed_tab: LocusTable
+    :param vcf_tab: Description
+    :type vcf_tab: LocusTable
+    :param match: matched VCF line indices from matchToBed
+    :type match: np.ndarray
+    """
+    na = match < 0
+    rows = np.where(na, 0, match)
+
+    start_diff = np.where(na, 0, bed_tab.pos - vcf_tab.pos[rows])
+    end_diff = np.where(na, 0, bed_tab.end_pos - vcf_tab.end_pos[rows])
+
+    return start_diff, end_diff, na
+
+
+def gatherAlleleBlock(vcf_tabs: list[LocusTable], matches: list[np.ndarray], rows = slice(None)):
+    """
+    Builds an AlleleBlock for the given BED lines directly from the VCF tables, without creating alleleData objects.
+    Alleles are not trimmed.
+
+    :param vcf_tabs: Description
+    :type vcf_tabs: list[LocusTable]
+    :param matches: matched VCF line indices from matchToBed, one array per VCF table
+    :type matches: list[np.ndarray]
+    :param rows: BED lines to include in the block
+    """
+    block_matches = np.stack([match[rows] for match in matches], axis=1) # (loci, readers)
+    active = block_matches >= 0
+    n_loci, n_rdrs = block_matches.shape
+
+    seqs = np.full((n_loci, n_rdrs, 2), None, dtype=object)
+    seq_ok = np.zeros((n_loci, n_rdrs, 2), dtype=bool)
+    lens = np.zeros((n_loci, n_rdrs, 2), dtype=np.int64)
+    len_ok = np.zeros((n_loci, n_rdrs, 2), dtype=bool)
+
+    for r, tab in enumerate(vcf_tabs):
+        loci = np.flatnonzero(active[:, r])
+        vcf_rows = block_matches[loci, r]
+
+        lens[loci, r] = tab.lens[vcf_rows]
+        len_ok[loci, r] = tab.len_ok[vcf_rows]
+        seq_ok[loci, r] = tab.seq_ok[vcf_rows]
+
+        # only decode the sequences that will be compared
+        for l, a in zip(*np.nonzero(seq_ok[:, r])):
+            seqs[l, r, a] = tab.getSeq(block_matches[l, r], a)
+
+    return AlleleBlock(seqs, seq_ok, lens, len_ok, active)
@@ -1,23 +1,60 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from helpers.readers import *
-from helpers.constants import SETTINGS, ORDER_METHOD
+from helpers.constants import SETTINGS, ORDER_METHOD, INFO_KEYS
 
 
-@dataclass
+@dataclass(slots=True)
 class alleleData:
     """
-    Docstring for alleleData
+    Data of a single genotype allele. Uses slots since one is allocated per allele of every compared record.
     """
     allele_str: str | None = None
     is_ref: bool | None = None
     length: int = 0
-    start_trim = 0 
-    end_trim = 0
+    ru_idxs: tuple | None = None # repeat unit indices into ru_mots, for alleles built from motif annotations (eg. vamos)
+    ru_mots: tuple | None = None
+    start_trim: int = 0 # trim amounts set by addTrimData, start_trim is positive and end_trim is negative (0 for no trim)
+    end_trim: int = 0
+
+
+def parseIntList(value):
+    """
+    Returns the comma separated integers of an INFO value (eg. straglr RB=42,60) as a tuple, one per alt,
+    with None for entries that are not integers (eg. '.'). Returns an empty tuple if the value is missing.
+
+    :param value: INFO value string, or None/True for missing and flag fields
+    """
+    if not value or value is True:
+        return ()
+
+    return tuple(int(val) if val.lstrip("-").isdigit() else None for val in value.split(","))
+
+
+@lru_cache(maxsize=None)
+def fileChroms(file_path: str):
+    """
+    Returns the set of chromosomes with records in a vcf, from a single pass over the file.
+    Results are kept for the life of the process, so each worker only scans a file once.
+
+    :param file_path: Description
+    :type file_path: str
+    """
+    chroms = set()
+    with Reader(file_path) as rdr:
+        line = rdr.read()
+        while line:
+            if not line.startswith("#"):
+                chroms.add(line.split("\t", 1)[0])
+            line = rdr.read()
+
+    return chroms
 
 
 class COMP_VCFReader(VCFReader):
+    indexed = False # true for readers that fetch records by position instead of streaming the file
     
-    def __init__(self, file_path, settings = None, pause = False):
+    def __init__(self, file_path, settings = None, pause = False, block_size = None, threads = 1, chrom_order = None, prefetch = None):
         """
         Docstring for __init__
         
@@ -25,33 +62,67 @@ class COMP_VCFReader(VCFReader):
         :param file_path: Description
         :param settings: Description
         :param pause: Description
+        :param block_size: number of bytes to read at once, lines are read one at a time if None
+        :param threads: number of decompression threads for .gz files in block mode
+        :param chrom_order: ChromOrder used for comparing chromosomes, chromosome names are compared as strings (ASCII order) if None
+        :param prefetch: number of line batches to read ahead in a background thread, lines are read when they are needed if None
         """
-        super().__init__(file_path)
+        super().__init__(file_path, block_size=block_size, threads=threads, prefetch=prefetch)
         self.start_off = settings.start_offset
         self.end_off = settings.end_offset
         self.pause = pause
         self.skip_num = 0
         self.end_state = False
         self.settings = settings
-        self.gt_data = None
+        self._gt_data = None # genotype data of the current record, built on first use (see buildGtData)
+        self._gt_col = None
+        self.info_keys = INFO_KEYS.get(settings)
+        self.alt_annos = [] # (repeat unit indices, motifs) of each alt, for callers that annotate alleles by motif
+        self.rb_lens = () # straglr read based allele sizes (RB) of the current record, one per alt
+        self.sv_lens = () # straglr SVLEN values of the current record, one per alt
+        self.svlen_diffs = 0 # parsed straglr records where the first SVLEN differs from the END - POS length
+        self.chrom_order = chrom_order
+
+
+    @property
+    def gt_data(self):
+        """
+        Genotype data of the current record. It is only built the first time it is used for a record,
+        so records that are skipped or paused over are never built. Later uses return the kept data without
+        calling buildGtData, so the profiler only times (and counts) the builds.
+        """
+        if self._gt_data is not None:
+            return self._gt_data
+
+        return self.buildGtData()
+
+
+    @gt_data.setter
+    def gt_data(self, gt_data):
+        self._gt_data = gt_data
 
 
     def buildGtData(self, sample_col=9, ref=None, alt = None):
         """
-        Creates list containing 
+        Creates list containing the alleleData of each genotype allele of the current record.
+        The result is kept until the next record is parsed, so repeated calls for the same record return the same list.
         
         
         :param sample_col: Description
         :param ref: Description
         :param alt: Description
         """
+        # the genotype of this record has already been built
+        if self._gt_data is not None and self._gt_col == sample_col:
+            return self._gt_data
+
         try:
             # use class parameters unless otherwise specified
             ref = self.ref if not ref else ref
             alt = self.alt if not alt else alt
             
-            # split line into list for easy data grabbing
-            ls = self._raw_line.strip().split("\t")
+            # reuse the fields split by formatLine/specialFormat instead of splitting the raw line again
+            ls = self.cur_line
 
             # grab genotype indices from current line
             sample_str = ls[sample_col]
@@ -81,9 +152,13 @@ class COMP_VCFReader(VCFReader):
                 elif gt_idx > 0:
                     ad.is_ref = False
 
+                    # keep the motif annotation of the alt so it can be compared without its sequence
+                    if gt_idx <= len(self.alt_annos):
+                        ad.ru_idxs, ad.ru_mots = self.alt_annos[gt_idx - 1]
+
                 # custom handling for straglr since it does not contain sequences
                 if self.settings == SETTINGS.STRAGLR:
-                    ad.length = self._handleStraglrLen(ad.is_ref)
+                    ad.length = self._handleStraglrLen(gt_idx)
 
                 elif ad.allele_str is not None:
                     ad.length = len(ad.allele_str)
@@ -93,7 +168,8 @@ class COMP_VCFReader(VCFReader):
                 # add the allele data object to the genotype 
                 gt_data.append(ad)
                 
-            self.gt_data = gt_data
+            self._gt_data = gt_data
+            self._gt_col = sample_col
 
             return gt_data
         
@@ -115,33 +191,37 @@ class COMP_VCFReader(VCFReader):
         if self.prev_line and not self.prev_line[0].startswith("#"):
             prev_chrom = self.prev_line[0]
 
-            # ensure vcf is in order
-            if self.chrom < prev_chrom and order_method == ORDER_METHOD.ASCII:
+            # ensure vcf is in order, chromosomes missing from the rank table are skipped so they are not checked
+            if self.chrom_order is not None:
+                cur_rank = self.chrom_order.rank(self.chrom)
+                if 0 <= cur_rank < self.chrom_order.rank(prev_chrom):
+                    raise VCFFormatError(f"\n{self.path} is not in the chromosome order of the catalog ({prev_chrom} before {self.chrom}).")
+
+            elif self.chrom < prev_chrom and order_method == ORDER_METHOD.ASCII:
                 raise VCFFormatError(f"\n{self.path} using unknown order.")
 
 
-    def constructAlt(self, info: str):
+    def constructAlt(self, info: dict):
         """
         Docstring for constructAlt
         
         
         :param info: Description
-        :type info: str
+        :type info: dict
         """
         alt = []
+        self.alt_annos = []
 
         if self.settings == SETTINGS.VAMOS:
-            for i, str in enumerate(info): # loop over info and grab data for constructing allele sequence        
-                if "RU" in str:
-                    mot_list = info[i].removeprefix("RU=").split(",")
-
-                if "ALTANNO_H1" in str:
-                    mot_idxs = info[i].removeprefix("ALTANNO_H1=").split("-")
-                    alt.append(self._constructAllele(mot_idxs, mot_list))
+            # grab data for constructing allele sequence
+            mot_list = tuple(info.get("RU", "").split(","))
 
-                if "ALTANNO_H2" in str:
-                    mot_idxs = info[i].removeprefix("ALTANNO_H2=").split("-")
-                    alt.append(self._constructAllele(mot_idxs, mot_list))
+            for key in ("ALTANNO_H1", "ALTANNO_H2"):
+                mot_idxs = info.get(key)
+                if mot_idxs:
+                    idxs = tuple(int(idx) for idx in mot_idxs.split("-"))
+                    alt.append(self._constructAllele(idxs, mot_list))
+                    self.alt_annos.append((idxs, mot_list))
 
         else:
             alt = [None] # functions in super class expect alt to be a list 
@@ -164,10 +244,8 @@ class COMP_VCFReader(VCFReader):
             try:       
                 pos = int(line_list[1]) 
 
-                info_col = line_list[7].split(';') # grab the INFO column
-                for i, str in enumerate(info_col): # seach for end position marker      
-                    if "END=" in str:
-                        end_str = info_col[i].removeprefix("END=")
+                info = parseInfo(line_list[7], self.info_keys) # grab the INFO column
+                end_str = info.get("END", "") # search for end position marker
 
                 if end_str.isdigit():
                     end_pos = int(end_str)
@@ -179,8 +257,17 @@ class COMP_VCFReader(VCFReader):
                 self.pos = pos    
                 self.end_pos = end_pos 
                 self.ref = line_list[3] if not self.settings.pos_only else None
-                self.alt = self.constructAlt(info_col)                
-                self.info = info_col
+                self.alt = self.constructAlt(info)                
+                self.info = info
+
+                # straglr has no allele sequences, so its allele sizes are parsed once per record for buildGtData
+                if self.settings == SETTINGS.STRAGLR:
+                    self.rb_lens = parseIntList(info.get("RB"))
+                    self.sv_lens = parseIntList(info.get("SVLEN"))
+
+                    # validate SVLEN against the record positions for every parsed record, compared or not
+                    if self._svLenDiffers():
+                        self.svlen_diffs += 1
 
                     
             except IndexError:
@@ -212,6 +299,7 @@ class COMP_VCFReader(VCFReader):
             if not self.pause:  
                 format_method = self.specialFormat if self.settings != SETTINGS.OFFSET_START and self.settings != SETTINGS.DEFAULT else self.formatLine
                 line = super().read(format_method)  
+                self._gt_data = None # genotype data is rebuilt for the new record when it is used
 
                 # Offset Handling
                 # if the vals have been set already
@@ -241,12 +329,11 @@ class COMP_VCFReader(VCFReader):
         # check VCF chromosome ordering
         self.checkOrder(order_method)
 
-        # Run Alingment Checks
-        chrom_match = (self.chrom == bed.chrom)
+        # unpause so a line held from a previous bed position can be skipped if the bed has moved past it
+        self.pause = False
 
         # if vcf position is behind the bed, or the vcf chrom is behind, loop until the vcf catches up         
-        while (((self.end_pos < bed.pos) and chrom_match) or (self.chrom < bed.chrom)) \
-            and not self.end_state:
+        while self._isBehind(bed.chrom, bed.pos) and not self.end_state:
 
             # move the file line forward until it is no longer behind, or the end of the file is reached
             self.VCFParse()
@@ -254,13 +341,12 @@ class COMP_VCFReader(VCFReader):
 
             self.skip_num += 1
 
-        # build the most current line's genotype data
-        if not self.end_state:
-            self.buildGtData()
+        # Run Alingment Checks
+        chrom_diff = self._chromDiff(bed.chrom)
 
         # if vcf position is ahead of bed position range, or if the vcf chrom is ahead, then pause operations
-        if ((self.pos > bed.end_pos) and chrom_match) or \
-            (self.chrom > bed.chrom):
+        if ((self.pos > bed.end_pos) and chrom_diff == 0) or \
+            (chrom_diff > 0):
 
             self.pause = True # pause vcf from being able to move to the next line or run comparisons
 
@@ -268,6 +354,63 @@ class COMP_VCFReader(VCFReader):
             self.pause = False
 
 
+    def seekLocus(self, chrom: str, pos: int, order_method="ASCII"):
+        """
+        Moves the reader forward until it is no longer behind the given locus, without counting 
+        the passed lines as skips. Used to place a reader at the start of a catalog shard.
+        Raises a VCFFormatError if it stops on another chromosome while the file has records for the locus chromosome,
+        since those records come after a chromosome that is ordered later (eg. chr2 and chr10 compared as strings).
+        
+        :param chrom: Chromosome of the locus to move to
+        :type chrom: str
+        :param pos: Start position of the locus to move to
+        :type pos: int
+        :param order_method: Description
+        """
+        while self._isBehind(chrom, pos) and not self.end_state:
+            self.VCFParse()
+            self.checkOrder(order_method)
+
+        # the file is only scanned when the reader stops on another chromosome, eg. the vcf has no records for it
+        if not self.end_state and self.chrom != chrom and chrom in fileChroms(self.path):
+            raise VCFFormatError(f"\n{self.path} has records for {chrom} after {self.chrom}, "
+                                 f"so it is not in the chromosome order of the catalog.")
+
+
+    def _isBehind(self, chrom: str, pos: int):
+        """
+        Returns true if the current record ends before the given position on the same chromosome, 
+        or if the current record is on an earlier chromosome.
+        
+        :param chrom: Chromosome to compare against
+        :type chrom: str
+        :param pos: Start position to compare against
+        :type pos: int
+        """
+        chrom_diff = self._chromDiff(chrom)
+
+        return ((self.end_pos < pos) and chrom_diff == 0) or (chrom_diff < 0)
+
+
+    def _chromDiff(self, chrom: str):
+        """
+        Returns 0 if the current record is on the given chromosome, a negative number if the current record is on
+        an earlier chromosome, and a positive number if it is on a later chromosome. Chromosomes are compared
+        by their rank in chrom_order, or as strings if there is no chrom_order. This is the only place chromosomes are ordered.
+        
+        :param chrom: Chromosome to compare against
+        :type chrom: str
+        """
+        if self.chrom == chrom:
+            return 0
+
+        if self.chrom_order is None:
+            return -1 if self.chrom < chrom else 1
+
+        # records on chromosomes missing from the order (rank -1) are always behind, so they are skipped
+        return -1 if self.chrom_order.rank(self.chrom) <= self.chrom_order.rank(chrom) else 1
+
+
     def _checkIdx(self, idx):
         """
         Docstring for _checkIdx
@@ -281,15 +424,15 @@ class COMP_VCFReader(VCFReader):
             return int(idx)
         
 
-    def _constructAllele(self, idxs: list, mots: list):
+    def _constructAllele(self, idxs: tuple, mots: tuple):
         """
         Docstring for _constructAllele
         
         
         :param idxs: Description
-        :type idxs: list
+        :type idxs: tuple
         :param mots: Description
-        :type mots: list
+        :type mots: tuple
         """
         allele = ""
         for idx in idxs:
@@ -298,17 +441,33 @@ class COMP_VCFReader(VCFReader):
         return allele
 
 
-    def _handleStraglrLen(self, is_ref, use_svlen = False):
-        if is_ref:
-            ref_len = 0
-            if use_svlen:
-                for i, str in enumerate(self.info): # loop over infor and grab data for constructing allele sequence        
-                    if "SVLEN" in str:
-                        ref_len = int(self.info[i].removeprefix("SVLEN=").split(","))
-            else:
-                ref_len = self.end_pos - self.pos 
-            return ref_len
-        else:
-            for i, str in enumerate(self.info): # loop over info and grab number of bases   
-                if "RB" in str:
-                    return int(self.info[i].removeprefix("RB=").replace(',', ""))
\ No newline at end of file
+    def _handleStraglrLen(self, gt_idx: int, use_svlen = False):
+        """
+        Returns the length of a straglr allele, from the parsed RB sizes for alts, or from the record positions for the ref.
+        Returns 0 (no length) for missing alleles and alts without an RB size.
+
+        :param gt_idx: genotype index of the allele (0 ref, 1+ alt, -1 missing)
+        :type gt_idx: int
+        :param use_svlen: Bool for whether or not to take the ref length from the first SVLEN (the reference length of the locus) instead of END - POS
+        """
+        if gt_idx == 0:
+            if use_svlen and self.sv_lens and self.sv_lens[0] is not None:
+                return self.sv_lens[0]
+
+            return self.end_pos - self.pos
+
+        # RB holds one size per alt, in the same order as the alt indices
+        if 0 < gt_idx <= len(self.rb_lens) and self.rb_lens[gt_idx - 1] is not None:
+            return self.rb_lens[gt_idx - 1]
+
+        return 0
+
+
+    def _svLenDiffers(self):
+        """
+        Returns true if the first SVLEN of the current straglr record differs from its END - POS length.
+        Straglr writes SVLEN as the reference length of the locus (not the size change of the alt), so the two should match.
+        Records without SVLEN or END are not checked.
+        """
+        return bool(self.sv_lens) and self.sv_lens[0] is not None and self.end_pos is not None and \
+            self.sv_lens[0] != self.end_pos - self.pos
@@ -0,0 +1,697 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+import numpy as np
+from helpers.readers import BEDReader
+from helpers.columnar import LocusTable, loadBEDTable, loadVCFTable, matchToBed, matchOverlaps, bedDiffs, gatherAlleleBlock, shareTable, attachTable
+from helpers.cache import loadCachedVCFTable, loadCachedBEDTable
+from helpers.catalog import openBED
+from helpers.chrom_order import ChromOrder
+from helpers.batch_compare import buildAlleleBlock, compareGtBlock
+from helpers.writers import TSVCompWriter, NpzCompWriter, openCompWriter, readCompArrays
+from helpers.motif_compare import parseMotifs
+from helpers.summary import SummaryStats
+from helpers.utils import *
+from helpers.constants import *
+
+
+
+@dataclass
+class Shard:
+    """
+    Slice of the BED catalog that is compared by a single worker.
+    """
+    index: int
+    chrom: str
+    pos: int
+    file_pos: int # BED file position of the first line in the shard
+    num_rows: int = 0
+    next_locus: tuple[str, int] | None = None # (chrom, pos) of the first line in the following shard
+
+
+def compareLoci(bed: BEDReader, vcf_rdrs: list[COMP_VCFReader], bdof, lvdof, ldof,
+                motif_len_col = 6, trim_alleles = False, row_limit = None, writer = None, lv_max_dist = None, lv_band = None,
+                lv_method = COMP_METHOD.LEVENSHTEIN, motif_col = 3, profiler = None, summary = None, label_col = 5, gt_block_size = None):
+    """
+    Main comparison loop. Syncs every vcf reader to each BED line, runs the BED-VCF and VCF-VCF comparisons,
+    and writes the results to the output files. Runs until the BED file ends, or until row_limit BED lines have been compared.
+    If a comparison writer (eg. NpzCompWriter) is given, rows are written to it instead of the output files.
+    If gt_block_size is given, the VCF-VCF comparisons of gt_block_size BED lines are run at once with compareGtBlock,
+    and the rows are written once their block is compared. Returns the number of BED lines compared.
+
+    :param bed: BED reader, already positioned on the first line to compare
+    :type bed: BEDReader
+    :param vcf_rdrs: VCF readers, with the first line already parsed
+    :type vcf_rdrs: list[COMP_VCFReader]
+    :param bdof: BED-VCF comparison output file
+    :param lvdof: Levenshtein comparison output file
+    :param ldof: Length comparison output file
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param trim_alleles: Bool for whether or not to trim alleles while comparing
+    :param row_limit: max number of BED lines to compare
+    :param writer: comparison writer, a TSVCompWriter over the output files is used if None
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param lv_method: COMP_METHOD.LEVENSHTEIN, or COMP_METHOD.MOTIF for approximate distances from repeat unit counts
+    :param motif_col: column number of the motif sequences stored in the BED file, used by COMP_METHOD.MOTIF
+    :param profiler: StageProfiler for timing the comparisons and output writes, the readers are instrumented separately
+    :param summary: SummaryStats to add every output row to
+    :param label_col: column number of the catalog label (eg. STR or VNTR) stored in the BED file, used by the summary
+    :param gt_block_size: number of BED lines to compare genotypes for at once, only used with COMP_METHOD.LEVENSHTEIN
+    """
+    rows = 0
+    motifs = ()
+    motif_len = None
+
+    if writer is None:
+        writer = TSVCompWriter(bdof, lvdof, ldof)
+
+    # genotype comparison function for each pair of readers, timed per pair when profiling
+    compare_fns = {}
+    if profiler is not None:
+        profiler.instrumentWriter(writer)
+        compare_fns = {(i, j): profiler.compare(compareGt, vcf_rdrs[i], vcf_rdrs[j])
+                       for i in range(len(vcf_rdrs)) for j in range(i + 1, len(vcf_rdrs))}
+
+    # rows waiting on the genotype comparisons of their block, as (chrom, pos, end_pos, motif_len, label, bd_vals, gt_data of each reader)
+    block_gts = gt_block_size is not None and lv_method == COMP_METHOD.LEVENSHTEIN
+    pending = []
+
+    def compareBlockGts(block):
+        alleles = buildAlleleBlock(block, trim_alleles)
+        return compareGtBlock(alleles, max_dist=lv_max_dist, band=lv_band)
+
+    if profiler is not None:
+        compareBlockGts = profiler.timed(compareBlockGts, "all callers", "block_compare")
+
+    def flushBlock():
+        if not pending:
+            return
+
+        lv_dist, lv_na, ln_dist, ln_na = compareBlockGts([row[-1] for row in pending])
+
+        # flatten the pairs into the output column layout, with "NA" for missing values
+        n_rows = len(pending)
+        lv_rows = zip(lv_dist.reshape(n_rows, -1).tolist(), lv_na.reshape(n_rows, -1).tolist())
+        ln_rows = zip(ln_dist.reshape(n_rows, -1).tolist(), ln_na.reshape(n_rows, -1).tolist())
+
+        for (chrom, pos, end_pos, motif_len, label, bd_vals, _), (lv_row, lv_row_na), (ln_row, ln_row_na) in zip(pending, lv_rows, ln_rows):
+            lv_vals = ["NA" if na else dist for dist, na in zip(lv_row, lv_row_na)]
+            ln_vals = ["NA" if na else diff for diff, na in zip(ln_row, ln_row_na)]
+
+            writer.writeRow(chrom, pos, end_pos, motif_len, bd_vals, lv_vals, ln_vals)
+
+            if summary is not None:
+                summary.addRow(chrom, motif_len, label, bd_vals, lv_vals, ln_vals)
+
+        pending.clear()
+
+    while bed.cur_line and (row_limit is None or rows < row_limit): # loop until BED file reaches end
+        bd_vals = []
+        # pd_vals = []
+        lv_vals = []
+        ln_vals = []
+        lv_memo = {} # levenshtein results by allele string pair, so alleles shared by callers are only compared once per locus
+
+
+        if bed.prev_line is None or bed.chrom != bed.prev_line[0]:
+            print(f"Comparing {bed.chrom}")
+
+        # grab the catalog motifs for comparing alleles by their repeat units
+        if lv_method == COMP_METHOD.MOTIF:
+            motifs = parseMotifs(bed.motifStr(motif_col))
+            motif_len = bed.motifLen(motif_len_col)
+            motif_len = int(motif_len) if str(motif_len).isdigit() else None
+
+
+        # cycle through all vcf files and ensure they are synced to the bed
+        [reader.syncToBed(bed) for reader in vcf_rdrs]
+
+        # Run comparisons on each VCF
+        for i, reader in enumerate(vcf_rdrs):
+
+            # VCF-BED Comparisons
+            if reader.pause or reader.end_state: # if the vcf skipped the current line or has ended
+                bd_vals += ("NA", "NA")
+            else:
+                # BDDIST: compare vcf ref position with bed
+                start_diff = bed.pos - reader.pos
+                end_diff = bed.end_pos - reader.end_pos
+
+                # add trim amounts to allele Data
+                reader.addTrimData(start_diff, end_diff) # only the trim amounts are passed, allele data is not actually trimmed here
+
+                bd_vals += (start_diff, end_diff)
+
+
+            # VCF-VCF Comparisons, run later for the whole block when comparing in blocks
+            if block_gts:
+                continue
+
+            for j, other_reader in enumerate(vcf_rdrs[i + 1:], start=i + 1):
+                # if both readers are not paused or ended
+                if stateCheck(reader) and stateCheck(other_reader):
+                    compare = compare_fns.get((i, j), compareGt)
+
+                    # LVDIST: calculate levenshtein distance of alleles between vcf files
+                    gt_lvdiff, a1_lvdiff, a2_lvdiff, order = compare(reader.gt_data,
+                                                                other_reader.gt_data,
+                                                                comp_method=lv_method,
+                                                                trim=trim_alleles,
+                                                                max_dist=lv_max_dist,
+                                                                band=lv_band,
+                                                                memo=lv_memo,
+                                                                motifs=motifs,
+                                                                motif_len=motif_len)
+                    lv_vals += (a1_lvdiff, a2_lvdiff)
+
+                    # LENDIST: calculate difference in allele lengths between vcf files
+                    gt_ldiff, a1_ldiff, a2_ldiff, order = compare(reader.gt_data,
+                                                            other_reader.gt_data,
+                                                            comp_method=COMP_METHOD.LENGTH,
+                                                            comp_ord=order,
+                                                            trim=trim_alleles)
+                    ln_vals += (a1_ldiff, a2_ldiff)
+
+                    # if a1_ldiff > a1_lvdiff or a2_ldiff > a2_lvdiff:
+                    #    raise Exception("\nFATAL PROGRAM ERROR\nLength difference between strings greater than Levenshtein distance.")
+
+                    # POSDIST: calculate difference in positions between vcf files
+                    # vcf_start_diff = reader.pos - other_reader.pos
+                    # vcf_end_diff = reader.end_pos - other_reader.end_pos
+                    # pd_vals += (vcf_start_diff, vcf_end_diff)
+
+                else:
+                    lv_vals += ("NA", "NA")
+                    ln_vals += ("NA", "NA")
+                    # pd_vals += ("NA", "NA")
+
+
+        if block_gts:
+            # keep the genotypes of the line until its block is compared, gt_data is built after the trim amounts are added
+            pending.append((bed.chrom, bed.pos, bed.end_pos, bed.motifLen(motif_len_col),
+                            bed.label(label_col) if summary is not None else None, bd_vals,
+                            [reader.gt_data if stateCheck(reader) else None for reader in vcf_rdrs]))
+
+            if len(pending) >= gt_block_size:
+                flushBlock()
+        else:
+            # write data to output files
+            writer.writeRow(bed.chrom, bed.pos, bed.end_pos, bed.motifLen(motif_len_col), bd_vals, lv_vals, ln_vals)
+
+            if summary is not None:
+                summary.addRow(bed.chrom, bed.motifLen(motif_len_col), bed.label(label_col), bd_vals, lv_vals, ln_vals)
+
+
+        # read lines for all files, genotype data is only built for the records that get compared
+        for rdr in vcf_rdrs:
+            rdr.VCFParse()
+
+        bed.read()
+        rows += 1
+
+    flushBlock()
+    writer.flush()
+
+    if profiler is not None:
+        profiler.loci += rows
+
+    return rows
+
+
+def getShards(bed_path: str, shard_method = SHARD_METHOD.CHROM, chunk_size = 50000, catalog_dir = None, motif_len_col = 6, motif_col = 3,
+              label_col = 5):
+    """
+    Runs a single pass over the BED file and splits it into shards, either one per chromosome,
+    or fixed size chunks of chunk_size lines. Shards are returned in catalog order.
+
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param shard_method: Description
+    :param chunk_size: number of BED lines per shard when using SHARD_METHOD.CHUNK
+    :param catalog_dir: directory for the compiled BED catalog, shard positions are line numbers when given
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param motif_col: column number of the motif sequences stored in the BED file
+    :param label_col: column number of the catalog label stored in the BED file, part of the compiled catalog
+    """
+    shards = []
+
+    with openBED(bed_path, catalog_dir, motif_len_col, motif_col, label_col, track_offsets=True) as bed:
+        bed.read()
+        bed.skipMetaData()
+
+        while bed.cur_line:
+            # start a new shard when the chromosome changes, or the current chunk is full
+            if not shards or \
+                (shard_method == SHARD_METHOD.CHROM and bed.chrom != shards[-1].chrom) or \
+                (shard_method == SHARD_METHOD.CHUNK and shards[-1].num_rows >= chunk_size):
+
+                if shards:
+                    shards[-1].next_locus = (bed.chrom, bed.pos)
+                shards.append(Shard(index=len(shards), chrom=bed.chrom, pos=bed.pos, file_pos=bed.line_loc))
+
+            shards[-1].num_rows += 1
+            bed.read()
+
+    return shards
+
+
+def runShard(shard: Shard, bed_path: str, vcf_list: list, tmp_dir: str, motif_len_col = 6, trim_alleles = False, use_index = False,
+             block_size = None, threads = 1, out_format = OUTPUT_FORMAT.TSV, lv_max_dist = None, lv_band = None,
+             lv_method = COMP_METHOD.LEVENSHTEIN, motif_col = 3, chrom_order = None, catalog_dir = None, prefetch = None,
+             summarize = False, label_col = 5, gt_block_size = None):
+    """
+    Worker function for comparing a single shard. Output is written to temporary shard files
+    which are stitched together once all shards are complete.
+    Returns the shard index, the shard output file paths, the (skip_num, end_state, svlen_diffs) of every vcf reader
+    (skip_num and svlen_diffs are None for indexed readers, since they do not pass over the records between BED lines),
+    and the SummaryStats of the shard (None if summarize is false).
+
+    :param shard: Description
+    :type shard: Shard
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param vcf_list: list of [vcf path, SETTINGS] pairs
+    :type vcf_list: list
+    :param tmp_dir: directory to write the shard output files to
+    :type tmp_dir: str
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param trim_alleles: Bool for whether or not to trim alleles while comparing
+    :param use_index: Bool for whether or not to fetch records from the vcf index when one exists
+    :param block_size: number of bytes to read at once, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    :param out_format: output format of the shard files
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param lv_method: COMP_METHOD.LEVENSHTEIN, or COMP_METHOD.MOTIF for approximate distances from repeat unit counts
+    :param motif_col: column number of the motif sequences stored in the BED file
+    :param chrom_order: ChromOrder for comparing chromosomes, names are compared as strings if None
+    :param catalog_dir: directory for the compiled BED catalog, the BED text is parsed if None
+    :param prefetch: number of line batches each vcf reader reads ahead in a background thread
+    :param summarize: Bool for whether or not to keep summary statistics of the shard rows
+    :param label_col: column number of the catalog label stored in the BED file, used by the summary
+    :param gt_block_size: number of BED lines to compare genotypes for at once, only used with COMP_METHOD.LEVENSHTEIN
+    """
+    summary = SummaryStats([getFileName(vcf_info[0]) for vcf_info in vcf_list]) if summarize else None
+
+    if out_format == OUTPUT_FORMAT.NPZ:
+        out_paths = [os.path.join(tmp_dir, f"shard-{shard.index}.npz")]
+    else:
+        out_paths = [os.path.join(tmp_dir, f"shard-{shard.index}.{ext}") for ext in ("bed", "lev", "len")]
+
+    with ExitStack() as stack:
+        # move the bed reader to the start of the shard
+        bed = stack.enter_context(openBED(bed_path, catalog_dir, motif_len_col, motif_col, label_col, block_size=block_size))
+        bed._setFilePosition(shard.file_pos)
+        bed.read()
+
+        # setup vcf readers and move them up to the start of the shard
+        vcf_rdrs = []
+        for vcf_info in vcf_list:
+            rdr = setupVCFReader(vcf=vcf_info[0], settings=vcf_info[1], stk=stack, use_index=use_index,
+                                 block_size=block_size, threads=threads, chrom_order=chrom_order, prefetch=prefetch)
+            rdr.VCFParse()
+            rdr.seekLocus(bed.chrom, bed.pos)
+
+            # only the records of this shard are validated here, the ones passed over by the seek belong to earlier shards
+            rdr.svlen_diffs = int(not rdr.end_state and rdr._svLenDiffers())
+            vcf_rdrs.append(rdr)
+
+        # shard outputs only hold the data rows, the metadata is written once to the final outputs
+        if out_format == OUTPUT_FORMAT.NPZ:
+            writer = stack.enter_context(NpzCompWriter(out_paths[0], len(vcf_rdrs), {}))
+        else:
+            writer = stack.enter_context(TSVCompWriter(*[stack.enter_context(open(path, "w")) for path in out_paths]))
+
+        compareLoci(bed, vcf_rdrs, None, None, None,
+                    motif_len_col=motif_len_col,
+                    trim_alleles=trim_alleles,
+                    row_limit=shard.num_rows,
+                    writer=writer,
+                    lv_max_dist=lv_max_dist,
+                    lv_band=lv_band,
+                    lv_method=lv_method,
+                    motif_col=motif_col,
+                    summary=summary,
+                    label_col=label_col,
+                    gt_block_size=gt_block_size)
+
+        # count lines between this shard and the next as skips, the same as syncToBed would in a single pass
+        if shard.next_locus:
+            for rdr in vcf_rdrs:
+                if rdr.indexed:
+                    continue
+
+                rdr.pause = False
+
+                while rdr._isBehind(*shard.next_locus) and not rdr.end_state:
+                    rdr.VCFParse()
+                    rdr.skip_num += 1
+
+                # the current record is the first record of the next shard, which validates it
+                if not rdr.end_state and rdr._svLenDiffers():
+                    rdr.svlen_diffs -= 1
+
+    # indexed readers never reach the end of the file, so they are treated as ended, and their skips are not counted
+    return shard.index, out_paths, [(None if rdr.indexed else rdr.skip_num, rdr.end_state or rdr.indexed, None if rdr.indexed else rdr.svlen_diffs)
+                                    for rdr in vcf_rdrs], summary
+
+
+def runParallel(bed_path: str, vcf_list: list, out_paths: list[str], n_workers = None,
+                shard_method = SHARD_METHOD.CHROM, chunk_size = 50000, motif_len_col = 6, trim_alleles = False, use_index = False,
+                block_size = None, threads = 1, out_format = OUTPUT_FORMAT.TSV, lv_max_dist = None, lv_band = None,
+                lv_method = COMP_METHOD.LEVENSHTEIN, motif_col = 3, chrom_order = None, catalog_dir = None, prefetch = None,
+                summary = None, label_col = 5, gt_block_size = None):
+    """
+    Splits the BED catalog into shards and compares them in a process pool. The shard outputs
+    are written back to the BED-VCF, Levenshtein and Length output files (or the .npz output) in catalog order.
+    Returns a list of (vcf path, total skip_num, end_state, total svlen_diffs) for each vcf, where end_state is taken from the last shard,
+    and skip_num and svlen_diffs are None for indexed vcfs.
+
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param vcf_list: list of [vcf path, SETTINGS] pairs
+    :type vcf_list: list
+    :param out_paths: BED-VCF, Levenshtein and Length output file paths, or the .npz output path for OUTPUT_FORMAT.NPZ
+    :type out_paths: list[str]
+    :param n_workers: number of worker processes, defaults to the number of CPUs
+    :param shard_method: Description
+    :param chunk_size: number of BED lines per shard when using SHARD_METHOD.CHUNK
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param trim_alleles: Bool for whether or not to trim alleles while comparing
+    :param use_index: Bool for whether or not to fetch records from the vcf index when one exists
+    :param block_size: number of bytes to read at once, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    :param out_format: Description
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param lv_method: COMP_METHOD.LEVENSHTEIN, or COMP_METHOD.MOTIF for approximate distances from repeat unit counts
+    :param motif_col: column number of the motif sequences stored in the BED file
+    :param chrom_order: ChromOrder for comparing chromosomes, the BED chromosome order is used if None
+    :param catalog_dir: directory for the compiled BED catalog, it is compiled once before the shards are made
+    :param prefetch: number of line batches each vcf reader reads ahead in a background thread
+    :param summary: SummaryStats that the summary of every shard is merged into
+    :param label_col: column number of the catalog label stored in the BED file, used by the summary
+    :param gt_block_size: number of BED lines to compare genotypes for at once, only used with COMP_METHOD.LEVENSHTEIN
+    """
+    shards = getShards(bed_path, shard_method, chunk_size, catalog_dir, motif_len_col, motif_col, label_col)
+
+    # shards seek their start from the top of each vcf, so chromosomes are always ranked in the catalog order.
+    # Comparing the names as strings would stop a seek for chr10 on the first chr2 record of a naturally sorted vcf
+    if chrom_order is None:
+        chrom_order = ChromOrder.fromBED(bed_path)
+
+    # readers are only used for their file names and offsets when writing the metadata, so they are not opened
+    meta_rdrs = [COMP_VCFReader(file_path=vcf_info[0], settings=vcf_info[1]) for vcf_info in vcf_list]
+
+    skip_nums = [0] * len(vcf_list)
+    end_states = [True] * len(vcf_list)
+    svlen_diffs = [0] * len(vcf_list)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(out_paths[0]))) as tmp_dir, \
+        ProcessPoolExecutor(max_workers=n_workers) as pool:
+
+        futures = [pool.submit(runShard, shard, bed_path, vcf_list, tmp_dir, motif_len_col, trim_alleles, use_index, block_size, threads, out_format,
+                               lv_max_dist, lv_band, lv_method, motif_col, chrom_order, catalog_dir, prefetch,
+                               summary is not None, label_col, gt_block_size)
+                   for shard in shards]
+
+        with ExitStack() as stack:
+            writer = openCompWriter(out_paths, meta_rdrs, stack, out_format)
+
+            # futures are consumed in submission order, so shard outputs are written back in catalog order
+            for future in futures:
+                idx, shard_paths, rdr_states, shard_summary = future.result()
+
+                if summary is not None:
+                    summary.merge(shard_summary)
+
+                if out_format == OUTPUT_FORMAT.NPZ:
+                    shard = readCompArrays(shard_paths[0])
+                    writer.writeBlock(shard["chroms"], shard["chrom_ids"], shard["pos"], shard["end_pos"], shard["motif_lens"],
+                                      shard["bd"].data, shard["bd"].mask, shard["lv"].data, shard["lv"].mask, shard["ln"].data, shard["ln"].mask)
+                else:
+                    for out, shard_path in zip(writer.outs, shard_paths):
+                        with open(shard_path, "r") as shard_file:
+                            shutil.copyfileobj(shard_file, out)
+
+                for shard_path in shard_paths:
+                    os.remove(shard_path)
+
+                for i, (skip_num, end_state, svlen_diff) in enumerate(rdr_states):
+                    skip_nums[i] = None if skip_num is None else skip_nums[i] + skip_num
+                    end_states[i] = end_state
+                    svlen_diffs[i] = None if svlen_diff is None else svlen_diffs[i] + svlen_diff
+
+    return [(vcf_info[0], skip_nums[i], end_states[i], svlen_diffs[i]) for i, vcf_info in enumerate(vcf_list)]
+
+
+def compareTables(bed_tab: LocusTable, vcf_tabs: list[LocusTable], bdof, lvdof, ldof, block_size = 100000, workers = 1, writer = None,
+                  lv_max_dist = None, lv_band = None, min_overlap = None, match_method = MATCH_METHOD.FIRST):
+    """
+    Columnar version of compareLoci. Matches every VCF table to the BED table with an array join (or with matchOverlaps
+    when an overlap rule is given), then runs
+    the comparisons in blocks of block_size loci and writes the results to the output files, or to the comparison writer if one is given.
+    Alleles are not trimmed. Returns the number of VCF lines that were not matched to any BED line for each table.
+
+    :param bed_tab: Description
+    :type bed_tab: LocusTable
+    :param vcf_tabs: Description
+    :type vcf_tabs: list[LocusTable]
+    :param bdof: BED-VCF comparison output file
+    :param lvdof: Levenshtein comparison output file
+    :param ldof: Length comparison output file
+    :param block_size: number of loci compared at once
+    :param workers: number of threads used for the levenshtein distances, -1 uses all cpus
+    :param writer: comparison writer, a TSVCompWriter over the output files is used if None
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param min_overlap: minimum reciprocal overlap for matching VCF lines to BED lines, any overlap is accepted if None
+    :param match_method: rule for picking between VCF lines that overlap the same BED line
+    """
+    if writer is None:
+        writer = TSVCompWriter(bdof, lvdof, ldof)
+
+    if min_overlap is None and match_method == MATCH_METHOD.FIRST:
+        matches = [matchToBed(bed_tab, tab) for tab in vcf_tabs]
+    else:
+        matches = [matchOverlaps(bed_tab, tab, min_overlap, match_method)[0] for tab in vcf_tabs]
+    diffs = [bedDiffs(bed_tab, tab, match) for tab, match in zip(vcf_tabs, matches)]
+    prev_chrom = -1
+
+    for start in range(0, len(bed_tab), block_size):
+        rows = slice(start, min(start + block_size, len(bed_tab)))
+
+        for chrom_id in bed_tab.chrom_ids[rows].tolist():
+            if chrom_id != prev_chrom:
+                print(f"Comparing {bed_tab.chroms[chrom_id]}")
+                prev_chrom = chrom_id
+
+        # BDDIST: (loci, readers, 2) start and end differences
+        bd_dist = np.stack([np.stack([start_diff[rows], end_diff[rows]], axis=1) for start_diff, end_diff, na in diffs], axis=1)
+        bd_na = np.stack([np.stack([na[rows], na[rows]], axis=1) for start_diff, end_diff, na in diffs], axis=1)
+
+        # LVDIST and LENDIST, using the levenshtein comparison order for both
+        alleles = gatherAlleleBlock(vcf_tabs, matches, rows)
+        lv_dist, lv_na, ln_dist, ln_na = compareGtBlock(alleles, workers, max_dist=lv_max_dist, band=lv_band)
+
+        # write data to output files
+        writer.writeBlock(bed_tab.chroms, bed_tab.chrom_ids[rows], bed_tab.pos[rows], bed_tab.end_pos[rows], bed_tab.motif_lens[rows],
+                          bd_dist, bd_na, lv_dist, lv_na, ln_dist, ln_na)
+
+    return [len(tab) - len(np.unique(match[match >= 0])) for tab, match in zip(vcf_tabs, matches)]
+
+
+def runColumnar(bed_path: str, vcf_list: list, out_paths: list[str], motif_len_col = 6, cache_dir = None,
+                block_size = 100000, workers = 1, read_block_size = None, threads = 1, out_format = OUTPUT_FORMAT.TSV,
+                lv_max_dist = None, lv_band = None, min_overlap = None, match_method = MATCH_METHOD.FIRST):
+    """
+    Loads the BED catalog and vcfs into LocusTables, using the compiled catalog and the parsed vcf cache if cache_dir is given,
+    and runs compareTables. Returns a list of (vcf path, skip_num, end_state, svlen_diffs) for each vcf, where skip_num is the
+    number of vcf lines not matched to any BED line, and svlen_diffs is the number of straglr records whose SVLEN differs from END - POS.
+
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param vcf_list: list of [vcf path, SETTINGS] pairs
+    :type vcf_list: list
+    :param out_paths: BED-VCF, Levenshtein and Length output file paths, or the .npz output path for OUTPUT_FORMAT.NPZ
+    :type out_paths: list[str]
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param cache_dir: directory for caching the compiled BED catalog and parsed vcfs between runs, files are always parsed if None
+    :param block_size: number of loci compared at once
+    :param workers: number of threads used for the levenshtein distances, -1 uses all cpus
+    :param read_block_size: number of bytes to read at once when parsing files, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    :param out_format: Description
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param min_overlap: minimum reciprocal overlap for matching VCF lines to BED lines, any overlap is accepted if None
+    :param match_method: rule for picking between VCF lines that overlap the same BED line
+    """
+    if cache_dir:
+        bed_tab = loadCachedBEDTable(bed_path, cache_dir, motif_len_col, block_size=read_block_size)
+    else:
+        bed_tab = loadBEDTable(bed_path, motif_len_col, block_size=read_block_size)
+
+    vcf_tabs, skip_nums = _compareVCFTables(bed_tab, vcf_list, out_paths, cache_dir, block_size, workers, read_block_size, threads, out_format,
+                                            lv_max_dist, lv_band, min_overlap, match_method)
+
+    return [(vcf_info[0], skip_nums[i], True, vcf_tabs[i].svlen_diffs) for i, vcf_info in enumerate(vcf_list)]
+
+
+def _compareVCFTables(bed_tab: LocusTable, vcf_list: list, out_paths: list[str], cache_dir = None,
+                      block_size = 100000, workers = 1, read_block_size = None, threads = 1, out_format = OUTPUT_FORMAT.TSV,
+                      lv_max_dist = None, lv_band = None, min_overlap = None, match_method = MATCH_METHOD.FIRST):
+    """
+    Loads the vcfs into LocusTables, writes the metadata to the output files and runs compareTables.
+    Returns the vcf tables and the number of vcf lines not matched to any BED line for each table.
+    """
+    if cache_dir:
+        vcf_tabs = [loadCachedVCFTable(vcf_info[0], vcf_info[1], cache_dir, block_size=read_block_size, threads=threads) for vcf_info in vcf_list]
+    else:
+        vcf_tabs = [loadVCFTable(vcf_info[0], vcf_info[1], block_size=read_block_size, threads=threads) for vcf_info in vcf_list]
+
+    # readers are only used for their file names and offsets when writing the metadata, so they are not opened
+    meta_rdrs = [COMP_VCFReader(file_path=vcf_info[0], settings=vcf_info[1]) for vcf_info in vcf_list]
+
+    with ExitStack() as stack:
+        writer = openCompWriter(out_paths, meta_rdrs, stack, out_format)
+
+        skip_nums = compareTables(bed_tab, vcf_tabs, None, None, None, block_size=block_size, workers=workers, writer=writer,
+                                  lv_max_dist=lv_max_dist, lv_band=lv_band, min_overlap=min_overlap, match_method=match_method)
+
+    return vcf_tabs, skip_nums
+
+
+# BED catalog table attached from shared memory (or the compiled catalog) in each batch worker process
+_catalog = None
+
+
+def _attachCatalog(spec: dict):
+    """
+    Process pool initializer for runBatch, attaches the shared BED catalog once per worker.
+    Specs with a "cache" entry map the compiled catalog from the cache instead, which the OS shares between workers.
+
+    :param spec: spec returned by shareTable, or {"cache": (bed_path, cache_dir, motif_len_col)}
+    :type spec: dict
+    """
+    global _catalog
+    if "cache" in spec:
+        _catalog = (loadCachedBEDTable(*spec["cache"]), [])
+    else:
+        _catalog = attachTable(spec)
+
+
+def runSample(sample: str, vcf_list: list, out_paths: list[str], bed_tab = None, cache_dir = None,
+              block_size = 100000, read_block_size = None, threads = 1, out_format = OUTPUT_FORMAT.TSV, lv_max_dist = None, lv_band = None,
+              min_overlap = None, match_method = MATCH_METHOD.FIRST):
+    """
+    Compares the vcfs of one sample against the BED catalog table with compareTables. bed_tab defaults to
+    the shared catalog attached in batch worker processes. Returns the sample and a list of
+    (caller, vcf path, settings name, number of vcf records, skip_num, svlen_diffs) for each vcf.
+
+    :param sample: Description
+    :type sample: str
+    :param vcf_list: list of [vcf path, SETTINGS, caller name] entries
+    :type vcf_list: list
+    :param out_paths: BED-VCF, Levenshtein and Length output file paths, or the .npz output path for OUTPUT_FORMAT.NPZ
+    :type out_paths: list[str]
+    :param bed_tab: BED catalog LocusTable
+    :param cache_dir: directory for caching parsed vcfs between runs, vcfs are always parsed if None
+    :param block_size: number of loci compared at once
+    :param read_block_size: number of bytes to read at once when parsing files, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    :param out_format: Description
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param min_overlap: minimum reciprocal overlap for matching VCF lines to BED lines, any overlap is accepted if None
+    :param match_method: rule for picking between VCF lines that overlap the same BED line
+    """
+    if bed_tab is None:
+        bed_tab = _catalog[0]
+
+    print(f"Comparing sample {sample}")
+
+    vcf_tabs, skip_nums = _compareVCFTables(bed_tab, vcf_list, out_paths, cache_dir, block_size,
+                                            read_block_size=read_block_size, threads=threads, out_format=out_format,
+                                            lv_max_dist=lv_max_dist, lv_band=lv_band, min_overlap=min_overlap, match_method=match_method)
+
+    return sample, [(vcf_info[2], vcf_info[0], vcf_info[1].name, len(vcf_tabs[i]), skip_nums[i], vcf_tabs[i].svlen_diffs)
+                    for i, vcf_info in enumerate(vcf_list)]
+
+
+def runBatch(bed_path: str, samples: dict, output_dir: str, n_workers = 1, motif_len_col = 6, cache_dir = None,
+             block_size = 100000, read_block_size = None, threads = 1, summary_file = "batch-summary.tsv", out_format = OUTPUT_FORMAT.TSV,
+             lv_max_dist = None, lv_band = None, min_overlap = None, match_method = MATCH_METHOD.FIRST):
+    """
+    Runs the columnar comparison for every sample in a manifest. The BED catalog is only parsed once, and is shared
+    with the worker processes through shared memory when n_workers is greater than 1 (or memory mapped from the
+    compiled catalog when cache_dir is given). Each sample is written to its own
+    <sample>-bed-comp.tsv, <sample>-lev-comp.tsv and <sample>-len-comp.tsv files (or <sample>-comp.npz) in output_dir, and a summary of every
+    sample and caller is written to summary_file. Returns the summary rows.
+
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param samples: dictionary of sample -> list of [vcf path, SETTINGS, caller name], as returned by readManifest
+    :type samples: dict
+    :param output_dir: directory for the per sample output files and the summary
+    :type output_dir: str
+    :param n_workers: number of worker processes, samples are compared one at a time in this process if 1
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param cache_dir: directory for caching the compiled BED catalog and parsed vcfs between runs, files are always parsed if None
+    :param block_size: number of loci compared at once
+    :param read_block_size: number of bytes to read at once when parsing files, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    :param summary_file: file name of the merged summary in output_dir
+    :param out_format: Description
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param min_overlap: minimum reciprocal overlap for matching VCF lines to BED lines, any overlap is accepted if None
+    :param match_method: rule for picking between VCF lines that overlap the same BED line
+    """
+    if cache_dir:
+        bed_tab = loadCachedBEDTable(bed_path, cache_dir, motif_len_col, block_size=read_block_size)
+    else:
+        bed_tab = loadBEDTable(bed_path, motif_len_col, block_size=read_block_size)
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = []
+    for sample, vcf_list in samples.items():
+        if out_format == OUTPUT_FORMAT.NPZ:
+            out_paths = [os.path.join(output_dir, f"{sample}-comp.npz")]
+        else:
+            out_paths = [os.path.join(output_dir, f"{sample}-{name}-comp.tsv") for name in ("bed", "lev", "len")]
+        jobs.append((sample, vcf_list, out_paths))
+
+    if n_workers > 1:
+        # workers map the compiled catalog themselves, so it does not need to be copied into shared memory
+        if cache_dir:
+            shms, spec = [], {"cache": (bed_path, cache_dir, motif_len_col)}
+        else:
+            shms, spec = shareTable(bed_tab)
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_attachCatalog, initargs=(spec,)) as pool:
+                futures = [pool.submit(runSample, sample, vcf_list, out_paths, None, cache_dir, block_size, read_block_size, threads, out_format,
+                                       lv_max_dist, lv_band, min_overlap, match_method)
+                           for sample, vcf_list, out_paths in jobs]
+                results = [future.result() for future in futures]
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+    else:
+        results = [runSample(sample, vcf_list, out_paths, bed_tab, cache_dir, block_size, read_block_size, threads, out_format,
+                             lv_max_dist, lv_band, min_overlap, match_method)
+                   for sample, vcf_list, out_paths in jobs]
+
+    # merged summary, one row per sample and caller
+    rows = [(sample, *caller_row) for sample, caller_rows in results for caller_row in caller_rows]
+    with open(os.path.join(output_dir, summary_file), "w") as file:
+        file.write("SAMPLE\tCALLER\tVCF\tSETTINGS\tRECORDS\tSKIPPED\tSVLEN_DIFFS\n")
+        for row in rows:
+            file.write("\t".join(str(val) for val in row) + "\n")
+
+    return rows
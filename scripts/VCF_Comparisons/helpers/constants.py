@@ -15,6 +15,18 @@ class SETTINGS(Enum):
         self.start_offset = start_offset
         self.end_offset = end_offset
 
+    def __reduce_ex__(self, proto):
+        # pickle by member name, since the value is replaced in __init__ (needed for sending settings to worker processes)
+        return getattr, (self.__class__, self._name_)
+
+# INFO keys used when parsing each caller's vcf, all other INFO fields are ignored
+INFO_KEYS = {
+    SETTINGS.STRAGLR: frozenset({"END", "RB", "SVLEN"}),
+    SETTINGS.VAMOS: frozenset({"END", "RU", "ALTANNO_H1", "ALTANNO_H2"}),
+    SETTINGS.DEFAULT: frozenset({"END"}),
+    SETTINGS.OFFSET_START: frozenset({"END"}),
+}
+
 class COMP_ORDER(Enum):
     VERTICAL = auto()
     CROSS = auto()
@@ -23,7 +35,20 @@ class COMP_METHOD(Enum):
     LEVENSHTEIN = auto()
     LENGTH = auto()
     STRAGLR_LENGTH = auto()
+    MOTIF = auto()
 
 class ORDER_METHOD(Enum):
     ASCII = auto()
     NUMERIC = auto()
+
+class MATCH_METHOD(Enum):
+    FIRST = auto() # first overlapping record by position, the same record syncToBed picks
+    BEST_OVERLAP = auto() # overlapping record with the largest reciprocal overlap
+
+class SHARD_METHOD(Enum):
+    CHROM = auto()
+    CHUNK = auto()
+
+class OUTPUT_FORMAT(Enum):
+    TSV = auto()
+    NPZ = auto()
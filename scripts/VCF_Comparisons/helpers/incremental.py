@@ -0,0 +1,224 @@
+import os
+import hashlib
+import numpy as np
+from contextlib import ExitStack
+from helpers.columnar import LocusTable, matchToBed, matchOverlaps, bedDiffs, gatherAlleleBlock
+from helpers.cache import cacheKey, loadCachedVCFTable, loadCachedBEDTable
+from helpers.batch_compare import compareGtBlock, getPairIdxs
+from helpers.writers import openCompWriter
+from helpers.comp_readers import COMP_VCFReader
+from helpers.constants import *
+
+# Incremental columnar comparisons.
+# The comparison output is split into one column set per caller (its BED match, BDDIST, and skip count) and one per
+# caller pair (LVDIST and LNDIST), and each set is saved in the cache under a key built from the cache keys of the
+# inputs it depends on. When a vcf changes, its cache key changes, so only its own columns and the pair columns
+# that include it are recomputed, and the output files are rebuilt from the saved columns.
+
+
+COLUMNS_DIR = "columns" # subdirectory of the cache directory holding the column sets
+COLUMNS_VERSION = 3 # increase when the matching or the comparisons change, so old column sets are not used
+
+
+def columnKey(*parts):
+    """
+    Returns the key of a column set, from the cache keys of its inputs and the comparison settings.
+
+    :param parts: input cache keys and settings, in a fixed order
+    """
+    return hashlib.sha1("\t".join(str(part) for part in (COLUMNS_VERSION, *parts)).encode()).hexdigest()
+
+
+def _loadColumns(path: str):
+    """
+    Returns the arrays of a saved column set, or None if it does not exist.
+
+    :param path: Description
+    :type path: str
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as cols:
+        return {name: cols[name] for name in cols.files}
+
+
+def _saveColumns(path: str, **cols):
+    """
+    Saves a column set. It is written to a temporary file first and then moved into place,
+    so a column set is never left half written.
+
+    :param path: Description
+    :type path: str
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez(tmp_path, **cols)
+    os.replace(tmp_path, path)
+
+
+def _stackColumns(col_sets: list[dict], name: str, rows: slice):
+    """
+    Stacks a column of each caller (or pair) into the (loci, readers or pairs, 2) shape used by writeBlock.
+
+    :param col_sets: column sets, in output column order
+    :type col_sets: list[dict]
+    :param name: Description
+    :type name: str
+    :param rows: BED lines to include
+    :type rows: slice
+    """
+    if not col_sets:
+        # a single caller has no pairs
+        n_rows = len(range(*rows.indices(rows.stop)))
+        return np.zeros((n_rows, 0, 2), dtype=bool if name.endswith("_na") else np.int64)
+
+    return np.stack([cols[name][rows] for cols in col_sets], axis=1)
+
+
+def callerColumns(bed_tab: LocusTable, vcf_tab: LocusTable, min_overlap = None, match_method = MATCH_METHOD.FIRST):
+    """
+    Returns the column set of a single caller: the matched vcf line of every BED line, the BDDIST
+    start and end differences with their NA mask, the number of vcf lines not matched to any BED line,
+    and the number of straglr records whose SVLEN differs from END - POS.
+
+    :param bed_tab: Description
+    :type bed_tab: LocusTable
+    :param vcf_tab: Description
+    :type vcf_tab: LocusTable
+    :param min_overlap: minimum reciprocal overlap for matching VCF lines to BED lines, any overlap is accepted if None
+    :param match_method: rule for picking between VCF lines that overlap the same BED line
+    """
+    if min_overlap is None and match_method == MATCH_METHOD.FIRST:
+        match = matchToBed(bed_tab, vcf_tab)
+    else:
+        match = matchOverlaps(bed_tab, vcf_tab, min_overlap, match_method)[0]
+
+    start_diff, end_diff, na = bedDiffs(bed_tab, vcf_tab, match)
+
+    return {"match": match,
+            "bd_dist": np.stack([start_diff, end_diff], axis=1),
+            "bd_na": np.stack([na, na], axis=1),
+            "skip_num": np.array(len(vcf_tab) - len(np.unique(match[match >= 0]))),
+            "svlen_diffs": np.array(vcf_tab.svlen_diffs)}
+
+
+def pairColumns(tabs: list[LocusTable], matches: list[np.ndarray], block_size = 100000, workers = 1, lv_max_dist = None, lv_band = None):
+    """
+    Returns the column set of a caller pair: the LVDIST and LNDIST allele 1 and allele 2 distances with their NA masks,
+    each with shape (BED lines, 2). Same comparisons as compareTables, run for the single pair.
+
+    :param tabs: the two vcf tables, in output column order
+    :type tabs: list[LocusTable]
+    :param matches: matched vcf line indices of both tables
+    :type matches: list[np.ndarray]
+    :param block_size: number of loci compared at once
+    :param workers: number of threads used for the levenshtein distances, -1 uses all cpus
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    """
+    n_loci = len(matches[0])
+    cols = {"lv_dist": np.zeros((n_loci, 2), dtype=np.int64), "lv_na": np.ones((n_loci, 2), dtype=bool),
+            "ln_dist": np.zeros((n_loci, 2), dtype=np.int64), "ln_na": np.ones((n_loci, 2), dtype=bool)}
+
+    for start in range(0, n_loci, block_size):
+        rows = slice(start, min(start + block_size, n_loci))
+
+        alleles = gatherAlleleBlock(tabs, matches, rows)
+        lv_dist, lv_na, ln_dist, ln_na = compareGtBlock(alleles, workers, max_dist=lv_max_dist, band=lv_band)
+
+        # blocks hold a single pair
+        cols["lv_dist"][rows], cols["lv_na"][rows] = lv_dist[:, 0], lv_na[:, 0]
+        cols["ln_dist"][rows], cols["ln_na"][rows] = ln_dist[:, 0], ln_na[:, 0]
+
+    return cols
+
+
+def runIncremental(bed_path: str, vcf_list: list, out_paths: list[str], cache_dir: str, motif_len_col = 6, hash_file = False,
+                   block_size = 100000, workers = 1, read_block_size = None, threads = 1, out_format = OUTPUT_FORMAT.TSV,
+                   lv_max_dist = None, lv_band = None, min_overlap = None, match_method = MATCH_METHOD.FIRST):
+    """
+    Columnar comparison that keeps the per caller and per pair columns in cache_dir between runs, and only recomputes
+    the columns whose inputs changed (eg. one caller's vcf being re-run). The output files are rebuilt from the columns,
+    and are the same as the runColumnar output. Returns a list of (vcf path, skip_num, end_state, svlen_diffs) for each vcf.
+
+    :param bed_path: BED file path
+    :type bed_path: str
+    :param vcf_list: list of [vcf path, SETTINGS] pairs
+    :type vcf_list: list
+    :param out_paths: BED-VCF, Levenshtein and Length output file paths, or the .npz output path for OUTPUT_FORMAT.NPZ
+    :type out_paths: list[str]
+    :param cache_dir: directory for the compiled BED catalog, the parsed vcfs, and the comparison columns
+    :type cache_dir: str
+    :param motif_len_col: column number of the motif length stored in the BED file
+    :param hash_file: Bool for whether or not to detect changed files by their contents instead of their size and modification time
+    :param block_size: number of loci compared at once
+    :param workers: number of threads used for the levenshtein distances, -1 uses all cpus
+    :param read_block_size: number of bytes to read at once when parsing files, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    :param out_format: Description
+    :param lv_max_dist: max levenshtein distance to compute, larger distances are written as lv_max_dist + 1
+    :param lv_band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param min_overlap: minimum reciprocal overlap for matching VCF lines to BED lines, any overlap is accepted if None
+    :param match_method: rule for picking between VCF lines that overlap the same BED line
+    """
+    col_dir = os.path.join(cache_dir, COLUMNS_DIR)
+    os.makedirs(col_dir, exist_ok=True)
+
+    bed_tab = loadCachedBEDTable(bed_path, cache_dir, motif_len_col, hash_file=hash_file, block_size=read_block_size)
+    bed_key = cacheKey(bed_path, None, hash_file, tag="BED")
+    vcf_keys = [cacheKey(vcf_info[0], vcf_info[1], hash_file) for vcf_info in vcf_list]
+
+    # vcf tables are only loaded for callers with columns to recompute
+    vcf_tabs = {}
+
+    def vcfTable(i):
+        if i not in vcf_tabs:
+            vcf_tabs[i] = loadCachedVCFTable(vcf_list[i][0], vcf_list[i][1], cache_dir, hash_file, read_block_size, threads)
+        return vcf_tabs[i]
+
+    # BDDIST and the BED match of each caller
+    callers = []
+    for i, key in enumerate(vcf_keys):
+        path = os.path.join(col_dir, f"caller-{columnKey(bed_key, key, min_overlap, match_method.name)}.npz")
+        cols = _loadColumns(path)
+
+        if cols is None:
+            print(f"Matching {vcf_list[i][0]}")
+            cols = callerColumns(bed_tab, vcfTable(i), min_overlap, match_method)
+            _saveColumns(path, **cols)
+
+        callers.append(cols)
+
+    # LVDIST and LNDIST of each caller pair, in output column order
+    pairs = []
+    reused = 0
+    for i, j in zip(*getPairIdxs(len(vcf_list))):
+        i, j = int(i), int(j)
+        path = os.path.join(col_dir, f"pair-{columnKey(bed_key, vcf_keys[i], vcf_keys[j], min_overlap, match_method.name, lv_max_dist, lv_band)}.npz")
+        cols = _loadColumns(path)
+
+        if cols is None:
+            print(f"Comparing {vcf_list[i][0]} and {vcf_list[j][0]}")
+            cols = pairColumns([vcfTable(i), vcfTable(j)], [callers[i]["match"], callers[j]["match"]], block_size, workers, lv_max_dist, lv_band)
+            _saveColumns(path, **cols)
+        else:
+            reused += 1
+
+        pairs.append(cols)
+
+    print(f"Reused {reused} of {len(pairs)} caller pair comparisons")
+
+    # readers are only used for their file names and offsets when writing the metadata, so they are not opened
+    meta_rdrs = [COMP_VCFReader(file_path=vcf_info[0], settings=vcf_info[1]) for vcf_info in vcf_list]
+
+    with ExitStack() as stack:
+        writer = openCompWriter(out_paths, meta_rdrs, stack, out_format)
+
+        for start in range(0, len(bed_tab), block_size):
+            rows = slice(start, min(start + block_size, len(bed_tab)))
+
+            writer.writeBlock(bed_tab.chroms, bed_tab.chrom_ids[rows], bed_tab.pos[rows], bed_tab.end_pos[rows], bed_tab.motif_lens[rows],
+                              *[_stackColumns(callers, name, rows) for name in ("bd_dist", "bd_na")],
+                              *[_stackColumns(pairs, name, rows) for name in ("lv_dist", "lv_na", "ln_dist", "ln_na")])
+
+    return [(vcf_info[0], int(cols["skip_num"]), True, int(cols["svlen_diffs"])) for vcf_info, cols in zip(vcf_list, callers)]
@@ -0,0 +1,153 @@
+import os
+import pysam
+from helpers.comp_readers import *
+from helpers.constants import SETTINGS
+
+
+INDEX_EXTENSIONS = (".csi", ".tbi")
+
+
+def findIndex(path: str):
+    """
+    Returns the path to the tabix (.tbi) or CSI (.csi) index for a bgzipped VCF,
+    or None if the file is not indexed.
+
+    :param path: VCF file path
+    :type path: str
+    """
+    if not path.endswith(".gz"):
+        return None
+
+    for ext in INDEX_EXTENSIONS:
+        if os.path.exists(path + ext):
+            return path + ext
+
+    return None
+
+
+class IndexedVCFReader(COMP_VCFReader):
+    indexed = True
+
+    def __init__(self, file_path, settings = None, pause = False):
+        """
+        VCF reader for bgzipped and tabix/CSI indexed VCFs. Instead of streaming the file and catching up to
+        each BED line, the records overlapping each BED line are fetched directly from the index,
+        so the VCF does not need to be sorted in the same chromosome order as the BED.
+
+        :param file_path: Description
+        :param settings: Description
+        :param pause: Description
+        """
+        super().__init__(file_path, settings, pause)
+        self.index_path = findIndex(file_path)
+        self.contigs = set()
+
+        # widen fetch regions so records shifted by the offsets are still found
+        self.max_off = max(abs(self.start_off), abs(self.end_off))
+
+
+    def open_file(self):
+        """
+        Docstring for open_file
+
+
+        """
+        if self.index_path is None:
+            raise FileIOError(f"File Opening Error: No .tbi or .csi index found for {self.path}")
+
+        try:
+            self.file_obj = pysam.TabixFile(self.path, index=self.index_path, encoding="utf-8")
+            self.contigs = set(self.file_obj.contigs)
+            return self
+        except (IOError, OSError, ValueError) as e:
+            raise FileIOError(f"File Opening Error: {e}")
+
+
+    def close_file(self):
+        """
+        Docstring for close_file
+
+
+        """
+        if self.file_obj:
+            self.file_obj.close()
+
+
+    def skipMetaData(self, delimiter='#', end_delimiter = None):
+        # header lines are not returned by the index, so there is nothing to skip
+        pass
+
+
+    def VCFParse(self):
+        # records are fetched in syncToBed, so there is no next line to move to
+        return self.cur_line
+
+
+    def buildGtData(self, sample_col=9, ref=None, alt = None):
+        # there is no genotype until a record has been fetched in syncToBed
+        if not self.cur_line:
+            return None
+
+        return super().buildGtData(sample_col, ref, alt)
+
+
+    def seekLocus(self, chrom: str, pos: int, order_method="ASCII"):
+        # nothing to seek, since every BED line is fetched directly
+        pass
+
+
+    def syncToBed(self, bed: BEDReader, order_method="ASCII"):
+        """
+        Fetches the records overlapping the current BED line, and sets the first record that is
+        not behind the BED position as the current line. Pauses the reader if no records overlap.
+
+        :param bed: Description
+        :type bed: BEDReader
+        :param order_method: unused, since the index does not depend on the file order
+        """
+        self.pause = True
+
+        if bed.chrom not in self.contigs:
+            return
+
+        try:
+            # tabix regions are 0-based, half open
+            records = self.file_obj.fetch(bed.chrom,
+                                          max(0, bed.pos - 1 - self.max_off),
+                                          bed.end_pos + 1 + self.max_off)
+
+            for raw_line in records:
+                self._parseRecord(raw_line)
+
+                # skip records that only overlap the widened region
+                if self._isBehind(bed.chrom, bed.pos):
+                    continue
+
+                # records are returned in position order, so if this one is ahead of the bed the rest are too
+                if self.pos <= bed.end_pos:
+                    self.pause = False
+
+                break
+
+        except ValueError as e:
+            raise VCFFormatError(f"\nERROR\nFailed to fetch {bed.chrom}:{bed.pos}-{bed.end_pos} from {self.path}\n{e}")
+
+
+    def _parseRecord(self, raw_line: str):
+        """
+        Formats a fetched record the same way VCFParse formats a streamed line, and applies the offsets.
+
+        :param raw_line: record string returned by the index
+        :type raw_line: str
+        """
+        format_method = self.specialFormat if self.settings != SETTINGS.OFFSET_START and self.settings != SETTINGS.DEFAULT else self.formatLine
+
+        self.prev_line = self.cur_line
+        self._raw_line = raw_line
+        self.cur_line = format_method(raw_line)
+        self._gt_data = None
+
+        # Offset Handling
+        if self.pos and self.end_pos:
+            self.pos += self.start_off
+            self.end_pos += self.end_off
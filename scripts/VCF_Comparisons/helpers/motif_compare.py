@@ -0,0 +1,116 @@
+import Levenshtein
+from collections import Counter
+from helpers.comp_readers import alleleData
+
+
+# Approximate allele distances from repeat unit counts.
+# Each allele is reduced to a motif count vector plus the bases that are not covered by a motif (the residual).
+# vamos alleles already come with repeat unit annotations (RU + ALTANNO_H*), so their counts are taken directly
+# from the annotation indices, and other alleles are decomposed with the motifs from the BED catalog.
+# Units shared by both alleles cancel out, and only the leftover material (extra units and residual bases)
+# is compared with levenshtein, so a copy number change gives the length difference and a point
+# mutation inside a unit costs about one edit, without aligning the full repeat.
+
+
+ALLOWED = frozenset("ATCG")
+MIN_LEN = 1000 # below this allele length a full levenshtein comparison is cheaper than building the count vectors
+
+
+def parseMotifs(motif_str: str):
+    """
+    Returns the tuple of motifs in a BED motif column (eg. 'AGATTT' or 'AGATTT,AGTTTC'), or an empty tuple
+    if the column does not hold motif sequences.
+
+    :param motif_str: Description
+    :type motif_str: str
+    """
+    motifs = tuple(mot for mot in motif_str.upper().split(",") if mot)
+
+    if not all(ALLOWED.issuperset(mot) for mot in motifs):
+        return ()
+
+    return motifs
+
+
+def motifCounts(allele: alleleData, motifs = ()):
+    """
+    Returns the motif count vector of an allele, as a Counter of motif -> copies, and the residual string of bases
+    not covered by a motif. Annotated alleles (eg. from vamos) are counted from their repeat unit indices
+    without using the sequence. Other alleles are decomposed by greedily removing the given motifs from the
+    sequence, longest motif first. Returns None if the allele has no annotation and no usable sequence.
+
+    :param allele: Description
+    :type allele: alleleData
+    :param motifs: motifs to decompose allele sequences with
+    """
+    if allele.ru_idxs is not None:
+        counts = Counter()
+        for idx, copies in Counter(allele.ru_idxs).items():
+            counts[allele.ru_mots[idx]] += copies
+
+        return counts, ""
+
+    seq = allele.allele_str
+    if not seq or not ALLOWED.issuperset(seq):
+        return None
+
+    counts = Counter()
+    for mot in sorted(motifs, key=len, reverse=True):
+        copies = seq.count(mot)
+        if copies:
+            counts[mot] = copies
+            # a separator is left in place of each unit, so the removal can not create new motif matches
+            seq = seq.replace(mot, "|")
+
+    return counts, seq.replace("|", "")
+
+
+def motifDistance(all1: alleleData, all2: alleleData, motifs = (), motif_len = None, max_residual = 0.2, min_len = MIN_LEN):
+    """
+    Returns the approximate levenshtein distance between two alleles from their motif count vectors.
+    Returns None when a full levenshtein comparison should be used instead: when both alleles are shorter
+    than min_len, when an allele can not be counted, when there are no motifs to decompose a sequence with,
+    or when too much of a sequence is not covered by the motifs.
+
+    :param all1: Description
+    :type all1: alleleData
+    :param all2: Description
+    :type all2: alleleData
+    :param motifs: motifs from the BED catalog for the current locus
+    :param motif_len: motif length from the BED catalog, used when the catalog has no motif sequences
+    :param max_residual: fraction of a sequence allowed to be left uncovered by motifs
+    :param min_len: minimum allele length to compare by motif counts
+    """
+    if max(all1.length, all2.length) < min_len:
+        return None
+
+    # sequence alleles can only be decomposed with the catalog motifs, or the motifs of an annotated allele at the same locus
+    known_mots = set(motifs)
+    for allele in (all1, all2):
+        if allele.ru_mots is not None:
+            known_mots.update(allele.ru_mots)
+
+    if not known_mots:
+        return None
+
+    unit_len = max(max(len(mot) for mot in known_mots), motif_len or 0)
+
+    vectors = []
+    for allele in (all1, all2):
+        result = motifCounts(allele, known_mots)
+        if result is None:
+            return None
+
+        # partial units at the ends of a repeat are expected, anything past that means the motifs do not fit the sequence
+        if len(result[1]) > max(2 * unit_len, max_residual * allele.length):
+            return None
+
+        vectors.append(result)
+
+    (counts1, residual1), (counts2, residual2) = vectors
+
+    # units in both alleles cancel out, the extra units are compared along with the residual bases
+    extra1 = residual1 + "".join(mot * copies for mot, copies in sorted((counts1 - counts2).items()))
+    extra2 = residual2 + "".join(mot * copies for mot, copies in sorted((counts2 - counts1).items()))
+
+    return Levenshtein.distance(extra1, extra2)
@@ -0,0 +1,156 @@
+import json
+import time
+import platform
+from collections import defaultdict
+from functools import wraps
+from helpers.utils import getFileName
+
+
+
+class StageProfiler:
+    """
+    Records the cumulative time and number of calls of each stage of the comparison loop, per caller.
+    Stages are timed by replacing methods on the reader and writer instances with timed wrappers, so
+    nothing is added to the hot path when profiling is turned off.
+
+    Stages:
+        read: reading (and decompressing) raw lines from the file
+        format: splitting lines into fields (formatLine / specialFormat)
+        build_gt: building the genotype data (buildGtData)
+        sync: syncing to the BED line (syncToBed), this includes the read and format time of skipped lines
+        <COMP_METHOD name>: compareGt calls, per pair of callers
+        write: writing output rows
+    """
+    def __init__(self):
+        self.times = defaultdict(lambda: defaultdict(float))
+        self.counts = defaultdict(lambda: defaultdict(int))
+        self.chrom_skips = defaultdict(lambda: defaultdict(int))
+        self.loci = 0
+        self.str_time = time.perf_counter()
+
+
+    def add(self, caller: str, stage: str, elapsed: float):
+        """
+        Adds a timed call to the totals of a stage.
+
+        :param caller: Description
+        :type caller: str
+        :param stage: Description
+        :type stage: str
+        :param elapsed: time of the call in seconds
+        :type elapsed: float
+        """
+        self.times[caller][stage] += elapsed
+        self.counts[caller][stage] += 1
+
+
+    def timed(self, func, caller: str, stage: str):
+        """
+        Returns a wrapper of func that adds the time of each call to the given stage.
+
+        :param func: Description
+        :param caller: Description
+        :type caller: str
+        :param stage: Description
+        :type stage: str
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            str_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(caller, stage, time.perf_counter() - str_time)
+
+        return wrapper
+
+
+    def instrumentReader(self, rdr):
+        """
+        Times the read, format, build_gt and sync stages of a vcf reader, and counts its skipped lines per chromosome.
+        Must be called after the reader's file has been opened.
+
+        :param rdr: COMP_VCFReader or IndexedVCFReader
+        """
+        caller = getFileName(rdr.path)
+
+        # indexed readers fetch records from pysam instead of reading lines
+        if hasattr(rdr.file_obj, "readline"):
+            rdr.file_obj.readline = self.timed(rdr.file_obj.readline, caller, "read")
+
+        rdr.formatLine = self.timed(rdr.formatLine, caller, "format")
+        rdr.specialFormat = self.timed(rdr.specialFormat, caller, "format")
+        rdr.buildGtData = self.timed(rdr.buildGtData, caller, "build_gt")
+
+        sync = self.timed(rdr.syncToBed, caller, "sync")
+
+        @wraps(sync)
+        def syncToBed(bed, *args, **kwargs):
+            skip_num = rdr.skip_num
+            sync(bed, *args, **kwargs)
+            if rdr.skip_num > skip_num:
+                self.chrom_skips[caller][bed.chrom] += rdr.skip_num - skip_num
+
+        rdr.syncToBed = syncToBed
+
+
+    def instrumentWriter(self, writer):
+        """
+        Times the output writes of a comparison writer.
+
+        :param writer: TSVCompWriter or NpzCompWriter
+        """
+        for name in ("writeRow", "writeBlock", "flush"):
+            setattr(writer, name, self.timed(getattr(writer, name), "output", "write"))
+
+
+    def compare(self, compare_func, rdr, other_rdr):
+        """
+        Returns a wrapper of a genotype comparison function (eg. compareGt) that is timed
+        under the comp_method name, for the given pair of callers.
+
+        :param compare_func: Description
+        :param rdr: Description
+        :param other_rdr: Description
+        """
+        caller = f"{getFileName(rdr.path)} vs {getFileName(other_rdr.path)}"
+
+        @wraps(compare_func)
+        def wrapper(*args, comp_method, **kwargs):
+            str_time = time.perf_counter()
+            try:
+                return compare_func(*args, comp_method=comp_method, **kwargs)
+            finally:
+                self.add(caller, comp_method.name, time.perf_counter() - str_time)
+
+        return wrapper
+
+
+    def report(self):
+        """
+        Returns the profile as a JSON serializable dictionary.
+        """
+        total_time = time.perf_counter() - self.str_time
+
+        return {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "total_time": total_time,
+            "loci": self.loci,
+            "loci_per_sec": self.loci / total_time if total_time > 0 else 0.0,
+            "stages": {caller: {stage: {"time": self.times[caller][stage], "count": self.counts[caller][stage]}
+                                for stage in self.times[caller]}
+                       for caller in self.times},
+            "skips_per_chrom": {caller: dict(skips) for caller, skips in self.chrom_skips.items()},
+        }
+
+
+    def writeReport(self, path: str):
+        """
+        Writes the profile report to a JSON file.
+
+        :param path: Description
+        :type path: str
+        """
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent=2)
@@ -1,22 +1,45 @@
 import gzip
 import io
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+BGZF_MAX_BLOCK = 65536 # max uncompressed size of a BGZF block
+PREFETCH_BATCH = 1 << 20 # number of characters read ahead at once by a prefetching reader
 
 
 class Reader:
-    def __init__(self, file_path: str, buffer_size = io.DEFAULT_BUFFER_SIZE):
+    def __init__(self, file_path: str, buffer_size = io.DEFAULT_BUFFER_SIZE, block_size = None, threads = 1, track_offsets = False,
+                 prefetch = None):
         """
-        Docstring for __init__
+        Docstring for __init__  
+        If block_size is given the file is read and decompressed in blocks of block_size bytes, which are split into lines
+        by a buffered text stream. Bgzipped files are decompressed in parallel using threads,
+        other .gz files are decompressed in a background thread when threads is greater than 1.
+        If prefetch is given, lines are read (and decompressed) ahead in a background thread, into a queue of up to prefetch batches.
         
         :param file_path: Description
         :type file_path: str
         :param buffer_size: Description
+        :param block_size: number of bytes to read at once, lines are read one at a time if None
+        :param threads: number of decompression threads for .gz files in block mode
+        :param track_offsets: Bool for whether or not to keep track of the file position of each line (cur_loc and line_loc),
+            line endings are kept as they are in the file when tracking offsets, so counted offsets include any '\r'
+        :param prefetch: number of line batches to read ahead in a background thread, lines are read when they are needed if None
         """
         self.file_obj = None
         self.buffer = buffer_size
+        self.block_size = block_size
+        self.threads = threads
+        self.track_offsets = track_offsets
+        self.prefetch = prefetch
         self.path = file_path
         self._raw_line = None
         self.cur_line = None # will be the same as raw_line if no format function is provided to read()
         self.cur_loc = None
+        self.line_loc = None # file position of the start of the current line
 
 
     @property
@@ -35,7 +58,7 @@ class Reader:
         
         
         """
-        if not self.file_obj: # if file was opened
+        if self.file_obj: # if file was opened
             self.file_obj.close()
 
         self.cur_loc = None
@@ -48,10 +71,16 @@ class Reader:
         
         """
         try:
-            if self.path.endswith(".gz"):
-                self.file_obj = gzip.open(self.path, "rt", encoding="utf-8")
+            if self.block_size:
+                self._openBlocks()
+            elif self.path.endswith(".gz"):
+                self.file_obj = gzip.open(self.path, "rt", encoding="utf-8", newline=self._newline())
             else:
-                self.file_obj = open(self.path, "r", encoding="utf-8", buffering=self.buffer)
+                self.file_obj = open(self.path, "r", encoding="utf-8", buffering=self.buffer, newline=self._newline())
+
+            # block streams are wrapped in _openBlocks
+            if self.prefetch and not self.block_size:
+                self.file_obj = _PrefetchLines(self.file_obj, self.prefetch)
 
             self.cur_loc = 0
             return self
@@ -66,8 +95,15 @@ class Reader:
         :param format: Description
         """
         try:
+            self.line_loc = self.cur_loc
             self._raw_line = self.file_obj.readline()
-            self.cur_loc = self.file_obj.tell()
+
+            if self.track_offsets:
+                # block and prefetched streams can not tell(), so the line lengths are counted instead
+                if self.block_size or self.prefetch:
+                    self.cur_loc += len(self._raw_line.encode("utf-8"))
+                else:
+                    self.cur_loc = self.file_obj.tell()
 
             # if the line is not empty (ie. the end of the file has not been reached) 
             if self._raw_line:
@@ -83,7 +119,7 @@ class Reader:
 
             return self.cur_line
                     
-        except gzip.BadGzipFile:
+        except (gzip.BadGzipFile, zlib.error):
             raise FileReadError(f"Failed to read from {self.path}\nInvalid .gz")
         except UnicodeError:
             raise FileReadError(f"Failed to read from {self.path}\nContains Invalid UTF-8 Characters")
@@ -108,12 +144,67 @@ class Reader:
             else:
                 self.read()  
 
-        # save the file position of the end of the header/metadata
-        self.header_end = self.file_obj.tell()
+        # save the file position of the end of the header/metadata, block and prefetched streams only know it when tracking offsets
+        if self.block_size or self.prefetch:
+            self.header_end = self.cur_loc if self.track_offsets else None
+        else:
+            self.header_end = self.file_obj.tell()
+
+
+    def _newline(self):
+        """
+        Returns the newline mode for opening the file. Line endings are not translated when tracking offsets,
+        so the counted line lengths are the same as the bytes in the file (eg. for '\r\n' line endings).
+        """
+        return "" if self.track_offsets else None
 
 
     def _setFilePosition(self, file_pos: int):
-        self.file_obj.seek(file_pos)
+        """
+        Moves the reader to the given (uncompressed) file position, from line_loc or cur_loc. Block streams are restarted
+        at the position, and prefetched streams stop their background thread, seek the file and start it again.
+
+        :param file_pos: Description
+        :type file_pos: int
+        """
+        if file_pos is None:
+            raise FileReadError(f"Failed to seek in {self.path}\nFile position is unknown, offsets are not tracked")
+
+        if self.block_size:
+            self._openBlocks(file_pos)
+        else:
+            self.file_obj.seek(file_pos)
+        self.cur_loc = file_pos
+
+
+    def _openBlocks(self, start = 0):
+        """
+        Starts the block generator for the file at the given (uncompressed) file position, 
+        and wraps it in a buffered text stream so lines can be read with readline().
+        
+        :param start: Description
+        """
+        if self.file_obj: # stops the previous block generator, and any decompression threads
+            self.file_obj.close()
+
+        if not self.path.endswith(".gz"):
+            blocks = _plainBlocks(self.path, self.block_size, start)
+        else:
+            if _isBGZF(self.path):
+                blocks = _bgzfBlocks(self.path, self.block_size, self.threads)
+            else:
+                blocks = _gzipBlocks(self.path, self.block_size)
+                if self.threads > 1:
+                    blocks = _backgroundBlocks(blocks)
+
+            if start:
+                blocks = _skipBytes(blocks, start)
+
+        self.file_obj = io.TextIOWrapper(io.BufferedReader(_BlockStream(blocks), buffer_size=self.block_size), encoding="utf-8",
+                                         newline=self._newline())
+        if self.prefetch:
+            self.file_obj = _PrefetchLines(self.file_obj, self.prefetch)
+        self.cur_loc = start
 
 
     def __iter__(self):
@@ -135,18 +226,51 @@ class Reader:
 
 
 
+def parseInfo(info_str: str, keys = None):
+    """
+    Parses a VCF INFO column into a dictionary of key -> value strings in a single pass.
+    Keys are matched exactly (so "END" does not match "SVEND"), and flag fields (entries without '=') are set to True.
+    If keys is given, only those fields are kept. Repeated keys keep their last value.
+
+    :param info_str: INFO column string
+    :type info_str: str
+    :param keys: set of INFO keys to keep, all keys are kept if None
+    """
+    fields = {}
+
+    if keys is None:
+        for entry in info_str.split(";"):
+            key, sep, value = entry.partition("=")
+            fields[key] = value if sep else True
+
+    else:
+        # the whole column is read, so repeated keys keep their last value, the same as when every key is kept
+        for entry in info_str.split(";"):
+            key, sep, value = entry.partition("=")
+
+            if key in keys:
+                fields[key] = value if sep else True
+
+    return fields
+
+
+
 class VCFReader(Reader):
     _DEFAULT = object()
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, block_size = None, threads = 1, track_offsets = False, prefetch = None):
         """
         Docstring for __init__
         
         
         :param file_path: Description
         :type file_path: str
+        :param block_size: number of bytes to read at once, lines are read one at a time if None
+        :param threads: number of decompression threads for .gz files in block mode
+        :param track_offsets: Bool for whether or not to keep track of the file position of each line
+        :param prefetch: number of line batches to read ahead in a background thread, lines are read when they are needed if None
         """
-        super().__init__(file_path)
+        super().__init__(file_path, block_size=block_size, threads=threads, track_offsets=track_offsets, prefetch=prefetch)
         self.prev_line = None
         self.header_end = None
 
@@ -162,6 +286,7 @@ class VCFReader(Reader):
         self.format = None
         self.sample = None
         self.genotype = None
+        self.info_keys = None # INFO keys kept when parsing the INFO column, all keys are kept if None
         
 
     def buildGt(self, sample_col=9, ref=None, alt = None):
@@ -221,11 +346,8 @@ class VCFReader(Reader):
             try:       
                 pos = int(line_list[1])
                 ref_len = len(line_list[3])                
-                info_col = line_list[7].split(';') # grab the INFO column
-                end_str = ""
-                for i, str in enumerate(info_col): # seach for end position marker      
-                    if "END=" in str:
-                        end_str = info_col[i].removeprefix("END=")
+                info = parseInfo(line_list[7], self.info_keys) # grab the INFO column
+                end_str = info.get("END", "") # search for end position marker
 
                 if end_str.isdigit():
                     end_pos = int(end_str)
@@ -241,7 +363,7 @@ class VCFReader(Reader):
                 self.alt = line_list[4].split(",") # returns a list of all alt alleles
                 self.qual = line_list[5] 
                 self.filter = line_list[6] 
-                self.info = line_list[7]
+                self.info = info
                     
             except ValueError:
                 raise VCFFormatError(f"Failed to set position '{line_list[4]}' from line: {line_list}\n")
@@ -282,15 +404,18 @@ class VCFReader(Reader):
 class BEDReader(Reader):
     _DEFAULT = object()
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, block_size = None, threads = 1, track_offsets = False):
         """
         Docstring for __init__
         
         
         :param file_path: Description
         :type file_path: str
+        :param block_size: number of bytes to read at once, lines are read one at a time if None
+        :param threads: number of decompression threads for .gz files in block mode
+        :param track_offsets: Bool for whether or not to keep track of the file position of each line
         """
-        super().__init__(file_path)
+        super().__init__(file_path, block_size=block_size, threads=threads, track_offsets=track_offsets)
         self.prev_line = None
 
    
@@ -335,10 +460,313 @@ class BEDReader(Reader):
             target_format = format_method
             
         return super().read(target_format)
+
+
+    def motifLen(self, motif_len_col = 6):
+        """
+        Returns the motif length column of the current line, as written in the file.
+
+        :param motif_len_col: column number of the motif length stored in the BED file
+        """
+        return self.cur_line[motif_len_col]
+
+
+    def motifStr(self, motif_col = 3):
+        """
+        Returns the motif column of the current line, or an empty string if the line has no such column.
+
+        :param motif_col: column number of the motif sequences stored in the BED file
+        """
+        return self.cur_line[motif_col] if motif_col < len(self.cur_line) else ""
+
+
+    def label(self, label_col = 5):
+        """
+        Returns the catalog label of the current line (eg. STR or VNTR), or an empty string if the line has no such column.
+
+        :param label_col: column number of the catalog label stored in the BED file
+        """
+        return self.cur_line[label_col] if label_col < len(self.cur_line) else ""
     
 
 
 
+class _BlockStream(io.RawIOBase):
+    """
+    Read only raw stream over a block generator.
+    """
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.block = b""
+        self.block_pos = 0
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self.blocks.close()
+        super().close()
+
+    def readinto(self, buffer):
+        # move to the next block once the current one has been used
+        while self.block_pos >= len(self.block):
+            self.block = next(self.blocks, None)
+            self.block_pos = 0
+            if self.block is None:
+                self.block = b""
+                return 0
+
+        n_bytes = min(len(buffer), len(self.block) - self.block_pos)
+        buffer[:n_bytes] = self.block[self.block_pos:self.block_pos + n_bytes]
+        self.block_pos += n_bytes
+
+        return n_bytes
+
+
+class _PrefetchLines:
+    """
+    Line stream over a text file, where a background thread reads batches of lines ahead into a bounded queue.
+    Reading and decompressing (which release the GIL) overlap with the parsing of the previous lines,
+    and the reader only waits when the queue is empty. Supports readline, seek and close.
+    """
+    def __init__(self, file_obj, depth = 4, batch_size = PREFETCH_BATCH):
+        self.raw = file_obj
+        self.depth = depth
+        self.batch_size = batch_size
+        self.lines = []
+        self.line_idx = 0
+        self.thread = None
+        self._start()
+
+
+    def _start(self):
+        """
+        Starts the background thread from the current position of the file.
+        """
+        self.buffer = queue.Queue(maxsize=self.depth)
+        self.stop = threading.Event()
+        self.done = False
+        self.lines = []
+        self.line_idx = 0
+
+        def offer(item):
+            # waits for space in the queue, unless the reader has been stopped
+            while not self.stop.is_set():
+                try:
+                    self.buffer.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def produce():
+            try:
+                while not self.stop.is_set():
+                    # readlines reads whole lines up to about batch_size characters, and an empty list at the end of the file
+                    batch = self.raw.readlines(self.batch_size)
+                    offer(batch)
+
+                    if not batch:
+                        return
+            except Exception as e:
+                offer(e)
+
+        self.thread = threading.Thread(target=produce, daemon=True)
+        self.thread.start()
+
+
+    def _halt(self):
+        """
+        Stops the background thread and waits for it, so the file is no longer being read.
+        """
+        if self.thread is not None:
+            self.stop.set()
+            self.thread.join()
+            self.thread = None
+
+
+    def readline(self):
+        # move to the next batch once the current one has been used
+        while self.line_idx >= len(self.lines):
+            if self.done:
+                return ""
+
+            batch = self.buffer.get()
+            if isinstance(batch, Exception):
+                raise batch
+
+            self.lines = batch
+            self.line_idx = 0
+            self.done = not batch
+
+        line = self.lines[self.line_idx]
+        self.line_idx += 1
+
+        return line
+
+
+    def seek(self, file_pos: int):
+        self._halt()
+        self.raw.seek(file_pos)
+        self._start()
+
+
+    def close(self):
+        self._halt()
+        self.raw.close()
+
+
+def _plainBlocks(path: str, block_size: int, start = 0):
+    """
+    Yields blocks of block_size bytes from an uncompressed file, starting at the given file position.
+    """
+    with open(path, "rb") as raw:
+        raw.seek(start)
+        for block in iter(lambda: raw.read(block_size), b""):
+            yield block
+
+
+def _gzipBlocks(path: str, block_size: int):
+    """
+    Yields decompressed blocks from a gzip file, including files with multiple gzip members.
+    """
+    with open(path, "rb") as raw:
+        decomp = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+        for data in iter(lambda: raw.read(block_size), b""):
+            while data:
+                block = decomp.decompress(data)
+                if block:
+                    yield block
+
+                # start a new decompressor if another gzip member follows
+                data = decomp.unused_data
+                if decomp.eof:
+                    decomp = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+        block = decomp.flush()
+        if block:
+            yield block
+
+
+def _isBGZF(path: str):
+    """
+    Returns true if the file starts with a BGZF block header (gzip header with a 'BC' extra subfield).
+    """
+    with open(path, "rb") as raw:
+        header = raw.read(18)
+
+    return len(header) == 18 and header[:4] == b"\x1f\x8b\x08\x04" and header[12:14] == b"BC"
+
+
+def _readBGZFBlocks(raw, n_blocks: int):
+    """
+    Reads up to n_blocks BGZF blocks from the raw file, and returns the compressed data of each block.
+    """
+    cdata = []
+
+    for _ in range(n_blocks):
+        header = raw.read(12)
+        if len(header) < 12:
+            break
+
+        # find the BSIZE subfield in the extra field
+        extra = raw.read(int.from_bytes(header[10:12], "little"))
+        bsize = None
+        i = 0
+        while i + 4 <= len(extra):
+            slen = int.from_bytes(extra[i + 2:i + 4], "little")
+            if extra[i:i + 2] == b"BC":
+                bsize = int.from_bytes(extra[i + 4:i + 6], "little") + 1
+            i += 4 + slen
+
+        if bsize is None:
+            raise zlib.error("BGZF block is missing the BSIZE field")
+
+        # drop the CRC32 and ISIZE fields at the end of the block
+        cdata.append(raw.read(bsize - 12 - len(extra))[:-8])
+
+    return cdata
+
+
+def _inflate(cdata: bytes):
+    return zlib.decompress(cdata, -zlib.MAX_WBITS)
+
+
+def _bgzfBlocks(path: str, block_size: int, threads = 1):
+    """
+    Yields decompressed data from a BGZF file. BGZF blocks are independent, so batches of blocks are
+    decompressed in parallel by a thread pool (zlib releases the GIL), and the next batch is decompressed while the current one is used.
+    """
+    n_blocks = max(1, block_size // BGZF_MAX_BLOCK)
+
+    with open(path, "rb") as raw, ThreadPoolExecutor(max_workers=threads) as pool:
+        batch = pool.map(_inflate, _readBGZFBlocks(raw, n_blocks))
+
+        while batch is not None:
+            cdata = _readBGZFBlocks(raw, n_blocks)
+            next_batch = pool.map(_inflate, cdata) if cdata else None
+
+            block = b"".join(batch)
+            if block:
+                yield block
+
+            batch = next_batch
+
+
+def _backgroundBlocks(blocks, depth = 4):
+    """
+    Runs a block generator in a background thread, so reading and decompressing overlaps with parsing the previous blocks.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    end = object()
+
+    def produce():
+        try:
+            for block in blocks:
+                while not stop.is_set():
+                    try:
+                        buffer.put(block, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            buffer.put(end)
+        except Exception as e:
+            buffer.put(e)
+        finally:
+            blocks.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            block = buffer.get()
+            if block is end:
+                return
+            if isinstance(block, Exception):
+                raise block
+            yield block
+    finally:
+        stop.set()
+
+
+def _skipBytes(blocks, n_bytes: int):
+    """
+    Drops the first n_bytes from a block generator, used for seeking in decompressed streams.
+    """
+    for block in blocks:
+        if n_bytes >= len(block):
+            n_bytes -= len(block)
+            continue
+
+        yield block[n_bytes:]
+        n_bytes = 0
+
+
+
 class FileIOError(Exception):
     def __init__(self, message):
         super().__init__(message)
@@ -353,4 +781,7 @@ class BEDFormatError(Exception):
 
 class VCFFormatError(Exception):
     def __init__(self, message):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+class ManifestFormatError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,273 @@
+import json
+import time
+from collections import Counter
+
+
+# lower edges of the motif length bins, the last bin holds every longer motif
+MOT_LEN_BINS = (1, 2, 3, 4, 5, 6, 7, 21, 101)
+
+# lower edges of the distance histogram bins, the last bin holds every larger distance
+HIST_EDGES = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def binLabel(value: int, edges: tuple):
+    """
+    Returns the label of the bin holding value (eg. "5-9", or "100+" for the last bin), or "NA" for values below the first edge.
+
+    :param value: Description
+    :type value: int
+    :param edges: lower edges of the bins, in increasing order
+    :type edges: tuple
+    """
+    if value < edges[0]:
+        return "NA"
+
+    for low, high in zip(edges, edges[1:]):
+        if value < high:
+            return str(low) if high - low == 1 else f"{low}-{high - 1}"
+
+    return f"{edges[-1]}+"
+
+
+class _PairStats:
+    """
+    Counts for a caller pair over a set of loci. Distances are kept as value counts,
+    so the mean, median and histogram can be computed exactly at the end, and counts from shards can be added together.
+    """
+    __slots__ = ("loci", "na", "lv_match", "ln_match", "lv_counts", "ln_counts")
+
+    def __init__(self):
+        self.loci = 0
+        self.na = 0 # loci where the pair has no values (eg. either caller missing the locus)
+        self.lv_match = 0 # compared loci where both alleles have a levenshtein distance of 0
+        self.ln_match = 0 # compared loci where both alleles have a length difference of 0
+        self.lv_counts = Counter() # levenshtein distance -> number of alleles
+        self.ln_counts = Counter() # absolute length difference -> number of alleles
+
+
+    def add(self, other):
+        self.loci += other.loci
+        self.na += other.na
+        self.lv_match += other.lv_match
+        self.ln_match += other.ln_match
+        self.lv_counts.update(other.lv_counts)
+        self.ln_counts.update(other.ln_counts)
+
+
+class _CallerStats:
+    """
+    Counts for a single caller over a set of loci.
+    """
+    __slots__ = ("loci", "na", "pos_match")
+
+    def __init__(self):
+        self.loci = 0
+        self.na = 0 # loci the caller has no record for
+        self.pos_match = 0 # loci where the record starts and ends at the BED positions
+
+
+    def add(self, other):
+        self.loci += other.loci
+        self.na += other.na
+        self.pos_match += other.pos_match
+
+
+def _distStats(counts: Counter, n_alleles: int):
+    """
+    Returns the mean, median and histogram of the distances in counts.
+
+    :param counts: distance -> number of alleles
+    :type counts: Counter
+    :param n_alleles: number of alleles with a distance
+    :type n_alleles: int
+    """
+    if n_alleles == 0:
+        return {"mean": None, "median": None, "hist": {}}
+
+    # walk the sorted values up to the middle allele(s)
+    mid_idxs = ((n_alleles - 1) // 2, n_alleles // 2)
+    mids = []
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        while len(mids) < 2 and seen > mid_idxs[len(mids)]:
+            mids.append(value)
+
+    hist = Counter()
+    for value, count in counts.items():
+        hist[binLabel(value, HIST_EDGES)] += count
+
+    return {"mean": sum(value * count for value, count in counts.items()) / n_alleles,
+            "median": (mids[0] + mids[1]) / 2,
+            "hist": {label: hist[label] for label in (binLabel(edge, HIST_EDGES) for edge in HIST_EDGES) if hist[label]}}
+
+
+class SummaryStats:
+    """
+    Streaming summary of the comparison rows, filled in during the single pass over the catalog.
+    Counts are kept per (chromosome, motif length bin, catalog label) cell, and are added up into the
+    overall, per motif length bin, per chromosome and per label summaries when the report is made.
+    For every caller pair the report holds the concordance rates (loci where both alleles match exactly), the NA rate,
+    and the mean, median and histogram of LVDIST and the absolute LNDIST. For every caller it holds the NA rate and
+    the rate of records matching the BED positions exactly.
+    """
+    def __init__(self, callers: list[str]):
+        self.callers = list(callers)
+        self.pairs = [(self.callers[i], self.callers[j]) for i in range(len(self.callers)) for j in range(i + 1, len(self.callers))]
+        self.cells = {} # (chrom, motif length bin, label) -> ([_CallerStats per caller], [_PairStats per pair])
+        self.loci = 0
+
+
+    def _cell(self, chrom: str, mot_bin: str, label: str):
+        key = (chrom, mot_bin, label)
+        cell = self.cells.get(key)
+
+        if cell is None:
+            cell = ([_CallerStats() for _ in self.callers], [_PairStats() for _ in self.pairs])
+            self.cells[key] = cell
+
+        return cell
+
+
+    def addRow(self, chrom: str, motif_len, label: str, bd_vals: list, lv_vals: list, ln_vals: list):
+        """
+        Adds a comparison row, with the values in the same layout as the output rows ("NA" for missing values).
+
+        :param chrom: Description
+        :type chrom: str
+        :param motif_len: motif length of the BED line, as an int or as written in the file
+        :param label: catalog label of the BED line (eg. STR or VNTR)
+        :type label: str
+        :param bd_vals: BDDIST start and end differences of each caller
+        :type bd_vals: list
+        :param lv_vals: LVDIST allele 1 and allele 2 distances of each caller pair
+        :type lv_vals: list
+        :param ln_vals: LNDIST allele 1 and allele 2 differences of each caller pair
+        :type ln_vals: list
+        """
+        try:
+            mot_bin = binLabel(int(motif_len), MOT_LEN_BINS)
+        except (TypeError, ValueError):
+            mot_bin = "NA"
+
+        caller_stats, pair_stats = self._cell(chrom, mot_bin, label or "NA")
+        self.loci += 1
+
+        for k, stats in enumerate(caller_stats):
+            start_diff, end_diff = bd_vals[2 * k], bd_vals[2 * k + 1]
+            stats.loci += 1
+
+            if start_diff == "NA":
+                stats.na += 1
+            elif start_diff == 0 and end_diff == 0:
+                stats.pos_match += 1
+
+        for k, stats in enumerate(pair_stats):
+            lv_1, lv_2 = lv_vals[2 * k], lv_vals[2 * k + 1]
+            ln_1, ln_2 = ln_vals[2 * k], ln_vals[2 * k + 1]
+            stats.loci += 1
+
+            # pairs are only compared when both callers have the locus, otherwise every value is NA
+            if lv_1 == "NA" and lv_2 == "NA" and ln_1 == "NA" and ln_2 == "NA":
+                stats.na += 1
+                continue
+
+            for dist in (lv_1, lv_2):
+                if dist != "NA":
+                    stats.lv_counts[dist] += 1
+            for diff in (ln_1, ln_2):
+                if diff != "NA":
+                    stats.ln_counts[abs(diff)] += 1
+
+            if lv_1 == 0 and lv_2 == 0:
+                stats.lv_match += 1
+            if ln_1 == 0 and ln_2 == 0:
+                stats.ln_match += 1
+
+
+    def merge(self, other):
+        """
+        Adds the counts of another summary over the same callers (eg. from a catalog shard).
+
+        :param other: Description
+        :type other: SummaryStats
+        """
+        for key, (other_callers, other_pairs) in other.cells.items():
+            caller_stats, pair_stats = self._cell(*key)
+
+            for stats, other_stats in zip(caller_stats + pair_stats, other_callers + other_pairs):
+                stats.add(other_stats)
+
+        self.loci += other.loci
+
+
+    def _group(self, key_idx = None):
+        """
+        Adds up the cells by one part of the cell key (0 chrom, 1 motif length bin, 2 label), or into a single group if key_idx is None.
+        Returns a dictionary of group -> report entry.
+
+        :param key_idx: Description
+        """
+        groups = {}
+        for key, (caller_stats, pair_stats) in self.cells.items():
+            group = "all" if key_idx is None else key[key_idx]
+
+            if group not in groups:
+                groups[group] = ([_CallerStats() for _ in self.callers], [_PairStats() for _ in self.pairs])
+
+            for stats, cell_stats in zip(groups[group][0] + groups[group][1], caller_stats + pair_stats):
+                stats.add(cell_stats)
+
+        # motif length bins are reported in increasing order, other groups in the order they were first seen
+        if key_idx == 1:
+            bin_order = [binLabel(edge, MOT_LEN_BINS) for edge in MOT_LEN_BINS] + ["NA"]
+            groups = {group: groups[group] for group in bin_order if group in groups}
+
+        report = {}
+        for group, (caller_stats, pair_stats) in groups.items():
+            report[group] = {"callers": {}, "pairs": {}}
+
+            for caller, stats in zip(self.callers, caller_stats):
+                called = stats.loci - stats.na
+                report[group]["callers"][caller] = {"loci": stats.loci,
+                                                    "na_rate": stats.na / stats.loci if stats.loci else None,
+                                                    "pos_match_rate": stats.pos_match / called if called else None}
+
+            for (caller_1, caller_2), stats in zip(self.pairs, pair_stats):
+                compared = stats.loci - stats.na
+                report[group]["pairs"][f"{caller_1} vs {caller_2}"] = {
+                    "loci": stats.loci,
+                    "na_rate": stats.na / stats.loci if stats.loci else None,
+                    "lv_concordance": stats.lv_match / compared if compared else None,
+                    "ln_concordance": stats.ln_match / compared if compared else None,
+                    "lv": _distStats(stats.lv_counts, sum(stats.lv_counts.values())),
+                    "ln": _distStats(stats.ln_counts, sum(stats.ln_counts.values())),
+                }
+
+        return report
+
+
+    def report(self):
+        """
+        Returns the summary as a JSON serializable dictionary.
+        """
+        return {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "loci": self.loci,
+            "callers": self.callers,
+            "overall": self._group()["all"] if self.cells else {},
+            "by_motif_len": self._group(1),
+            "by_chrom": self._group(0),
+            "by_label": self._group(2),
+        }
+
+
+    def writeReport(self, path: str):
+        """
+        Writes the summary report to a JSON file.
+
+        :param path: Description
+        :type path: str
+        """
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent=2)
@@ -1,8 +1,10 @@
 import Levenshtein
 from contextlib import ExitStack
+import os
 import sys
 from helpers.comp_readers import COMP_VCFReader, alleleData
-from helpers.readers import FileIOError, FileReadError, VCFFormatError, BEDFormatError
+from helpers.motif_compare import motifDistance
+from helpers.readers import FileIOError, FileReadError, VCFFormatError, BEDFormatError, ManifestFormatError
 from helpers.constants import *
 
 
@@ -20,10 +22,84 @@ def cleanNum(num: int):
         return abs(num)
 
 
-def compareAllele(all1: alleleData, all2: alleleData, method=COMP_METHOD.LEVENSHTEIN, trim = False):
+def trimAllele(allele: alleleData, trim = False):
+    """
+    Returns the allele string, sliced by the allele's own trim amounts if trim is true.
+    This is the only place the trim amounts are applied.
+    
+    :param allele: Description
+    :type allele: alleleData
+    :param trim: Bool for whether or not to trim the allele string
+    """
+    if trim:
+        # an end trim of 0 means the end is not trimmed
+        return allele.allele_str[allele.start_trim:allele.end_trim or None]
+    else:
+        return allele.allele_str
+
+
+def levenshteinCutoff(len1: int, len2: int, max_dist = None, band = None):
+    """
+    Returns the score cutoff for a levenshtein comparison between strings of the given lengths, or None for no cutoff.
+    The cutoff is max_dist, or the length difference plus band (since the distance is at least the length difference),
+    whichever is lower.
+
+    :param len1: Description
+    :type len1: int
+    :param len2: Description
+    :type len2: int
+    :param max_dist: max levenshtein distance to compute
+    :param band: number of edits allowed past the length difference
+    """
+    cutoff = max_dist
+
+    if band is not None:
+        band_cutoff = abs(len1 - len2) + band
+        cutoff = band_cutoff if cutoff is None else min(cutoff, band_cutoff)
+
+    return cutoff
+
+
+def isCapped(dists: list, gt1: list[alleleData], gt2: list[alleleData], idxs_1: tuple, idxs_2: tuple, trim = False, max_dist = None, band = None):
+    """
+    Returns true if any of the distances between gt1[idxs_1[k]] and gt2[idxs_2[k]] may have been capped by the
+    levenshtein cutoff (ie. it is over the cutoff from levenshteinCutoff).
+
+    :param dists: distances returned by compareAllele
+    :type dists: list
+    :param gt1: Description
+    :type gt1: list[alleleData]
+    :param gt2: Description
+    :type gt2: list[alleleData]
+    :param idxs_1: allele index in gt1 of each distance
+    :param idxs_2: allele index in gt2 of each distance
+    :param trim: Bool for whether or not alleles were trimmed while comparing
+    :param max_dist: max levenshtein distance to compute
+    :param band: number of edits allowed past the length difference
+    """
+    for dist, i, j in zip(dists, idxs_1, idxs_2):
+        if dist is None or not gt1[i] or not gt2[j] or gt1[i].allele_str is None or gt2[j].allele_str is None:
+            continue
+
+        cutoff = levenshteinCutoff(len(trimAllele(gt1[i], trim)), len(trimAllele(gt2[j], trim)), max_dist, band)
+        if dist > cutoff:
+            return True
+
+    return False
+
+
+def compareAllele(all1: alleleData, all2: alleleData, method=COMP_METHOD.LEVENSHTEIN, trim = False, max_dist = None, band = None, memo = None,
+                  motifs = (), motif_len = None):
     """
     Runs comparisons on alleleData object based on input method. If trim is true the allele strings  
-    inside of the allele data pack will be sliced during the comparisons.
+    inside of the allele data pack will be sliced during the comparisons.  
+    If max_dist or band is given, levenshtein distances stop early once they pass the cutoff from levenshteinCutoff,
+    and are returned as the cutoff + 1.  
+    If a memo dictionary is given, levenshtein results are saved in it by allele string pair (and trim amounts), so each distinct pair
+    of sequences is only compared once while the memo is kept (eg. once per locus). The memo must only be shared
+    between comparisons using the same trim and cutoff settings.  
+    The MOTIF method returns the approximate distance from motifDistance, and falls back to the levenshtein distance
+    for alleles that can not be compared by their motif counts.
     
     :param all1: Description
     :type all1: alleleData
@@ -31,20 +107,48 @@ def compareAllele(all1: alleleData, all2: alleleData, method=COMP_METHOD.LEVENSH
     :type all2: alleleData
     :param method: Description
     :param trim: Bool for whether or not to trim alleles while comparing
+    :param max_dist: max levenshtein distance to compute
+    :param band: number of edits allowed past the length difference of the alleles
+    :param memo: dictionary of previous levenshtein results
+    :param motifs: motifs from the BED catalog for the MOTIF method
+    :param motif_len: motif length from the BED catalog for the MOTIF method
     """
     ALLOWED = {'A', 'T', 'C', 'G'}
 
+    if method == COMP_METHOD.MOTIF:
+        if all1 and all2:
+            dist = motifDistance(all1, all2, motifs, motif_len)
+            if dist is not None:
+                return dist
+
+        # fall back to the full levenshtein distance
+        method = COMP_METHOD.LEVENSHTEIN
+
+    if memo is not None and method == COMP_METHOD.LEVENSHTEIN and all1 and all2 and \
+    all1.allele_str is not None and all2.allele_str is not None:
+        # levenshtein distance is symmetric, so the pair is stored in sorted order
+        # alleles of different callers can have different trims, so the trim amounts are part of the key
+        key1 = (all1.allele_str, all1.start_trim, all1.end_trim) if trim else all1.allele_str
+        key2 = (all2.allele_str, all2.start_trim, all2.end_trim) if trim else all2.allele_str
+        key = (key1, key2) if key1 <= key2 else (key2, key1)
+
+        if key not in memo:
+            memo[key] = compareAllele(all1, all2, method, trim, max_dist, band)
+        return memo[key]
+
     if all1 and all2:
         # if the allele string is not null and it only contains the characters A, T, C, or G
         if method == COMP_METHOD.LEVENSHTEIN and \
         (all1.allele_str and set(all1.allele_str).issubset(ALLOWED)) and \
         (all2.allele_str and set(all2.allele_str).issubset(ALLOWED)):
             
-            if trim:
-                return Levenshtein.distance(all1.allele_str[alleleData.start_trim:alleleData.end_trim], \
-                                            all2.allele_str[alleleData.start_trim:alleleData.end_trim])
-            else:
-                return Levenshtein.distance(all1.allele_str, all2.allele_str)
+            str1 = trimAllele(all1, trim)
+            str2 = trimAllele(all2, trim)
+
+            if max_dist is None and band is None:
+                return Levenshtein.distance(str1, str2)
+
+            return Levenshtein.distance(str1, str2, score_cutoff=levenshteinCutoff(len(str1), len(str2), max_dist, band))
             
         if method == COMP_METHOD.LENGTH and \
         all1.length > 0 and all2.length > 0:
@@ -54,7 +158,8 @@ def compareAllele(all1: alleleData, all2: alleleData, method=COMP_METHOD.LEVENSH
     return None
     
 
-def compareGt(gt1: list[alleleData], gt2: list[alleleData], comp_method = COMP_METHOD.LEVENSHTEIN, comp_ord = None, trim = False):
+def compareGt(gt1: list[alleleData], gt2: list[alleleData], comp_method = COMP_METHOD.LEVENSHTEIN, comp_ord = None, trim = False,
+              max_dist = None, band = None, memo = None, motifs = (), motif_len = None):
     """
     Compares genotype data list containing the alleleData objects using the compareAllele function.  
     If the comparison order is not know, will run comparisons on both iterations and return the lesser of the two.  
@@ -66,20 +171,27 @@ def compareGt(gt1: list[alleleData], gt2: list[alleleData], comp_method = COMP_M
     :type gt2: list[alleleData]
     :param comp_method: Comparison Method(either length or levenshtein)
     :param comp_ord: passed if the correct allele comparisons order is already known
+    :param max_dist: max levenshtein distance to compute, larger distances are returned as max_dist + 1
+    :param band: number of edits allowed past the allele length difference before a levenshtein comparison stops
+    :param memo: dictionary of previous levenshtein results, shared across the comparisons of a locus
+    :param motifs: motifs from the BED catalog for the MOTIF method
+    :param motif_len: motif length from the BED catalog for the MOTIF method
     """
+    comp_opts = {"max_dist": max_dist, "band": band, "memo": memo, "motifs": motifs, "motif_len": motif_len}
+
     # pad genotype list lengths to length 2 for compatibility (ie. for handling hemizygous regions)
     gt1 += [None] * (2 - len(gt1))
     gt2 += [None] * (2 - len(gt2))
 
     # if the comparison order is given:
     if comp_ord == COMP_ORDER.VERTICAL:
-        vert_dist = [compareAllele(gt1[0], gt2[0], comp_method), compareAllele(gt1[1], gt2[1], comp_method)]
+        vert_dist = [compareAllele(gt1[0], gt2[0], comp_method, **comp_opts), compareAllele(gt1[1], gt2[1], comp_method, **comp_opts)]
         v_sum = sum(cleanNum(dist) for dist in vert_dist)
 
         return v_sum, NoneToNA(vert_dist[0]), NoneToNA(vert_dist[1]), comp_ord
 
     if comp_ord == COMP_ORDER.CROSS:
-        cross_dist = [compareAllele(gt1[1], gt2[0], comp_method), compareAllele(gt1[0], gt2[1], comp_method)]
+        cross_dist = [compareAllele(gt1[1], gt2[0], comp_method, **comp_opts), compareAllele(gt1[0], gt2[1], comp_method, **comp_opts)]
         c_sum = sum(cleanNum(dist) for dist in cross_dist)
 
         return c_sum,  NoneToNA(cross_dist[0]), NoneToNA(cross_dist[1]), comp_ord
@@ -87,14 +199,27 @@ def compareGt(gt1: list[alleleData], gt2: list[alleleData], comp_method = COMP_M
     # find the correct comparison order
     else: 
         # get comparisons for both permutations of comparing alleles
-        vert_dist = [compareAllele(gt1[0], gt2[0], comp_method), compareAllele(gt1[1], gt2[1], comp_method)]
-        cross_dist = [compareAllele(gt1[1], gt2[0], comp_method), compareAllele(gt1[0], gt2[1], comp_method)]
+        vert_dist = [compareAllele(gt1[0], gt2[0], comp_method, **comp_opts), compareAllele(gt1[1], gt2[1], comp_method, **comp_opts)]
+        cross_dist = [compareAllele(gt1[1], gt2[0], comp_method, **comp_opts), compareAllele(gt1[0], gt2[1], comp_method, **comp_opts)]
 
         v_sum = sum(cleanNum(dist) for dist in vert_dist)
         c_sum = sum(cleanNum(dist) for dist in cross_dist)
+        v_less = v_sum <= c_sum
+
+        if max_dist is not None or band is not None:
+            # capped distances are only lower bounds, so the order is only known if the lesser sum has no capped distances.
+            # otherwise the order is picked from the full distances, so it (and the LENGTH results using it) match an uncapped run
+            v_capped = isCapped(vert_dist, gt1, gt2, (0, 1), (0, 1), trim, max_dist, band)
+            c_capped = isCapped(cross_dist, gt1, gt2, (1, 0), (0, 1), trim, max_dist, band)
+
+            if (v_less and v_capped) or (not v_less and c_capped):
+                full_opts = dict(comp_opts, max_dist=None, band=None, memo=None)
+                v_full = cleanNum(compareAllele(gt1[0], gt2[0], comp_method, **full_opts)) + cleanNum(compareAllele(gt1[1], gt2[1], comp_method, **full_opts))
+                c_full = cleanNum(compareAllele(gt1[1], gt2[0], comp_method, **full_opts)) + cleanNum(compareAllele(gt1[0], gt2[1], comp_method, **full_opts))
+                v_less = v_full <= c_full
 
         # assume the lesser comparison value is the correct comparison order
-        best_sum, best_dist, best_ord = (v_sum, vert_dist, COMP_ORDER.VERTICAL) if v_sum <= c_sum else (c_sum, cross_dist, COMP_ORDER.CROSS)
+        best_sum, best_dist, best_ord = (v_sum, vert_dist, COMP_ORDER.VERTICAL) if v_less else (c_sum, cross_dist, COMP_ORDER.CROSS)
 
         # returns the sum of the comparisons between alleles, as well as the individual comparisons
         return best_sum, NoneToNA(best_dist[0]), NoneToNA(best_dist[1]), best_ord
@@ -109,8 +234,9 @@ def getFileName(path_str: str):
     """
     # enumerate through the reversed file path to grab
     # the index of where the file name starts
+    name_start = 0 # default to the full string if there are no path separators
     for i, letter in enumerate(reversed(path_str)):
-        if letter == "\\":
+        if letter == "\\" or letter == "/":
             name_start = len(path_str) - i
             break
 
@@ -198,10 +324,12 @@ def setupMetadata(vlist: list[COMP_VCFReader], header_only = False):
     return bdof_meta, pdof_meta, lvdof_meta, ldof_meta
 
 
-def setupVCFReader(vcf: str, stk: ExitStack, settings, skip_head = True):
+def setupVCFReader(vcf: str, stk: ExitStack, settings, skip_head = True, use_index = False, block_size = None, threads = 1, chrom_order = None,
+                   prefetch = None):
     """
     Sets up vcf reader object using the vcf file path, opens the file,  
-    and add it to the provided stack object.
+    and add it to the provided stack object.  
+    If use_index is true and the vcf is bgzipped with a .tbi/.csi index, an IndexedVCFReader is used instead.
 
     :param vcf: VCF file path
     :type vcf: str
@@ -209,12 +337,25 @@ def setupVCFReader(vcf: str, stk: ExitStack, settings, skip_head = True):
     :type stk: ExitStack
     :param settings: settings object for vcf reader setup
     :param skip_head: Description
+    :param use_index: Bool for whether or not to fetch records from the vcf index when one exists
+    :param block_size: number of bytes to read at once, lines are read one at a time if None
+    :param threads: number of decompression threads for .gz files in block mode
+    :param chrom_order: ChromOrder for comparing chromosomes, names are compared as strings if None
+    :param prefetch: number of line batches each reader reads ahead in a background thread, not used for indexed readers
     """
     
     
     try:
         # create VCFReader object for file.  
-        rdr = COMP_VCFReader(file_path=vcf, settings=settings)
+        if use_index:
+            # imported here so pysam is only needed when reading indexed files
+            from helpers.indexed_readers import IndexedVCFReader, findIndex
+
+        if use_index and findIndex(vcf):
+            rdr = IndexedVCFReader(file_path=vcf, settings=settings)
+        else:
+            rdr = COMP_VCFReader(file_path=vcf, settings=settings, block_size=block_size, threads=threads, chrom_order=chrom_order,
+                                 prefetch=prefetch)
 
         # add vcf to exit stack 
         stk.enter_context(rdr)
@@ -229,6 +370,41 @@ def setupVCFReader(vcf: str, stk: ExitStack, settings, skip_head = True):
     return rdr
 
 
+def readManifest(manifest_path: str):
+    """
+    Reads a sample manifest into a dictionary of sample -> list of [vcf path, SETTINGS, caller name], in file order.
+    The manifest is a tab separated file with the columns: sample, caller, settings name (eg. VAMOS), vcf path.
+    Empty lines and lines starting with '#' are skipped, and relative vcf paths are taken from the manifest's directory.
+
+    :param manifest_path: manifest file path
+    :type manifest_path: str
+    """
+    samples = {}
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    try:
+        with open(manifest_path, "r") as file:
+            for line_num, line in enumerate(file, start=1):
+                if not line.strip() or line.startswith("#"):
+                    continue
+
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 4:
+                    raise ManifestFormatError(f"ERROR: From file: {manifest_path}\nExpected 4 columns (sample, caller, settings, vcf path) in line {line_num}: {line}")
+
+                sample, caller, settings_name, vcf_path = [col.strip() for col in cols[:4]]
+
+                if settings_name not in SETTINGS.__members__:
+                    raise ManifestFormatError(f"ERROR: From file: {manifest_path}\nUnknown settings {settings_name} in line {line_num}, expected one of {list(SETTINGS.__members__)}")
+
+                samples.setdefault(sample, []).append([os.path.join(manifest_dir, vcf_path), SETTINGS[settings_name], caller])
+
+    except OSError as e:
+        raise FileIOError(f"File Opening Error: {e}")
+
+    return samples
+
+
 def stateCheck(rdr: COMP_VCFReader):
     """
     Docstring for stateCheck
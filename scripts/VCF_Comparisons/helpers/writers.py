@@ -0,0 +1,326 @@
+import os
+import json
+import shutil
+import zipfile
+import tempfile
+import numpy as np
+from helpers.utils import setupMetadata
+from helpers.constants import *
+
+
+class TSVCompWriter:
+    def __init__(self, bdof, lvdof, ldof, batch_size = 10000):
+        """
+        Writes comparison rows to the BED-VCF, Levenshtein and Length TSV output files.
+        Rows are buffered and written batch_size rows at a time. The files are not closed by the writer.
+
+        :param bdof: BED-VCF comparison output file
+        :param lvdof: Levenshtein comparison output file
+        :param ldof: Length comparison output file
+        :param batch_size: number of rows buffered before writing
+        """
+        self.outs = (bdof, lvdof, ldof)
+        self.batch_size = batch_size
+        self._rows = ([], [], [])
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def writeRow(self, chrom: str, pos: int, end_pos: int, motif_len, bd_vals: list, lv_vals: list, ln_vals: list):
+        """
+        Adds one BED line of comparison values, where NA values are the string 'NA'.
+
+        :param chrom: Description
+        :type chrom: str
+        :param pos: Description
+        :type pos: int
+        :param end_pos: Description
+        :type end_pos: int
+        :param motif_len: Description
+        :param bd_vals: BDDIST start and end values for each vcf
+        :type bd_vals: list
+        :param lv_vals: LVDIST allele 1 and allele 2 values for each vcf pair
+        :type lv_vals: list
+        :param ln_vals: LNDIST allele 1 and allele 2 values for each vcf pair
+        :type ln_vals: list
+        """
+        bed_pos_str = f"{chrom}\t{pos}\t{end_pos}\t{motif_len}"
+
+        for rows, vals in zip(self._rows, (bd_vals, lv_vals, ln_vals)):
+            rows.append(bed_pos_str + "".join(f"\t{val}" for val in vals) + "\n")
+
+        if len(self._rows[0]) >= self.batch_size:
+            self.flush()
+
+
+    def writeBlock(self, chroms: list[str], chrom_ids: np.ndarray, pos: np.ndarray, end_pos: np.ndarray, motif_lens: np.ndarray,
+                   bd_dist: np.ndarray, bd_na: np.ndarray, lv_dist: np.ndarray, lv_na: np.ndarray, ln_dist: np.ndarray, ln_na: np.ndarray):
+        """
+        Writes a block of BED lines from the columnar comparisons. Distance arrays have shape (loci, readers or pairs, 2).
+
+        :param chroms: chromosome names the chrom_ids index into
+        :type chroms: list[str]
+        """
+        self.flush()
+
+        bed_strs = [f"{chroms[chrom_id]}\t{start}\t{end}\t{motif_len}" for chrom_id, start, end, motif_len
+                    in zip(chrom_ids.tolist(), pos.tolist(), end_pos.tolist(), motif_lens.tolist())]
+
+        for out, dist, na in zip(self.outs, (bd_dist, lv_dist, ln_dist), (bd_na, lv_na, ln_na)):
+            out.write("".join(f"{bed_str}{cols}\n" for bed_str, cols in zip(bed_strs, formatCols(dist, na))))
+
+
+    def flush(self):
+        for out, rows in zip(self.outs, self._rows):
+            out.writelines(rows)
+            rows.clear()
+
+
+    def close(self):
+        self.flush()
+
+
+
+class NpzCompWriter:
+    # columns stored in the .npz file and their types, in the order they are written
+    COLUMNS = {"chrom_ids": np.int32, "pos": np.int64, "end_pos": np.int64, "motif_lens": np.int32,
+               "bd_dist": np.int32, "bd_na": bool, "lv_dist": np.int32, "lv_na": bool, "ln_dist": np.int32, "ln_na": bool}
+
+    def __init__(self, path: str, n_readers: int, metadata: dict, batch_size = 100000):
+        """
+        Writes the comparison data to a single NumPy .npz file. Each distance matrix is stored with shape
+        (loci, readers or pairs, 2) along with a bool mask that is true where the value is NA, and the metadata
+        (eg. the setupMetadata headers) is stored as a JSON string. Columns are compressed the same as np.savez_compressed. Rows are buffered and converted to arrays
+        batch_size rows at a time, and each batch is appended to a temporary file per column, so only one batch
+        is held in memory. The .npz file is assembled when the writer is closed.
+
+        :param path: output .npz file path
+        :type path: str
+        :param n_readers: number of vcfs being compared
+        :type n_readers: int
+        :param metadata: JSON serializable metadata saved with the arrays
+        :type metadata: dict
+        :param batch_size: number of rows buffered before writing
+        """
+        self.path = path
+        self.n_readers = n_readers
+        self.n_pairs = n_readers * (n_readers - 1) // 2
+        self.metadata = metadata
+        self.batch_size = batch_size
+
+        self.chroms = []
+        self._chrom_idxs = {}
+        self.num_rows = 0
+        self._rows = []
+
+        self.tmp_dir = tempfile.mkdtemp(prefix=".npz-", dir=os.path.dirname(os.path.abspath(path)))
+        self._col_files = {col: open(os.path.join(self.tmp_dir, col), "wb") for col in self.COLUMNS}
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._cleanup()
+
+
+    def _chromId(self, chrom: str):
+        if chrom not in self._chrom_idxs:
+            self._chrom_idxs[chrom] = len(self.chroms)
+            self.chroms.append(chrom)
+
+        return self._chrom_idxs[chrom]
+
+
+    def writeRow(self, chrom: str, pos: int, end_pos: int, motif_len, bd_vals: list, lv_vals: list, ln_vals: list):
+        """
+        Adds one BED line of comparison values, where NA values are the string 'NA'. Same arguments as TSVCompWriter.writeRow.
+
+        :param chrom: Description
+        :type chrom: str
+        """
+        self._rows.append((self._chromId(chrom), pos, end_pos, int(motif_len), bd_vals, lv_vals, ln_vals))
+
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+
+    def writeBlock(self, chroms: list[str], chrom_ids: np.ndarray, pos: np.ndarray, end_pos: np.ndarray, motif_lens: np.ndarray,
+                   bd_dist: np.ndarray, bd_na: np.ndarray, lv_dist: np.ndarray, lv_na: np.ndarray, ln_dist: np.ndarray, ln_na: np.ndarray):
+        """
+        Writes a block of BED lines from the columnar comparisons. Same arguments as TSVCompWriter.writeBlock.
+
+        :param chroms: chromosome names the chrom_ids index into
+        :type chroms: list[str]
+        """
+        self.flush()
+
+        # map the block's chromosome ids to the writer's ids
+        id_map = np.array([self._chromId(chrom) for chrom in chroms], dtype=np.int32)
+
+        self._append(chrom_ids=id_map[chrom_ids],
+                     pos=pos, end_pos=end_pos, motif_lens=motif_lens,
+                     bd_dist=bd_dist, bd_na=bd_na, lv_dist=lv_dist, lv_na=lv_na, ln_dist=ln_dist, ln_na=ln_na)
+
+
+    def flush(self):
+        """
+        Converts the buffered rows to arrays and appends them to the column files.
+        """
+        if not self._rows:
+            return
+
+        chrom_ids, pos, end_pos, motif_lens, bd_vals, lv_vals, ln_vals = zip(*self._rows)
+        self._rows = []
+        n = len(chrom_ids)
+
+        cols = {"chrom_ids": np.array(chrom_ids, dtype=np.int32),
+                "pos": np.array(pos, dtype=np.int64),
+                "end_pos": np.array(end_pos, dtype=np.int64),
+                "motif_lens": np.array(motif_lens, dtype=np.int32)}
+
+        for name, vals, width in (("bd", bd_vals, self.n_readers), ("lv", lv_vals, self.n_pairs), ("ln", ln_vals, self.n_pairs)):
+            vals = np.array(vals, dtype=object).reshape(n, width, 2)
+            na = vals == "NA"
+            cols[f"{name}_dist"] = np.where(na, 0, vals).astype(np.int64)
+            cols[f"{name}_na"] = na
+
+        self._append(**cols)
+
+
+    def _append(self, **cols):
+        for col, arr in cols.items():
+            self._col_files[col].write(np.ascontiguousarray(arr, dtype=self.COLUMNS[col]).tobytes())
+
+        self.num_rows += len(cols["pos"])
+
+
+    def close(self):
+        """
+        Writes the buffered rows and assembles the .npz file from the column files.
+        """
+        if self._col_files is None:
+            return
+
+        self.flush()
+
+        for file in self._col_files.values():
+            file.close()
+
+        shapes = {"bd": (self.n_readers, 2), "lv": (self.n_pairs, 2), "ln": (self.n_pairs, 2)}
+
+        tmp_path = os.path.join(self.tmp_dir, "out.npz")
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as npz:
+            for col, dtype in self.COLUMNS.items():
+                header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                          "fortran_order": False,
+                          "shape": (self.num_rows, *shapes.get(col[:2], ()))}
+
+                # stream each column file into the archive after its .npy header
+                with npz.open(f"{col}.npy", "w", force_zip64=True) as member, \
+                    open(os.path.join(self.tmp_dir, col), "rb") as col_file:
+                    np.lib.format.write_array_header_2_0(member, header)
+                    shutil.copyfileobj(col_file, member)
+
+            for name, arr in (("chroms", np.array(self.chroms, dtype=str)), ("metadata", np.array(json.dumps(self.metadata)))):
+                with npz.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array(member, arr, allow_pickle=False)
+
+        os.replace(tmp_path, self.path)
+        self._cleanup()
+
+
+    def _cleanup(self):
+        if self._col_files is not None:
+            for file in self._col_files.values():
+                file.close()
+            self._col_files = None
+
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+
+def formatCols(dist: np.ndarray, na: np.ndarray):
+    """
+    Formats distance arrays with shape (loci, ...) into one tab separated output column string per locus, with 'NA' for masked values.
+
+    :param dist: Description
+    :type dist: np.ndarray
+    :param na: Description
+    :type na: np.ndarray
+    """
+    strs = np.where(na, "NA", dist.astype(str)).reshape(len(dist), -1)
+
+    return ["".join("\t" + val for val in row) for row in strs.tolist()]
+
+
+def compMetadata(bdof_meta: str, lvdof_meta: str, ldof_meta: str):
+    """
+    Returns the metadata dictionary saved in .npz outputs, holding the setupMetadata strings of each output.
+
+    :param bdof_meta: Description
+    :type bdof_meta: str
+    :param lvdof_meta: Description
+    :type lvdof_meta: str
+    :param ldof_meta: Description
+    :type ldof_meta: str
+    """
+    return {"format_version": 1, "bddist": bdof_meta, "lvdist": lvdof_meta, "lndist": ldof_meta}
+
+
+def openCompWriter(out_paths: list[str], meta_rdrs: list, stk, out_format = OUTPUT_FORMAT.TSV, header_only = False):
+    """
+    Opens the comparison writer for the given output format, and adds it to the provided stack.
+    TSV output uses the BED-VCF, Levenshtein and Length file paths and writes the setupMetadata headers to each file,
+    NPZ output writes a single .npz file to the first path.
+
+    :param out_paths: output file paths
+    :type out_paths: list[str]
+    :param meta_rdrs: vcf readers used for the metadata
+    :type meta_rdrs: list
+    :param stk: Description
+    :param out_format: Description
+    :param header_only: Bool for whether or not to only write the column headers to TSV outputs
+    """
+    bdof_meta, pdof_meta, lvdof_meta, ldof_meta = setupMetadata(meta_rdrs, header_only=header_only)
+
+    if out_format == OUTPUT_FORMAT.NPZ:
+        return stk.enter_context(NpzCompWriter(out_paths[0], len(meta_rdrs), compMetadata(bdof_meta, lvdof_meta, ldof_meta)))
+
+    outs = [stk.enter_context(open(path, "w")) for path in out_paths[:3]]
+    for out, meta in zip(outs, (bdof_meta, lvdof_meta, ldof_meta)):
+        out.write(meta)
+
+    return stk.enter_context(TSVCompWriter(*outs))
+
+
+def readCompArrays(path: str):
+    """
+    Loads a comparison .npz file. Returns a dictionary with the chrom names, position columns, the metadata dictionary,
+    and the BDDIST, LVDIST and LNDIST values as NumPy masked arrays (masked where the value is NA).
+
+    :param path: .npz file path
+    :type path: str
+    """
+    with np.load(path, allow_pickle=False) as npz:
+        data = {"chroms": npz["chroms"].tolist(),
+                "metadata": json.loads(str(npz["metadata"])),
+                "chrom_ids": npz["chrom_ids"],
+                "pos": npz["pos"],
+                "end_pos": npz["end_pos"],
+                "motif_lens": npz["motif_lens"]}
+
+        for name in ("bd", "lv", "ln"):
+            data[name] = np.ma.masked_array(npz[f"{name}_dist"], mask=npz[f"{name}_na"])
+
+    return data
@@ -1,80 +1,152 @@
 import os
 import sys
+import heapq
+import shutil
+import tempfile
+import pysam
 from contextlib import ExitStack
 from pathlib import Path
 
 root_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(root_dir))
 
-from helpers.readers import BEDReader
-from helpers.utils import setupVCFReader, getFileName
+from helpers.readers import Reader
+from helpers.chrom_order import ChromOrder
+from helpers.utils import getFileName
 from helpers.constants import *
 
-# WARNING: LINES SAVED INTO MEMORY WHEN USING FULL ORDERING
-# USE CAUTION WHEN RUNNING FULL ORDERING ON LARGE FILES(i.e. setting chrom_only = False)
-
-
-def sortVCF(vcf_rdr, order, stk, chrom_only = True):
-    return_loc = vcf_rdr.cur_loc
-
-    # vcf reader will already error out if the file is not valid, so no need for extensive checks
-    if vcf_rdr.path.endswith(".gz"):
-        sof_name = os.path.join(DATA_DIR, vcf_rdr.path[:-7] + ".sorted.vcf")
-    else:
-        sof_name = os.path.join(DATA_DIR, vcf_rdr.path[:-4] + ".sorted.vcf")
-
-    sof = stk.enter_context(open(sof_name, "w")) 
-
-    # copy header to new file
-    vcf_rdr.read() 
-    while vcf_rdr.raw_line.startswith("#") and not vcf_rdr.end_state:
-        sof.write(vcf_rdr.raw_line)
-        vcf_rdr.read() 
-    # save the file position of the end of the header/metadata
-    vcf_rdr.header_end = vcf_rdr.file_obj.tell() 
-    
-
-    print(f"Sorting {getFileName(vcf_rdr.path)}")
-
-    for chrom in order:
-        chrom_data_lines = []
-        while not vcf_rdr.end_state:
-            if vcf_rdr.chrom == chrom:
-                if chrom_only:
-                    sof.write(vcf_rdr.raw_line)
-                else:
-                    if chrom_data_lines:
-                        i = 0
-                        while vcf_rdr.pos > chrom_data_lines[i][0]:
-                            i += 1
-                            if i == len(chrom_data_lines):
-                                break
-                
-                        chrom_data_lines.insert(i, [vcf_rdr.pos, vcf_rdr.raw_line])
-                        
-                    else:
-                        chrom_data_lines.append([vcf_rdr.pos, vcf_rdr.raw_line])
-         
-            vcf_rdr.read()
-        if not chrom_only:
-            for lines in chrom_data_lines:
-                sof.write(lines[1])
-        vcf_rdr._setFilePosition(vcf_rdr.header_end)
-        vcf_rdr.end_state = False
-        vcf_rdr.read()
-
-    vcf_rdr._setFilePosition(return_loc) # return vcf rdr to original location
+# Lines are sorted in chunks of chunk_size lines, so at most one chunk is held in memory at a time.
+# Sorted chunks are written to temporary files next to the output, then merged into the output in a single pass.
+
+
+class _SortKeys:
+    """
+    Builds (chromosome rank, position) sort keys for vcf lines. Chromosomes are ranked in the given order,
+    and chromosomes that are not in the order are ranked after them, in the order they are first seen.
+    """
+    def __init__(self, order: list):
+        self.ranks = {chrom: i for i, chrom in enumerate(order)}
+
+    def __call__(self, line: str):
+        chrom, pos, _ = line.split("\t", 2)
+
+        rank = self.ranks.get(chrom)
+        if rank is None:
+            rank = self.ranks[chrom] = len(self.ranks)
+
+        return rank, int(pos)
+
+
+def _writeChunk(lines: list, tmp_dir: str, idx: int):
+    """
+    Writes a sorted chunk of lines to a temporary file and returns the file path.
+
+    :param lines: Description
+    :type lines: list
+    :param tmp_dir: Description
+    :type tmp_dir: str
+    :param idx: Description
+    :type idx: int
+    """
+    chunk_path = os.path.join(tmp_dir, f"chunk{idx}.vcf")
+    with open(chunk_path, "w") as file:
+        file.writelines(lines)
+
+    return chunk_path
+
+
+def sortVCF(vcf_path: str, order: list, out_path = None, chunk_size = 1000000, bgzip = True, csi = False):
+    """
+    Sorts a vcf by the given chromosome order and then by position, and writes it to out_path.
+    Lines with the same chromosome and position keep their original order. If bgzip is true the output
+    is bgzipped and indexed with tabix (or CSI if csi is true), otherwise it is written as plain text.
+    Returns the output path.
+
+    :param vcf_path: VCF file path (plain or .gz)
+    :type vcf_path: str
+    :param order: chromosome order, usually taken from the BED catalog with getBEDOrder
+    :type order: list
+    :param out_path: output file path, defaults to <vcf name>.sorted.vcf(.gz) next to the input
+    :param chunk_size: number of lines sorted in memory at once
+    :param bgzip: Bool for whether or not to bgzip and index the output
+    :param csi: Bool for whether or not to build a CSI index instead of a tabix index (needed for positions over 2^29)
+    """
+    if out_path is None:
+        base_path = vcf_path[:-3] if vcf_path.endswith(".gz") else vcf_path
+        base_path = base_path[:-4] if base_path.endswith(".vcf") else base_path
+        out_path = base_path + (".sorted.vcf.gz" if bgzip else ".sorted.vcf")
+
+    sort_key = _SortKeys(order)
+    header = []
+    chunk_paths = []
+    lines = []
+
+    print(f"Sorting {getFileName(vcf_path)}")
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    tmp_dir = tempfile.mkdtemp(prefix=".sort-", dir=out_dir)
+
+    try:
+        with Reader(vcf_path) as rdr:
+            line = rdr.read()
+
+            # copy header to new file
+            while line.startswith("#"):
+                header.append(line)
+                line = rdr.read()
+
+            while line:
+                if not line.endswith("\n"):
+                    line += "\n"
+                lines.append(line)
+
+                if len(lines) >= chunk_size:
+                    lines.sort(key=sort_key) # sort is stable, so equal keys keep their file order
+                    chunk_paths.append(_writeChunk(lines, tmp_dir, len(chunk_paths)))
+                    lines = []
+
+                line = rdr.read()
+
+        lines.sort(key=sort_key)
+
+        with ExitStack() as stack:
+            # merge the chunk files, the last chunk is still in memory. heapq.merge keeps equal keys in chunk order
+            chunks = [stack.enter_context(open(path, "r")) for path in chunk_paths]
+            merged = heapq.merge(*chunks, lines, key=sort_key)
+
+            tmp_out = os.path.join(tmp_dir, "sorted.vcf.gz" if bgzip else "sorted.vcf")
+            if bgzip:
+                sof = stack.enter_context(pysam.BGZFile(tmp_out, "wb"))
+                for line in header:
+                    sof.write(line.encode())
+                for line in merged:
+                    sof.write(line.encode())
+            else:
+                sof = stack.enter_context(open(tmp_out, "w"))
+                sof.writelines(header)
+                sof.writelines(merged)
+
+        if bgzip:
+            index_ext = ".csi" if csi else ".tbi"
+            pysam.tabix_index(tmp_out, preset="vcf", force=True, csi=csi)
+            os.replace(tmp_out + index_ext, out_path + index_ext)
+        os.replace(tmp_out, out_path)
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
     print(f"File sorted.")
+    return out_path
 
 
-def getBEDOrder(bed):
-    chrom_order = []
-    while not bed.end_state:
-        if bed.chrom not in chrom_order:
-            chrom_order.append(bed.chrom)
-        bed.read()
+def getBEDOrder(bed_path: str):
+    """
+    Returns the chromosomes of a BED catalog in the order they first appear.
 
-    return chrom_order
+    :param bed_path: BED file path
+    :type bed_path: str
+    """
+    return ChromOrder.fromBED(bed_path).chroms
 
 
 def grabFromDir(file_type: str, dir_name: str):
@@ -83,40 +155,29 @@ def grabFromDir(file_type: str, dir_name: str):
         for entry in dir_entries:
             if entry.is_file():
                 if entry.path.endswith('.' + file_type) or entry.path.endswith("." + file_type + '.gz'):
-                    vcf_list.append(entry.path)
+                    path_list.append(entry.path)
 
     return path_list
 
 
-# loads all vcf file paths from a given directory into a list
-vcf_list = grabFromDir("vcf", os.path.join(DATA_DIR, "HG001.30x"))
+if __name__ == "__main__":
+    # set directory variables for file i/o
+    PROJ_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    DATA_DIR = os.path.join(PROJ_ROOT, '')
 
-bed_file = "BED_files\\benchmark-catalog-v2.vamos.bed"
+    # loads all vcf file paths from a given directory into a list
+    vcf_list = grabFromDir("vcf", os.path.join(DATA_DIR, "HG001.30x"))
 
-# vcf_list = [ # the file name, and the offset amount (eg. [-1, 0] for 1 based inclusive), and bool for whether is is position only
-#     #os.path.join(DATA_DIR, "HG001.PAW79146.haplotagged.URfix.atarva.vcf"),
-#     os.path.join(DATA_DIR,"HG001.PAW79146.haplotagged.strdust.vcf"),
-#     #os.path.join(DATA_DIR,"HG001.PAW79146.haplotagged.URfix.strkit.vcf"), 
-#     os.path.join(DATA_DIR,"HG001.PAW79146.haplotagged.URfix.longTR.vcf.gz"),
-#     #os.path.join(DATA_DIR,"HG001.PAW79146.haplotagged.URfix.straglr.vcf"),
-#     #os.path.join(DATA_DIR,"HG001.PAW79146.haplotagged.URfix.vamos.vcf"),
-#     os.path.join(DATA_DIR,"medaka_to_ref.TR.vcf"),
-#     #"test_cases.vcf"
-#     ]
+    bed_file = "BED_files\\benchmark-catalog-v2.vamos.bed"
 
-vcf_rdrs = []
-with ExitStack() as stack: 
-    # create bed reader and enter the file in stack
-    bed = stack.enter_context(BEDReader(os.path.join(DATA_DIR, bed_file)))
-    bed.read()
+    # Program Options
+    chunk_size = 1000000 # number of lines sorted in memory at once
+    bgzip = True # bgzip and index the sorted files
+    csi = False # build CSI indexes instead of tabix indexes
 
-    order = getBEDOrder(bed)
+    order = getBEDOrder(os.path.join(DATA_DIR, bed_file))
     print(order)
 
-    # create list of vcf reader objects and their new sorted, output file
-    for i, vcf in enumerate(vcf_list):
-        vcf_rdrs.append(setupVCFReader(vcf=vcf, 
-                                        skip_head=False,
-                                        stk=stack))
-        
-        sortVCF(vcf_rdrs[i], order, stack)
\ No newline at end of file
+    # sort each vcf into a new file next to the original
+    for vcf in vcf_list:
+        sortVCF(vcf, order, chunk_size=chunk_size, bgzip=bgzip, csi=csi)
@@ -0,0 +1,74 @@
+import os
+import time
+from helpers.comparison import runBatch
+from helpers.utils import *
+from helpers.constants import *
+
+
+
+def main():
+    # PROGRAM SETTINGS/VARIABLES
+
+    # set directory variables for clean file i/o
+    PROJ_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    DATA_DIR = os.path.join(PROJ_ROOT, '')
+    OUTPUT_DIR = os.path.join(PROJ_ROOT, 'batch_output')
+
+    # Input File Paths
+    bed_path = os.path.join(DATA_DIR, "BED_files\\benchmark-catalog-v2.vamos.bed")
+    # tab separated manifest with the columns: sample, caller, settings name, vcf path (relative to the manifest)
+    # eg. HG007	vamos	VAMOS	HG007.30x/HG007.30x.haplotagged.vamos.sorted.vcf
+    manifest_path = os.path.join(DATA_DIR, "samples.manifest.tsv")
+
+    # Program Options
+    motif_len_col = 6 # column number of the motif length stored in the BED file
+    n_workers = 1 # number of worker processes, each sample is compared in one worker
+    cache_dir = None # directory for caching the parsed vcf tables between runs
+    read_block_size = None # read files in blocks of this many bytes (eg. 4 * 1024 * 1024) instead of line by line
+    decomp_threads = 1 # number of threads for decompressing .gz files when reading in blocks
+    out_format = OUTPUT_FORMAT.TSV # write the comparisons to tsv files, or to a single .npz file per sample
+    lv_max_dist = None # stop levenshtein comparisons past this distance, and write them as lv_max_dist + 1 (eg. 100)
+    lv_band = None # stop levenshtein comparisons once they are this many edits past the allele length difference (eg. 20)
+    min_overlap = None # only match vcf records with at least this reciprocal overlap with the BED locus (eg. 0.5)
+    match_method = MATCH_METHOD.FIRST # MATCH_METHOD.BEST_OVERLAP picks the overlapping record with the largest reciprocal overlap
+
+
+    str_time = time.perf_counter()
+
+    samples = readManifest(manifest_path)
+    print(f"Comparing {len(samples)} samples")
+
+    summary = runBatch(bed_path=bed_path,
+                       samples=samples,
+                       output_dir=OUTPUT_DIR,
+                       n_workers=n_workers,
+                       motif_len_col=motif_len_col,
+                       cache_dir=cache_dir,
+                       read_block_size=read_block_size,
+                       threads=decomp_threads,
+                       out_format=out_format,
+                       lv_max_dist=lv_max_dist,
+                       lv_band=lv_band,
+                       min_overlap=min_overlap,
+                       match_method=match_method)
+
+    # End of Program checks
+    for sample, caller, path, settings, records, skip_num, svlen_diffs in summary:
+        # if any lines were skipped in the file, print a warning
+        if skip_num > 0:
+            print(f"\nWARNING: {skip_num} lines skipped in {path} ({sample} {caller})")
+
+        # straglr records whose SVLEN does not match their END - POS length
+        if svlen_diffs > 0:
+            print(f"\nWARNING: {svlen_diffs} records in {path} have an SVLEN different from END - POS ({sample} {caller})")
+
+
+    end_time = time.perf_counter()
+    comp_time = end_time - str_time
+
+    print(f"\nComparisons completed in {comp_time:.2f} seconds.")
+
+
+
+if __name__ == "__main__":
+    main()
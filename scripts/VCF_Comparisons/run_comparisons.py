@@ -3,7 +3,13 @@ import time
 import argparse
 from pathlib import Path
 from contextlib import ExitStack
-from helpers.readers import BEDReader
+from helpers.catalog import openBED
+from helpers.comparison import compareLoci, runParallel, runColumnar
+from helpers.incremental import runIncremental
+from helpers.writers import openCompWriter
+from helpers.profiling import StageProfiler
+from helpers.summary import SummaryStats
+from helpers.chrom_order import ChromOrder
 from helpers.utils import *
 from helpers.constants import *
 
@@ -13,7 +19,7 @@ def main():
     # PROGRAM SETTINGS/VARIABLES
     
     # set directory variables for clean file i/o
-    PROJ_ROOT = #os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    PROJ_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     SAMPLE = "HG007" 
     DATA_DIR = os.path.join(PROJ_ROOT, '')
     OUTPUT_DIR = os.path.join(PROJ_ROOT, '')
@@ -21,6 +27,7 @@ def main():
     # Input File Paths
     ""
     bed_path = os.path.join(DATA_DIR, "BED_files\\benchmark-catalog-v2.vamos.bed")  
+    fai_path = None # FASTA index (.fai) giving the chromosome order for ORDER_METHOD.NUMERIC, the BED order is used if None
     vcf_list = [
         # the file name, and whether it needs special parsing parameters    
         [os.path.join(DATA_DIR, f"{SAMPLE}.30x\\{SAMPLE}.30x.haplotagged.atarva.sorted.vcf"), SETTINGS.OFFSET_START], 
@@ -37,145 +44,185 @@ def main():
     # position_comp_file = 'pos-comp.tsv' # currently commented out - functionally the same as bed comparison
     levenshtein_comp_file = f'{SAMPLE}-lev-comp.tsv'
     length_comp_file = f'{SAMPLE}-len-comp.tsv'
+    array_comp_file = f'{SAMPLE}-comp.npz' # used instead of the tsv files when out_format is OUTPUT_FORMAT.NPZ
+    profile_file = f'{SAMPLE}-profile.json'
+    summary_file = f'{SAMPLE}-summary.json'
 
     # Program Options
     trim_alleles = False # Note: if this is false, the offset amount will only affect the positions, and the actual sequence strings will not be affected
     motif_len_col = 6 # column number of the motif length stored in the BED file
-
-
-    with ExitStack() as stack: 
-        vcf_rdrs = []
-
-        # create bed reader and enter the file into the stack
-        bed = stack.enter_context(BEDReader(bed_path))
-        bed.read()
-        bed.skipMetaData()
-
-        # setup list of vcf reader objects, and put them in file stack
-        for i, vcf_info in enumerate(vcf_list):
-            vcf_rdrs.append(setupVCFReader(vcf=vcf_info[0], 
-                                           settings=vcf_info[1],
-                                           stk=stack))
+    order_method = ORDER_METHOD.ASCII # ORDER_METHOD.NUMERIC streams files sorted in the catalog's chromosome order (eg. chr1, chr2, ..., chr10)
+    n_workers = 1 # number of worker processes, the catalog is split into shards and compared in parallel if greater than 1
+    shard_method = SHARD_METHOD.CHROM # split the catalog by chromosome, or into chunks of chunk_size BED lines
+    chunk_size = 50000
+    use_index = False # fetch records from .tbi/.csi indexes for bgzipped vcfs, so they do not need to be sorted in the BED order
+    columnar = False # load the BED and vcfs into columnar tables and compare blocks of loci at once (alleles are not trimmed)
+    cache_dir = None # directory for caching the parsed vcf tables between runs, only used in columnar mode
+    incremental = False # keep the comparison columns of each caller and caller pair in cache_dir, and only recompute the ones for changed vcfs (columnar mode)
+    catalog_dir = None # directory for the compiled BED catalog (memory mapped arrays), compiled on the first run and reused after
+    read_block_size = None # read files in blocks of this many bytes (eg. 4 * 1024 * 1024) instead of line by line
+    decomp_threads = 1 # number of threads for decompressing .gz files when reading in blocks
+    prefetch = None # read each vcf ahead in its own background thread, keeping up to this many batches of lines queued (eg. 4)
+    out_format = OUTPUT_FORMAT.TSV # write the comparisons to tsv files, or to a single .npz file of arrays with NA masks
+    lv_max_dist = None # stop levenshtein comparisons past this distance, and write them as lv_max_dist + 1 (eg. 100)
+    lv_band = None # stop levenshtein comparisons once they are this many edits past the allele length difference (eg. 20)
+    lv_method = COMP_METHOD.LEVENSHTEIN # COMP_METHOD.MOTIF estimates the distances from repeat unit counts, not used in columnar mode
+    gt_block_size = None # compare the genotypes of this many BED lines at once with array operations (eg. 1000), COMP_METHOD.LEVENSHTEIN only
+    motif_col = 3 # column number of the motif sequences stored in the BED file, used by COMP_METHOD.MOTIF
+    min_overlap = None # only match vcf records with at least this reciprocal overlap with the BED locus (eg. 0.5), columnar mode only
+    match_method = MATCH_METHOD.FIRST # MATCH_METHOD.BEST_OVERLAP picks the overlapping record with the largest reciprocal overlap, columnar mode only
+    profile = False # record per stage timings for each caller and write them to profile_file as JSON (single process mode only)
+    summarize = False # keep concordance and distance summaries per caller pair, motif length, chromosome and label, and write them to summary_file as JSON (not used in columnar mode)
+    label_col = 5 # column number of the catalog label (eg. STR or VNTR) stored in the BED file, used by the summary
+
+
+    if out_format == OUTPUT_FORMAT.NPZ:
+        out_paths = [os.path.join(OUTPUT_DIR, array_comp_file)]
+    else:
+        out_paths = [os.path.join(OUTPUT_DIR, file) for file in (bed_comp_file, levenshtein_comp_file, length_comp_file)]
+
+
+    str_time = time.perf_counter()
+
+    chrom_order = None
+    if order_method == ORDER_METHOD.NUMERIC:
+        chrom_order = ChromOrder.fromFai(fai_path) if fai_path else ChromOrder.fromBED(bed_path)
+
+    profiler = StageProfiler() if profile and not columnar and n_workers <= 1 else None
+    summary = SummaryStats([getFileName(vcf_info[0]) for vcf_info in vcf_list]) if summarize and not columnar else None
+
+    if columnar and incremental and cache_dir:
+        # rebuild the outputs from the cached comparison columns, only comparing the callers whose vcfs changed
+        rdr_states = runIncremental(bed_path=bed_path,
+                                    vcf_list=vcf_list,
+                                    out_paths=out_paths,
+                                    cache_dir=cache_dir,
+                                    motif_len_col=motif_len_col,
+                                    read_block_size=read_block_size,
+                                    threads=decomp_threads,
+                                    out_format=out_format,
+                                    lv_max_dist=lv_max_dist,
+                                    lv_band=lv_band,
+                                    min_overlap=min_overlap,
+                                    match_method=match_method)
+
+    elif columnar:
+        # compare the whole catalog as arrays, reusing parsed vcfs from the cache when possible
+        rdr_states = runColumnar(bed_path=bed_path,
+                                 vcf_list=vcf_list,
+                                 out_paths=out_paths,
+                                 motif_len_col=motif_len_col,
+                                 cache_dir=cache_dir,
+                                 read_block_size=read_block_size,
+                                 threads=decomp_threads,
+                                 out_format=out_format,
+                                 lv_max_dist=lv_max_dist,
+                                 lv_band=lv_band,
+                                 min_overlap=min_overlap,
+                                 match_method=match_method)
+
+    elif n_workers > 1:
+        # compare shards of the BED catalog in parallel, then stitch the outputs back together in catalog order
+        rdr_states = runParallel(bed_path=bed_path,
+                                 vcf_list=vcf_list,
+                                 out_paths=out_paths,
+                                 n_workers=n_workers,
+                                 shard_method=shard_method,
+                                 chunk_size=chunk_size,
+                                 motif_len_col=motif_len_col,
+                                 trim_alleles=trim_alleles,
+                                 use_index=use_index,
+                                 block_size=read_block_size,
+                                 threads=decomp_threads,
+                                 out_format=out_format,
+                                 lv_max_dist=lv_max_dist,
+                                 lv_band=lv_band,
+                                 lv_method=lv_method,
+                                 motif_col=motif_col,
+                                 chrom_order=chrom_order,
+                                 catalog_dir=catalog_dir,
+                                 prefetch=prefetch,
+                                 summary=summary,
+                                 label_col=label_col,
+                                 gt_block_size=gt_block_size)
+
+    else:
+        with ExitStack() as stack: 
+            vcf_rdrs = []
+
+            # create bed reader and enter the file into the stack
+            bed = stack.enter_context(openBED(bed_path, catalog_dir, motif_len_col, motif_col, label_col, block_size=read_block_size))
+            bed.read()
+            bed.skipMetaData()
+
+            # setup list of vcf reader objects, and put them in file stack
+            for i, vcf_info in enumerate(vcf_list):
+                vcf_rdrs.append(setupVCFReader(vcf=vcf_info[0], 
+                                               settings=vcf_info[1],
+                                               stk=stack,
+                                               use_index=use_index,
+                                               block_size=read_block_size,
+                                               threads=decomp_threads,
+                                               chrom_order=chrom_order,
+                                               prefetch=prefetch))
+                
+                if profiler:
+                    profiler.instrumentReader(vcf_rdrs[i])
+
+                # read the first line, its genotype is built once it is compared
+                vcf_rdrs[i].VCFParse()
+
+
+            # open output files and put them into the exit stack, the metadata is written when the files are opened
+            # pdof = stack.enter_context(open(os.path.join(OUTPUT_DIR, position_comp_file), "w"))
+            comp_writer = openCompWriter(out_paths, vcf_rdrs, stack, out_format)
             
-            # build first line's genotype and save it      
-            vcf_rdrs[i].VCFParse()
-            vcf_rdrs[i].buildGtData()
-
-
-        # open output files and put them into the exit stack
-        bdof = stack.enter_context(open(os.path.join(OUTPUT_DIR, bed_comp_file), "w")) 
-        # pdof = stack.enter_context(open(os.path.join(OUTPUT_DIR, position_comp_file), "w"))
-        lvdof = stack.enter_context(open(os.path.join(OUTPUT_DIR, levenshtein_comp_file), "w"))
-        ldof = stack.enter_context(open(os.path.join(OUTPUT_DIR, length_comp_file), "w"))
-        
-        # write metadata to output files
-        bdof_meta, pdof_meta, lvdof_meta, ldof_meta = setupMetadata(vcf_rdrs, header_only=False)
-        bdof.write(bdof_meta)
-        # pdof.write(pdof_meta)
-        lvdof.write(lvdof_meta)
-        ldof.write(ldof_meta)
-        
-
-        str_time = time.perf_counter()
-
-        # Main Operations loop       
-        while bed.cur_line: # loop until BED file reaches end
-            bed_pos_str = f"{bed.chrom}\t{bed.pos}\t{bed.end_pos}\t{bed.cur_line[motif_len_col]}" 
-            bdof_out_str = bed_pos_str
-            # pdof_out_str = bed_pos_str
-            lvdof_out_str = bed_pos_str
-            ldof_out_str = bed_pos_str
-
-
-            if bed.prev_line is None or bed.chrom != bed.prev_line[0]:
-                print(f"Comparing {bed.chrom}")
-
-
-            # cycle through all vcf files and ensure they are synced to the bed
-            [reader.syncToBed(bed) for reader in vcf_rdrs]
-                                      
-            # Run comparisons on each VCF
-            for i, reader in enumerate(vcf_rdrs):
-
-                # VCF-BED Comparisons
-                if reader.pause or reader.end_state: # if the vcf skipped the current line or has ended
-                    bdof_out_str += "\tNA\tNA"
-                else:
-                    # BDDIST: compare vcf ref position with bed
-                    start_diff = bed.pos - reader.pos
-                    end_diff = bed.end_pos - reader.end_pos
-                    
-                    # add trim amounts to allele Data           
-                    reader.addTrimData(start_diff, end_diff) # only the trim amounts are passed, allele data is not actually trimmed here
-
-                    bdof_out_str += f"\t{start_diff}\t{end_diff}"
-
-
-                # VCF-VCF Comparisons
-                for other_reader in vcf_rdrs[i + 1:]:
-                    # if both readers are not paused or ended
-                    if stateCheck(reader) and stateCheck(other_reader):
-                        # LVDIST: calculate levenshtein distance of alleles between vcf files
-                        gt_lvdiff, a1_lvdiff, a2_lvdiff, order = compareGt(reader.gt_data, 
-                                                                    other_reader.gt_data,
-                                                                    comp_method=COMP_METHOD.LEVENSHTEIN,
-                                                                    trim=trim_alleles)
-                        lvdof_out_str += f"\t{a1_lvdiff}\t{a2_lvdiff}"
-                    
-                        # LENDIST: calculate difference in allele lengths between vcf files
-                        gt_ldiff, a1_ldiff, a2_ldiff, order = compareGt(reader.gt_data, 
-                                                                other_reader.gt_data, 
-                                                                comp_method=COMP_METHOD.LENGTH,
-                                                                comp_ord=order,
-                                                                trim=trim_alleles)
-                        ldof_out_str += f"\t{a1_ldiff}\t{a2_ldiff}"
-
-                        # if a1_ldiff > a1_lvdiff or a2_ldiff > a2_lvdiff:
-                        #    raise Exception("\nFATAL PROGRAM ERROR\nLength difference between strings greater than Levenshtein distance.")
-
-                        # POSDIST: calculate difference in positions between vcf files
-                        # vcf_start_diff = reader.pos - other_reader.pos
-                        # vcf_end_diff = reader.end_pos - other_reader.end_pos
-                        # pdof_out_str += f"\t{vcf_start_diff}\t{vcf_end_diff}"
-
-                    else:
-                        lvdof_out_str += "\tNA\tNA"
-                        ldof_out_str += "\tNA\tNA"
-                        # pdof_out_str += "\tNA\tNA"
-
-
-            # write data to output files
-            bdof.write(bdof_out_str + "\n")   
-            # pdof.write(pdof_out_str + "\n")
-            lvdof.write(lvdof_out_str + "\n")   
-            ldof.write(ldof_out_str + "\n")
-
-
-            # read lines for all files
-            for rdr in vcf_rdrs:
-                rdr.VCFParse()
-
-                if not rdr.end_state:
-                    rdr.buildGtData()   
-
-            bed.read() 
 
-            
+            # Main Operations loop       
+            compareLoci(bed, vcf_rdrs, None, None, None,
+                        motif_len_col=motif_len_col,
+                        trim_alleles=trim_alleles,
+                        writer=comp_writer,
+                        lv_max_dist=lv_max_dist,
+                        lv_band=lv_band,
+                        lv_method=lv_method,
+                        motif_col=motif_col,
+                        profiler=profiler,
+                        summary=summary,
+                        label_col=label_col,
+                        gt_block_size=gt_block_size)
+
+        # indexed readers never reach the end of the file, so they are treated as ended, and their skips are not counted
+        rdr_states = [(rdr.path, None if rdr.indexed else rdr.skip_num, rdr.end_state or rdr.indexed, None if rdr.indexed else rdr.svlen_diffs)
+                      for rdr in vcf_rdrs]
+
 
     # End of Program checks
-    for rdr in vcf_rdrs:
+    for path, skip_num, end_state, svlen_diffs in rdr_states:
         # if any vcfs are still not at their end, then they are likely out of order
-        if not rdr.end_state:
-            print(f"\nWARNING: BED file finished before {rdr.path}.\nPossible chromosome ordering error.")
+        if not end_state:
+            print(f"\nWARNING: BED file finished before {path}.\nPossible chromosome ordering error.")
 
         # if any lines were skipped in the file, print a warning
-        if rdr.skip_num > 0:
-            print(f"\nWARNING: {rdr.skip_num} lines skipped in {rdr.path}")
+        if skip_num is None:
+            print(f"\nNOTE: skipped lines are not counted for indexed vcfs ({path})")
+        elif skip_num > 0:
+            print(f"\nWARNING: {skip_num} lines skipped in {path}")
+
+        # straglr records whose SVLEN does not match their END - POS length (not counted for indexed vcfs)
+        if svlen_diffs:
+            print(f"\nWARNING: {svlen_diffs} records in {path} have an SVLEN different from END - POS")
 
 
     end_time = time.perf_counter()
     comp_time = end_time - str_time
 
+    if profiler:
+        profiler.writeReport(os.path.join(OUTPUT_DIR, profile_file))
+
+    if summary:
+        summary.writeReport(os.path.join(OUTPUT_DIR, summary_file))
+
 
     print("\n\n---PROGRAM COMPLETE---\n")
     print(f"Comparison time: {round(comp_time, 4)}")
@@ -0,0 +1,67 @@
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+
+import pytest
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+from helpers.readers import BEDReader
+from helpers.chrom_order import ChromOrder
+from helpers.comparison import compareLoci, runColumnar
+from helpers.utils import setupVCFReader
+from benchmarks.synthetic import writeSyntheticData
+
+# capping only changes the LVDIST values over the cutoff, the comparison order (and so LNDIST) is the same as an uncapped run
+
+
+@pytest.fixture(scope="module")
+def synthetic(tmp_path_factory):
+    return writeSyntheticData(str(tmp_path_factory.mktemp("data")), 1500, seed=1)
+
+
+def _dataRows(path: str):
+    with open(path, "r") as file:
+        return [line for line in file if not line.startswith(("#", "CHROM"))]
+
+
+def _runSerial(bed_path: str, vcf_list: list, out_paths: list[str], **kwargs):
+    with ExitStack() as stack:
+        bed = stack.enter_context(BEDReader(bed_path))
+        bed.read()
+        bed.skipMetaData()
+
+        chrom_order = ChromOrder.fromBED(bed_path)
+        vcf_rdrs = []
+        for vcf_path, settings in vcf_list:
+            rdr = setupVCFReader(vcf=vcf_path, settings=settings, stk=stack, chrom_order=chrom_order)
+            rdr.VCFParse()
+            vcf_rdrs.append(rdr)
+
+        outs = [stack.enter_context(open(path, "w")) for path in out_paths]
+        compareLoci(bed, vcf_rdrs, *outs, **kwargs)
+
+
+def _outPaths(tmp_path, name: str):
+    return [str(tmp_path / f"{name}.{ext}") for ext in ("bed", "lev", "len")]
+
+
+@pytest.mark.parametrize("cap", [{"lv_max_dist": 5}, {"lv_band": 2}, {"lv_max_dist": 5, "lv_band": 2}])
+def test_capped_length_unchanged(synthetic, tmp_path, cap):
+    bed_path, vcf_list = synthetic
+
+    runs = {
+        "serial": lambda paths, **kwargs: _runSerial(bed_path, vcf_list, paths, **kwargs),
+        "block": lambda paths, **kwargs: _runSerial(bed_path, vcf_list, paths, gt_block_size=64, **kwargs),
+        "columnar": lambda paths, **kwargs: runColumnar(bed_path, vcf_list, paths, **kwargs),
+    }
+
+    for name, run in runs.items():
+        full_paths = _outPaths(tmp_path, f"{name}.full")
+        capped_paths = _outPaths(tmp_path, f"{name}.capped")
+        run(full_paths)
+        run(capped_paths, **cap)
+
+        assert _dataRows(capped_paths[1]) != _dataRows(full_paths[1])
+        assert _dataRows(capped_paths[2]) == _dataRows(full_paths[2])
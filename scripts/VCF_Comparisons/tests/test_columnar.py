@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+from helpers.comparison import runColumnar
+from helpers.incremental import runIncremental
+from helpers.constants import SETTINGS
+
+VCF_HEADER = "##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n"
+
+
+def _writeOverlapCase(tmp_path):
+    # the second locus is inside the first, and the record covering both is only used by the first, the same as streaming
+    bed_path = tmp_path / "cat.bed"
+    bed_path.write_text("chr1\t1000\t1010\tA\tx\tSTR\t1\n"
+                        "chr1\t1004\t1008\tA\tx\tSTR\t1\n"
+                        "chr1\t2000\t2010\tA\tx\tSTR\t1\n")
+
+    vcf_list = []
+    for name in ("a", "b"):
+        vcf_path = tmp_path / f"{name}.vcf"
+        vcf_path.write_text(VCF_HEADER +
+                            "chr1\t1000\t.\tAAAAAAAAAAA\tAAAA\t.\tPASS\tEND=1010\tGT\t0|1\n"
+                            "chr1\t2000\t.\tAAAAAAAAAAA\tAAAA\t.\tPASS\tEND=2010\tGT\t0|1\n")
+        vcf_list.append([str(vcf_path), SETTINGS.DEFAULT])
+
+    return str(bed_path), vcf_list
+
+
+def _dataRows(path: str):
+    with open(path, "r") as file:
+        return [line.rstrip("\n").split("\t") for line in file if not line.startswith(("#", "CHROM"))]
+
+
+def test_record_matched_to_one_locus(tmp_path):
+    bed_path, vcf_list = _writeOverlapCase(tmp_path)
+
+    col_paths = [str(tmp_path / f"col.{ext}") for ext in ("bed", "lev", "len")]
+    inc_paths = [str(tmp_path / f"inc.{ext}") for ext in ("bed", "lev", "len")]
+
+    col_states = runColumnar(bed_path, vcf_list, col_paths)
+    inc_states = runIncremental(bed_path, vcf_list, inc_paths, str(tmp_path / "cache"))
+
+    for paths in (col_paths, inc_paths):
+        rows = _dataRows(paths[0])
+        assert rows[0][4:] == ["0", "0", "0", "0"]
+        assert rows[1][4:] == ["NA", "NA", "NA", "NA"]
+        assert rows[2][4:] == ["0", "0", "0", "0"]
+
+    assert [state[1] for state in col_states] == [0, 0]
+    assert [state[1] for state in inc_states] == [0, 0]
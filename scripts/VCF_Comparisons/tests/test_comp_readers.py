@@ -0,0 +1,34 @@
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+from helpers.utils import setupVCFReader
+from helpers.constants import SETTINGS
+
+VCF_HEADER = "##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n"
+
+
+def test_straglr_svlen_check(tmp_path):
+    # SVLEN is the reference length of the locus (END - POS), the first record matches and the second does not
+    vcf_path = tmp_path / "straglr.vcf"
+    vcf_path.write_text(VCF_HEADER +
+                        "chr1\t1000\t.\tN\t<CNV>,<CNV>\t.\tPASS\tEND=1030;RU=CAG;SVLEN=30,30;RB=36,24\tGT\t1/2\n"
+                        "chr1\t2000\t.\tN\t<CNV>\t.\tPASS\tEND=2030;RU=CAG;SVLEN=6;RB=36\tGT\t1\n")
+
+    with ExitStack() as stack:
+        rdr = setupVCFReader(vcf=str(vcf_path), settings=SETTINGS.STRAGLR, stk=stack)
+
+        rdr.VCFParse()
+        assert not rdr._svLenDiffers()
+        assert rdr._handleStraglrLen(0) == rdr._handleStraglrLen(0, use_svlen=True) == 30
+        assert [rdr._handleStraglrLen(1), rdr._handleStraglrLen(2)] == [36, 24]
+
+        rdr.VCFParse()
+        assert rdr._svLenDiffers()
+        assert rdr._handleStraglrLen(0) == 30
+        assert rdr._handleStraglrLen(0, use_svlen=True) == 6
+
+        assert rdr.svlen_diffs == 1
@@ -0,0 +1,75 @@
+import sys
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+
+import pytest
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+from helpers.readers import BEDReader, VCFFormatError
+from helpers.chrom_order import ChromOrder
+from helpers.comparison import compareLoci, runParallel, runShard, getShards
+from helpers.utils import setupVCFReader
+from helpers.constants import SHARD_METHOD
+from benchmarks.synthetic import writeSyntheticData
+
+# The synthetic catalog is in natural chromosome order (chr1, chr2, chr10), the same as real catalogs,
+# so the shards have to seek past chromosomes that compare out of order as strings. The serial reference run
+# ranks chromosomes in the catalog order, which runParallel uses when no order is given.
+
+
+@pytest.fixture(scope="module")
+def synthetic(tmp_path_factory):
+    return writeSyntheticData(str(tmp_path_factory.mktemp("data")), 1500, seed=1)
+
+
+def _dataRows(path: str):
+    with open(path, "r") as file:
+        return [line for line in file if not line.startswith(("#", "CHROM"))]
+
+
+def _runSerial(bed_path: str, vcf_list: list, out_paths: list[str]):
+    with ExitStack() as stack:
+        bed = stack.enter_context(BEDReader(bed_path))
+        bed.read()
+        bed.skipMetaData()
+
+        # the catalog order, the same as run_comparisons uses for ORDER_METHOD.NUMERIC
+        chrom_order = ChromOrder.fromBED(bed_path)
+
+        vcf_rdrs = []
+        for vcf_path, settings in vcf_list:
+            rdr = setupVCFReader(vcf=vcf_path, settings=settings, stk=stack, chrom_order=chrom_order)
+            rdr.VCFParse()
+            vcf_rdrs.append(rdr)
+
+        outs = [stack.enter_context(open(path, "w")) for path in out_paths]
+        compareLoci(bed, vcf_rdrs, *outs)
+
+    return [(rdr.path, rdr.skip_num, rdr.end_state, rdr.svlen_diffs) for rdr in vcf_rdrs]
+
+
+@pytest.mark.parametrize("shard_method", [SHARD_METHOD.CHROM, SHARD_METHOD.CHUNK])
+def test_parallel_matches_serial(synthetic, tmp_path, shard_method):
+    bed_path, vcf_list = synthetic
+    serial_paths = [str(tmp_path / f"serial.{ext}") for ext in ("bed", "lev", "len")]
+    parallel_paths = [str(tmp_path / f"parallel.{ext}") for ext in ("bed", "lev", "len")]
+
+    serial_states = _runSerial(bed_path, vcf_list, serial_paths)
+    parallel_states = runParallel(bed_path, vcf_list, parallel_paths, n_workers=2, shard_method=shard_method, chunk_size=200)
+
+    assert parallel_states == serial_states
+
+    for serial_path, parallel_path in zip(serial_paths, parallel_paths):
+        assert _dataRows(parallel_path) == _dataRows(serial_path)
+
+
+def test_seek_out_of_order_raises(synthetic):
+    bed_path, vcf_list = synthetic
+    shard = next(shard for shard in getShards(bed_path) if shard.chrom == "chr10")
+
+    # without a chromosome order the names are compared as strings, so the seek stops on chr2
+    with tempfile.TemporaryDirectory() as tmp_dir, pytest.raises(VCFFormatError):
+        runShard(shard, bed_path, vcf_list, tmp_dir)
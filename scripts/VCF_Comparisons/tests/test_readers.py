@@ -0,0 +1,112 @@
+import gzip
+import sys
+from pathlib import Path
+
+import pysam
+import pytest
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+from helpers.readers import Reader, FileReadError, parseInfo
+
+
+def test_parse_info_repeated_key():
+    # a repeated key must not stop the parse before the other requested keys are found
+    info = parseInfo("RB=1;RB=2;SVLEN=3;END=9", frozenset({"END", "RB", "SVLEN"}))
+
+    assert info == parseInfo("RB=1;RB=2;SVLEN=3;END=9")
+    assert info == {"RB": "2", "SVLEN": "3", "END": "9"}
+
+
+def test_parse_info_repeated_key_after_all_found():
+    # a key repeated after every requested key has been seen keeps its last value, the same as a full parse
+    info_str = "END=1;RU=A;ALTANNO_H1=0;ALTANNO_H2=0;END=5"
+    info = parseInfo(info_str, frozenset({"END", "RU", "ALTANNO_H1", "ALTANNO_H2"}))
+
+    assert info == parseInfo(info_str)
+    assert info["END"] == "5"
+
+
+def _writeReaderFiles(tmp_path, newline: str):
+    lines = ["##header\n", "#CHROM\tPOS\n"] + [f"chr{i % 3 + 1}\t{i * 10}\t{'ACGT' * (i % 7)}\n" for i in range(300)]
+    data = "".join(lines).replace("\n", newline).encode("utf-8")
+
+    plain_path = tmp_path / "lines.txt"
+    plain_path.write_bytes(data)
+
+    gz_path = tmp_path / "lines.txt.gz"
+    with gzip.open(gz_path, "wb") as file:
+        file.write(data)
+
+    bgzf_path = tmp_path / "lines.bgzf.txt.gz"
+    with pysam.BGZFile(str(bgzf_path), "wb") as file:
+        file.write(data)
+
+    return data, [str(plain_path), str(gz_path), str(bgzf_path)]
+
+
+def _readAll(path: str, **kwargs):
+    lines = []
+    locs = []
+    with Reader(path, track_offsets=True, **kwargs) as rdr:
+        while rdr.read():
+            lines.append(rdr.raw_line)
+            locs.append(rdr.line_loc)
+
+    return lines, locs
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_block_modes_match_line_mode(tmp_path, newline):
+    data, paths = _writeReaderFiles(tmp_path, newline)
+
+    # offsets are the byte position of each line in the uncompressed file
+    expected_lines = data.decode("utf-8").splitlines(keepends=True)
+    expected_locs = [0]
+    for line in expected_lines[:-1]:
+        expected_locs.append(expected_locs[-1] + len(line.encode("utf-8")))
+
+    for path in paths:
+        for kwargs in ({}, {"block_size": 256}, {"block_size": 256, "threads": 2}, {"prefetch": 2}, {"block_size": 256, "prefetch": 2}):
+            lines, locs = _readAll(path, **kwargs)
+
+            assert lines == expected_lines, (path, kwargs)
+            if not path.endswith(".gz") or kwargs:
+                # text mode gzip tell() positions are opaque, the other modes give byte positions
+                assert locs == expected_locs, (path, kwargs)
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"block_size": 256}, {"prefetch": 2}, {"block_size": 256, "prefetch": 2}])
+def test_seek_to_line(tmp_path, kwargs):
+    _, paths = _writeReaderFiles(tmp_path, "\n")
+
+    for path in paths:
+        with Reader(path, track_offsets=True, **kwargs) as rdr:
+            rdr.read()
+            rdr.skipMetaData()
+            for _ in range(150):
+                rdr.read()
+            line, line_loc = rdr.raw_line, rdr.line_loc
+
+            rdr.read()
+            rdr._setFilePosition(line_loc)
+            assert rdr.read() == line
+            assert rdr.line_loc == line_loc
+
+            # skipMetaData stops after reading the first record, so header_end is the position after it (the same as tell() in line mode)
+            rdr._setFilePosition(rdr.header_end)
+            assert rdr.read().startswith("chr2\t10\t")
+
+
+def test_header_end_without_offsets(tmp_path):
+    _, paths = _writeReaderFiles(tmp_path, "\n")
+
+    with Reader(paths[0], block_size=256) as rdr:
+        rdr.read()
+        rdr.skipMetaData()
+
+        assert rdr.header_end is None
+        with pytest.raises(FileReadError):
+            # skipMetaData stops after reading the first record, so header_end is the position after it (the same as tell() in line mode)
+            rdr._setFilePosition(rdr.header_end)
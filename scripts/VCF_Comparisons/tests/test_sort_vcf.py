@@ -0,0 +1,43 @@
+import random
+import sys
+from pathlib import Path
+
+import pysam
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(root_dir))
+
+from helpers.readers import Reader
+from other_scripts.sort_vcf import getBEDOrder, sortVCF
+from benchmarks.synthetic import writeSyntheticData
+
+
+def test_sort_shuffled_vcf(tmp_path):
+    bed_path, vcf_list = writeSyntheticData(str(tmp_path / "data"), 300, seed=1)
+    vcf_path = vcf_list[0][0]
+
+    with Reader(vcf_path) as rdr:
+        lines = rdr.file_obj.readlines()
+    header = [line for line in lines if line.startswith("#")]
+    records = [line for line in lines if not line.startswith("#")]
+
+    shuffled = records[:]
+    random.Random(1).shuffle(shuffled)
+    shuffled_path = tmp_path / "shuffled.vcf"
+    shuffled_path.write_text("".join(header + shuffled))
+
+    order = getBEDOrder(bed_path)
+    assert order == ["chr1", "chr2", "chr10"]
+
+    # small chunks so the merge of several chunk files is used
+    out_path = sortVCF(str(shuffled_path), order, out_path=str(tmp_path / "sorted.vcf.gz"), chunk_size=100)
+
+    with Reader(out_path) as rdr:
+        sorted_lines = rdr.file_obj.readlines()
+    ranks = {chrom: i for i, chrom in enumerate(order)}
+
+    assert sorted_lines[:len(header)] == header
+    assert sorted_lines[len(header):] == sorted(records, key=lambda line: (ranks[line.split("\t")[0]], int(line.split("\t")[1])))
+
+    with pysam.TabixFile(out_path) as tbx:
+        assert len(list(tbx.fetch("chr10"))) == sum(line.startswith("chr10\t") for line in records)